@@ -4,7 +4,15 @@ from pgx._src.visualizer import (
     save_svg_animation,
     set_visualization_config,
 )
-from pgx.v1 import Env, EnvId, State, available_games, make
+from pgx.v1 import (
+    Env,
+    EnvId,
+    State,
+    VectorEnv,
+    available_games,
+    make,
+    precompile,
+)
 
 __all__ = [
     # v1 api components
@@ -13,6 +21,8 @@ __all__ = [
     "EnvId",
     "make",
     "available_games",
+    "VectorEnv",
+    "precompile",
     # visualization
     "set_visualization_config",
     "save_svg",
@@ -1,219 +1,198 @@
 # type: ignore
 import jax.numpy as jnp
 import jax.random
+import numpy as np
 
-TO_MAP = -jnp.ones((64, 73), dtype=jnp.int8)
-PLANE_MAP = -jnp.ones((64, 64), dtype=jnp.int8)  # ignores underpromotion
-# underpromotiona
-for from_ in range(64):
-    if (from_ % 8) not in (1, 6):
-        continue
-    for plane in range(9):
-        dir_ = plane % 3
-        to = -1
-        if from_ % 8 == 6:
-            # white
-            # 8  7 15 23 31 39 47 55 63
-            # 7  6 14 22 30 38 46 54 62
-            # black
-            # 2  6 14 22 30 38 46 54 62
-            # 1  7 15 23 31 39 47 55 63
-            to = from_ + jnp.int8([+1, +9, -7])[dir_]
-        if not (0 <= to < 64):
-            continue
-        TO_MAP = TO_MAP.at[from_, plane].set(to)
-# normal move
-seq = list(range(1, 8))
-zeros = [0 for _ in range(7)]
-# 下
-dr = [-x for x in seq[::-1]]
-dc = [0 for _ in range(7)]
-# 上
-dr += [x for x in seq]
-dc += [0 for _ in range(7)]
-# 左
-dr += [0 for _ in range(7)]
-dc += [-x for x in seq[::-1]]
-# 右
-dr += [0 for _ in range(7)]
-dc += [x for x in seq]
-# 左下
-dr += [-x for x in seq[::-1]]
-dc += [-x for x in seq[::-1]]
-# 右上
-dr += [x for x in seq]
-dc += [x for x in seq]
-# 左上
-dr += [x for x in seq[::-1]]
-dc += [-x for x in seq[::-1]]
-# 右下
-dr += [-x for x in seq]
-dc += [x for x in seq]
-# knight moves
-dr += [-1, +1, -2, +2, -1, +1, -2, +2]
-dc += [-2, -2, -1, -1, +2, +2, +1, +1]
-for from_ in range(64):
-    for plane in range(9, 73):
-        r, c = from_ % 8, from_ // 8
-        r = r + dr[plane - 9]
-        c = c + dc[plane - 9]
-        if r < 0 or r >= 8 or c < 0 or c >= 8:
-            continue
-        to = jnp.int8(c * 8 + r)
-        TO_MAP = TO_MAP.at[from_, plane].set(to)
-        PLANE_MAP = PLANE_MAP.at[from_, to].set(jnp.int8(plane))
-
-
-CAN_MOVE = -jnp.ones((7, 64, 27), jnp.int8)
-# usage: CAN_MOVE[piece, from_x, from_y]
-# CAN_MOVE[0, :, :]はすべて-1
-# 将棋と違い、中央から点対称でないので、注意が必要。
-# 視点は常に白側のイメージが良い。
-# PAWN以外の動きは上下左右対称。PAWNは上下と斜めへ動ける駒と定義して、手番に応じてフィルタする。
-
-
-# PAWN
-for from_ in range(64):
-    r0, c0 = from_ % 8, from_ // 8
-    legal_dst = []
-    for to in range(64):
-        r1, c1 = to % 8, to // 8
-        if jnp.abs(r1 - r0) == 1 and jnp.abs(c1 - c0) <= 1:
-            legal_dst.append(to)
-        # init move
-        if (r0 == 1 or r0 == 6) and (
-            jnp.abs(c1 - c0) == 0 and jnp.abs(r1 - r0) == 2
-        ):
-            legal_dst.append(to)
-    assert len(legal_dst) <= 8
-    CAN_MOVE = CAN_MOVE.at[1, from_, : len(legal_dst)].set(jnp.int8(legal_dst))
-# KNIGHT
-for from_ in range(64):
-    r0, c0 = from_ % 8, from_ // 8
-    legal_dst = []
-    for to in range(64):
-        r1, c1 = to % 8, to // 8
-        if jnp.abs(r1 - r0) == 1 and jnp.abs(c1 - c0) == 2:
-            legal_dst.append(to)
-        if jnp.abs(r1 - r0) == 2 and jnp.abs(c1 - c0) == 1:
-            legal_dst.append(to)
-    assert len(legal_dst) <= 27
-    CAN_MOVE = CAN_MOVE.at[2, from_, : len(legal_dst)].set(jnp.int8(legal_dst))
-# BISHOP
-for from_ in range(64):
-    r0, c0 = from_ % 8, from_ // 8
-    legal_dst = []
-    for to in range(64):
-        r1, c1 = to % 8, to // 8
-        if from_ == to:
-            continue
-        if jnp.abs(r1 - r0) == jnp.abs(c1 - c0):
-            legal_dst.append(to)
-    assert len(legal_dst) <= 27
-    CAN_MOVE = CAN_MOVE.at[3, from_, : len(legal_dst)].set(jnp.int8(legal_dst))
-# ROOK
-for from_ in range(64):
-    r0, c0 = from_ % 8, from_ // 8
-    legal_dst = []
-    for to in range(64):
-        r1, c1 = to % 8, to // 8
-        if from_ == to:
-            continue
-        if jnp.abs(r1 - r0) == 0 or jnp.abs(c1 - c0) == 0:
-            legal_dst.append(to)
-    assert len(legal_dst) <= 27
-    CAN_MOVE = CAN_MOVE.at[4, from_, : len(legal_dst)].set(jnp.int8(legal_dst))
-# QUEEN
-for from_ in range(64):
-    r0, c0 = from_ % 8, from_ // 8
-    legal_dst = []
-    for to in range(64):
-        r1, c1 = to % 8, to // 8
-        if from_ == to:
-            continue
-        if jnp.abs(r1 - r0) == 0 or jnp.abs(c1 - c0) == 0:
-            legal_dst.append(to)
-        if jnp.abs(r1 - r0) == jnp.abs(c1 - c0):
-            legal_dst.append(to)
-    assert len(legal_dst) <= 27
-    CAN_MOVE = CAN_MOVE.at[5, from_, : len(legal_dst)].set(jnp.int8(legal_dst))
-# KING
-for from_ in range(64):
-    r0, c0 = from_ % 8, from_ // 8
-    legal_dst = []
-    for to in range(64):
-        r1, c1 = to % 8, to // 8
-        if from_ == to:
-            continue
-        if (jnp.abs(r1 - r0) <= 1) and (jnp.abs(c1 - c0) <= 1):
-            legal_dst.append(to)
-    # castling
-    # if from_ == 32:
-    #     legal_dst += [16, 48]
-    # if from_ == 39:
-    #     legal_dst += [23, 55]
-    assert len(legal_dst) <= 8
-    CAN_MOVE = CAN_MOVE.at[6, from_, : len(legal_dst)].set(jnp.int8(legal_dst))
-
-assert (CAN_MOVE[0, :, :] == -1).all()
-
-CAN_MOVE_ANY = -jnp.ones((64, 35), jnp.int8)
-for from_ in range(64):
-    legal_dst = []
-    for i in range(27):
-        to = CAN_MOVE[5, from_, i]  # QUEEN
-        if to >= 0:
-            legal_dst.append(to)
-    for i in range(27):
-        to = CAN_MOVE[2, from_, i]  # KNIGHT
-        if to >= 0:
-            legal_dst.append(to)
-    CAN_MOVE_ANY = CAN_MOVE_ANY.at[from_, : len(legal_dst)].set(
-        jnp.int8(legal_dst)
+# NOTE: All tables are built by vectorized NumPy operations and converted to jnp arrays once.
+# Building them by Python loops over jnp `.at[].set()` takes seconds at import time.
+
+# board index: from_ = c * 8 + r (c: column a-h, r: row 1-8)
+_FROM = np.arange(64)
+_R, _C = _FROM % 8, _FROM // 8
+
+
+def _sorted_indices(mask, size):
+    """Sorted indices of True elements in the last axis, filled by -1 up to `size`"""
+    n = mask.shape[-1]
+    ixs = np.sort(np.where(mask, np.arange(n), n), axis=-1)[..., :size]
+    return np.where(ixs < n, ixs, -1)
+
+
+def _make_to_map_and_plane_map():
+    to_map = -np.ones((64, 73), dtype=np.int8)
+    plane_map = -np.ones((64, 64), dtype=np.int8)  # ignores underpromotion
+    # underpromotion
+    # white
+    # 8  7 15 23 31 39 47 55 63
+    # 7  6 14 22 30 38 46 54 62
+    # black
+    # 2  6 14 22 30 38 46 54 62
+    # 1  7 15 23 31 39 47 55 63
+    plane = np.arange(9)
+    to = _FROM[:, None] + np.int32([+1, +9, -7])[plane % 3][None, :]
+    ok = (_R[:, None] == 6) & (0 <= to) & (to < 64)
+    to_map[:, :9] = np.where(ok, to, -1)
+    # normal move
+    seq = np.arange(1, 8)
+    zeros = np.zeros(7, dtype=np.int32)
+    # fmt: off
+    dr = np.hstack([
+        -seq[::-1], seq,  # 下, 上
+        zeros, zeros,  # 左, 右
+        -seq[::-1], seq,  # 左下, 右上
+        seq[::-1], -seq,  # 左上, 右下
+        [-1, +1, -2, +2, -1, +1, -2, +2],  # knight moves
+    ])
+    dc = np.hstack([
+        zeros, zeros,  # 下, 上
+        -seq[::-1], seq,  # 左, 右
+        -seq[::-1], seq,  # 左下, 右上
+        -seq[::-1], seq,  # 左上, 右下
+        [-2, -2, -1, -1, +2, +2, +1, +1],  # knight moves
+    ])
+    # fmt: on
+    r = _R[:, None] + dr[None, :]
+    c = _C[:, None] + dc[None, :]
+    ok = (0 <= r) & (r < 8) & (0 <= c) & (c < 8)
+    to = np.where(ok, c * 8 + r, -1)
+    to_map[:, 9:] = to
+    from_, plane = np.nonzero(ok)
+    plane_map[from_, to[from_, plane]] = plane + 9
+    return to_map, plane_map
+
+
+def _make_can_move():
+    # usage: CAN_MOVE[piece, from_x, from_y]
+    # CAN_MOVE[0, :, :]はすべて-1
+    # 将棋と違い、中央から点対称でないので、注意が必要。
+    # 視点は常に白側のイメージが良い。
+    # PAWN以外の動きは上下左右対称。PAWNは上下と斜めへ動ける駒と定義して、手番に応じてフィルタする。
+    r0, c0 = _R[:, None], _C[:, None]  # from
+    r1, c1 = _R[None, :], _C[None, :]  # to
+    abs_dr, abs_dc = np.abs(r1 - r0), np.abs(c1 - c0)
+    not_same = _FROM[:, None] != _FROM[None, :]
+    is_rook_line = not_same & ((abs_dr == 0) | (abs_dc == 0))
+    is_bishop_line = not_same & (abs_dr == abs_dc)
+    mask = np.zeros((7, 64, 64), dtype=np.bool_)
+    # PAWN (including init move)
+    mask[1] = ((abs_dr == 1) & (abs_dc <= 1)) | (
+        ((r0 == 1) | (r0 == 6)) & (abs_dc == 0) & (abs_dr == 2)
+    )
+    # KNIGHT
+    mask[2] = ((abs_dr == 1) & (abs_dc == 2)) | ((abs_dr == 2) & (abs_dc == 1))
+    # BISHOP
+    mask[3] = is_bishop_line
+    # ROOK
+    mask[4] = is_rook_line
+    # QUEEN
+    mask[5] = is_rook_line | is_bishop_line
+    # KING
+    # castling is not included
+    mask[6] = not_same & (abs_dr <= 1) & (abs_dc <= 1)
+    can_move = _sorted_indices(mask, 27).astype(np.int8)
+    assert (can_move[0, :, :] == -1).all()
+    return can_move, mask
+
+
+def _to_bb(mask):
+    """bool (..., 64) -> uint32 (..., 2) bitboard"""
+    bits = mask.reshape(mask.shape[:-1] + (2, 32)).astype(np.uint64)
+    return (
+        (bits << np.arange(32, dtype=np.uint64)).sum(axis=-1).astype(np.uint32)
     )
 
 
+def _make_bitboards(can_move_mask, between):
+    # Direction (dc, dr) of sliding pieces.
+    # Even directions are rook directions and odd directions are bishop directions.
+    # Square index (c * 8 + r) increases along the first 4 directions.
+    directions = [
+        (0, 1),
+        (1, 1),
+        (1, 0),
+        (1, -1),
+        (0, -1),
+        (-1, -1),
+        (-1, 0),
+        (-1, 1),
+    ]
+    # rays[d, sq]: squares from sq (exclusive) to the edge along direction d
+    # rays[d, 64] is empty (sentinel)
+    rays = np.zeros((8, 65, 64), dtype=np.bool_)
+    for d, (dc, dr) in enumerate(directions):
+        for k in range(1, 8):
+            r, c = _R + k * dr, _C + k * dc
+            ok = (0 <= r) & (r < 8) & (0 <= c) & (c < 8)
+            rays[d, _FROM[ok], (c * 8 + r)[ok]] = True
+    eye = np.eye(64, dtype=np.bool_)
+    # line[a, b]: all squares on the line through a and b (empty if not aligned)
+    line = np.zeros((64, 64, 64), dtype=np.bool_)
+    for d in range(8):
+        # b is on the ray from a along d
+        full_line = rays[d, :64] | rays[(d + 4) % 8, :64] | eye
+        line |= rays[d, :64, :, None] & full_line[:, None, :]
+    # squares attacked by the pawn of current player (moving to +r direction)
+    pawn_attack = (np.abs(_C[None, :] - _C[:, None]) == 1) & (
+        _R[None, :] - _R[:, None] == 1
+    )
+    between = (between[..., None] == _FROM).any(axis=2)  # (64, 64, 64)
+    square = np.vstack([eye, np.zeros((1, 64), dtype=np.bool_)])  # (65, 64)
+    return (
+        _to_bb(rays),
+        _to_bb(line),
+        _to_bb(between),
+        _to_bb(can_move_mask[2]),  # knight
+        _to_bb(can_move_mask[6]),  # king
+        _to_bb(pawn_attack),
+        _to_bb(square),
+    )
+
+
+def _make_between():
+    r0, c0 = _R[:, None], _C[:, None]  # from
+    r1, c1 = _R[None, :], _C[None, :]  # to
+    aligned = (r1 == r0) | (c1 == c0) | (np.abs(r1 - r0) == np.abs(c1 - c0))
+    dr, dc = np.clip(r1 - r0, -1, 1), np.clip(c1 - c0, -1, 1)
+    dist = np.maximum(np.abs(r1 - r0), np.abs(c1 - c0))
+    k = np.arange(1, 7)[None, None, :]
+    r = r0[..., None] + dr[..., None] * k
+    c = c0[..., None] + dc[..., None] * k
+    ok = aligned[..., None] & (k < dist[..., None])
+    return np.where(ok, c * 8 + r, -1).astype(np.int8)
+
+
+_to_map, _plane_map = _make_to_map_and_plane_map()
+TO_MAP = jnp.array(_to_map)
+PLANE_MAP = jnp.array(_plane_map)
+
+_can_move, _can_move_mask = _make_can_move()
+CAN_MOVE = jnp.array(_can_move)
+
 # Between
-BETWEEN = -jnp.ones((64, 64, 6), dtype=jnp.int8)
-for from_ in range(64):
-    for to in range(64):
-        r0, c0 = from_ % 8, from_ // 8
-        r1, c1 = to % 8, to // 8
-        if not (
-            (jnp.abs(r1 - r0) == 0 or jnp.abs(c1 - c0) == 0)
-            or (jnp.abs(r1 - r0) == jnp.abs(c1 - c0))
-        ):
-            continue
-        dr = max(min(r1 - r0, 1), -1)
-        dc = max(min(c1 - c0, 1), -1)
-        r = r0
-        c = c0
-        bet = []
-        while True:
-            r += dr
-            c += dc
-            if r == r1 and c == c1:
-                break
-            bet.append(c * 8 + r)
-        assert len(bet) <= 6
-        BETWEEN = BETWEEN.at[from_, to, : len(bet)].set(jnp.int8(bet))
-
-INIT_LEGAL_ACTION_MASK = jnp.zeros(64 * 73, dtype=jnp.bool_)
+_between = _make_between()
+BETWEEN = jnp.array(_between)
+
+# Bitboards
+# A set of squares is represented by a pair of uint32 (bits for squares 0-31 and 32-63)
+# because uint64 is not available in JAX unless x64 is enabled.
+(
+    RAYS_BB,  # (8, 65, 2)
+    LINE_BB,  # (64, 64, 2)
+    BETWEEN_BB,  # (64, 64, 2)
+    KNIGHT_BB,  # (64, 2)
+    KING_BB,  # (64, 2)
+    PAWN_ATTACK_BB,  # (64, 2)
+    SQUARE_BB,  # (65, 2), SQUARE_BB[64] is empty
+) = (jnp.array(x) for x in _make_bitboards(_can_move_mask, _between))
+
+_init_legal_action_mask = np.zeros(64 * 73, dtype=np.bool_)
 # fmt: off
-ixs = [89, 90, 652, 656, 673, 674, 1257, 1258, 1841, 1842, 2425, 2426, 3009, 3010, 3572, 3576, 3593, 3594, 4177, 4178]
+_init_legal_action_mask[[89, 90, 652, 656, 673, 674, 1257, 1258, 1841, 1842, 2425, 2426, 3009, 3010, 3572, 3576, 3593, 3594, 4177, 4178]] = True
 # fmt: on
-for ix in ixs:
-    INIT_LEGAL_ACTION_MASK = INIT_LEGAL_ACTION_MASK.at[ix].set(True)
+INIT_LEGAL_ACTION_MASK = jnp.array(_init_legal_action_mask)
 assert INIT_LEGAL_ACTION_MASK.shape == (64 * 73,)
 assert INIT_LEGAL_ACTION_MASK.sum() == 20
 
-INIT_POSSIBLE_PIECE_POSITIONS = jnp.int8(
-    [
-        [0, 1, 8, 9, 16, 17, 24, 25, 32, 33, 40, 41, 48, 49, 56, 57],
-        [0, 1, 8, 9, 16, 17, 24, 25, 32, 33, 40, 41, 48, 49, 56, 57],
-    ]
-)  # (2, 16)
-
 key = jax.random.PRNGKey(9999)
 HASH_TABLE = jax.random.randint(
     key, shape=(64, 13, 2), minval=0, maxval=2**31 - 1, dtype=jnp.uint32
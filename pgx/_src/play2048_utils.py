@@ -0,0 +1,65 @@
+# Copyright 2023 The Pgx Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from functools import lru_cache
+from typing import Tuple
+
+import jax.numpy as jnp
+import numpy as np
+
+# A row (or column) of 4 tiles is encoded as an index: sum(row[i] << (BITS * i)).
+# 5 bits per tile cover every tile reachable on the 4x4 board (up to 2^17).
+BITS = 5
+NUM_ROWS = 1 << (4 * BITS)
+
+
+@lru_cache(maxsize=None)
+def _make_row_tables():
+    ix = np.arange(NUM_ROWS)
+    row = (ix[:, None] >> (BITS * np.arange(4))) & ((1 << BITS) - 1)
+    row = row.astype(np.int8)
+
+    def slide_left(line):
+        # stable sort moves zeros to the right keeping the order of tiles
+        order = np.argsort(line == 0, axis=1, kind="stable")
+        return np.take_along_axis(line, order, axis=1)
+
+    line = slide_left(row)
+    reward = np.zeros(NUM_ROWS, dtype=np.float32)
+    for i in range(3):
+        merged = (line[:, i] != 0) & (line[:, i] == line[:, i + 1])
+        line[merged, i] += 1
+        line[merged, i + 1] = 0
+        reward[merged] += 2.0 ** line[merged, i]
+    line = slide_left(line)
+
+    can_move_left = (line != row).any(axis=1)
+    reversed_ix = (row[:, ::-1].astype(np.int64) << (BITS * np.arange(4))).sum(
+        axis=1
+    )
+    can_move_right = can_move_left[reversed_ix]
+    return line, reward, np.stack([can_move_left, can_move_right], axis=1)
+
+
+def row_tables() -> Tuple[jnp.ndarray, jnp.ndarray, jnp.ndarray]:
+    """Tables indexed by a row, built on the first call instead of on import (about 10 MB)
+
+    Returns:
+        row after sliding to the left: (NUM_ROWS, 4)
+        score by sliding to the left: (NUM_ROWS,)
+        whether the row changes by sliding to (left, right): (NUM_ROWS, 2)
+    """
+    slide_left, reward, can_move = _make_row_tables()
+    # cached as NumPy arrays: jnp arrays created while tracing cannot outlive the trace
+    return jnp.asarray(slide_left), jnp.asarray(reward), jnp.asarray(can_move)
@@ -136,6 +136,21 @@ BETWEEN_IX = jax.jit(
 
 CAN_MOVE_ANY = can_move_any_ix(jnp.arange(81))  # (81, 36)
 
+# Can <piece,28> reach from <from,81> to <to,81> ignoring pieces on board?
+# Opponent's pieces (14-27) move like mine on the rotated board.
+CAN_MOVE_ALL = jnp.concatenate([CAN_MOVE, CAN_MOVE[:, ::-1, ::-1]])
+
+
+# Squares between <from,81> and <to,81> on the same line (filled by -1)
+@jax.jit
+@jax.vmap
+@jax.vmap
+def line_between_ix(between):
+    return jnp.nonzero(between, size=7, fill_value=-1)[0]
+
+
+LINE_BETWEEN_IX = line_between_ix(BETWEEN[1] | BETWEEN[2])  # (81, 81, 7)
+
 INIT_LEGAL_ACTION_MASK = jnp.zeros(81 * 27, dtype=jnp.bool_)
 # fmt: off
 ixs = [5, 7, 14, 23, 25, 32, 34, 41, 43, 50, 52, 59, 61, 68, 77, 79, 115, 124, 133, 142, 187, 196, 205, 214, 268, 277, 286, 295, 304, 331]
@@ -165,6 +180,14 @@ def _around(c):
 AROUND_IX = jax.vmap(_around)(jnp.arange(81))
 
 
+# Zobrist hash (2 x uint32) in black's view
+# (square, piece), (player, piece in hand, number of the pieces), and white to move
+_keys = jax.random.split(jax.random.PRNGKey(8888), 3)
+ZOBRIST_BOARD = jax.random.bits(_keys[0], shape=(81, 28, 2), dtype=jnp.uint32)
+ZOBRIST_HAND = jax.random.bits(_keys[1], shape=(2, 7, 19, 2), dtype=jnp.uint32)
+ZOBRIST_SIDE = jax.random.bits(_keys[2], shape=(2,), dtype=jnp.uint32)
+
+
 def _to_sfen(state):
     """Convert state into sfen expression.
 
@@ -12,8 +12,6 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from functools import partial
-
 import jax
 import jax.numpy as jnp
 
@@ -357,8 +355,8 @@ def _rear_distance(board: jnp.ndarray) -> jnp.ndarray:
     board上にあるcheckerについて, goal地点とcheckerの距離の最大値: 常に黒視点
     """
     b = board[:24]
-    exists = jnp.where((b > 0), size=24, fill_value=jnp.nan)[0]  # type: ignore
-    return 24 - jnp.min(jnp.nan_to_num(exists, nan=jnp.int16(100)))
+    exists = jnp.where(b > 0, jnp.arange(24, dtype=jnp.int16), 100)
+    return 24 - jnp.min(exists)
 
 
 def _is_all_on_home_board(board: jnp.ndarray) -> bool:
@@ -423,7 +421,7 @@ def _decompose_action(action: jnp.ndarray):
     return src, die, tgt
 
 
-def _is_action_legal(board: jnp.ndarray, action: jnp.ndarray) -> bool:
+def _is_action_legal(board: jnp.ndarray, action: jnp.ndarray) -> jnp.ndarray:
     """
     micro actionの合法判定
     action = src * 6 + die
@@ -521,49 +519,23 @@ def _remains_at_inner(board: jnp.ndarray) -> bool:
 
 def _legal_action_mask(board: jnp.ndarray, dice: jnp.ndarray) -> jnp.ndarray:
     no_op_mask = jnp.zeros(26 * 6 + 6, dtype=jnp.bool_).at[0:6].set(TRUE)
-    legal_action_mask = jax.vmap(
-        partial(_legal_action_mask_for_single_die, board=board)
-    )(die=dice).any(
-        axis=0
+    is_playable = (dice[:, None] == jnp.arange(6)).any(axis=0)  # (6,)
+    legal_action_matrix = _legal_action_matrix(board) & is_playable
+    legal_action_mask = jnp.concatenate(
+        (legal_action_matrix.ravel(), jnp.zeros(6, dtype=jnp.bool_))
     )  # (26*6 + 6)
-    legal_action_exists = ~(legal_action_mask.sum() == 0)
-    return (
-        legal_action_exists * legal_action_mask
-        + ~legal_action_exists * no_op_mask
+    return jax.lax.select(
+        legal_action_matrix.any(), legal_action_mask, no_op_mask
     )  # legal_actionがなければ, np_op maskを返す
 
 
-def _legal_action_mask_for_single_die(board: jnp.ndarray, die) -> jnp.ndarray:
-    """
-    一つのサイコロの目に対するlegal micro action
-    """
-    return (die == -1) * jnp.zeros(26 * 6 + 6, dtype=jnp.bool_) + (
-        die != -1
-    ) * _legal_action_mask_for_valid_single_dice(board, die)
-
-
-def _legal_action_mask_for_valid_single_dice(
-    board: jnp.ndarray, die
-) -> jnp.ndarray:
+def _legal_action_matrix(board: jnp.ndarray) -> jnp.ndarray:
     """
-    -1以外のサイコロの目に対して合法判定
+    全てのsrc(26)とサイコロの目(6)に対するlegal micro action. (26, 6)
+    _is_action_legalは要素ごとの演算なので, 全actionをまとめて判定できる.
     """
-    src_indices = jnp.arange(
-        26, dtype=jnp.int16
-    )  # 26パターンのsrcに対してlegal_actionを求める.
-
-    def _is_legal(idx: jnp.ndarray):
-        action = idx * 6 + die
-        legal_action_mask = jnp.zeros(26 * 6 + 6, dtype=jnp.bool_)
-        legal_action_mask = legal_action_mask.at[action].set(
-            _is_action_legal(board, action)
-        )
-        return legal_action_mask
-
-    legal_action_mask = jax.vmap(_is_legal)(src_indices).any(
-        axis=0
-    )  # (26*6 + 6)
-    return legal_action_mask
+    actions = jnp.arange(26 * 6, dtype=jnp.int16).reshape(26, 6)
+    return _is_action_legal(board, actions)
 
 
 def _get_abs_board(state: State) -> jnp.ndarray:
@@ -0,0 +1,204 @@
+# Copyright 2023 The Pgx Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Throughput and compile-time benchmark of Pgx environments.
+
+Usage:
+
+    python -m pgx.benchmark --env-ids go_9x9 shogi --batch-sizes 16 1024 --output result.json
+
+Each result records the compile time, steps/sec, the memory size of a single state,
+and the wall-clock time split into `init`, `step`, and `observe`.
+Random legal actions are used and terminated states are reset automatically.
+"""
+
+import argparse
+import json
+import platform
+import sys
+import time
+from typing import Dict, List, Optional, Sequence
+
+import jax
+import jax.numpy as jnp
+import numpy as np
+
+from pgx.v1 import EnvId, available_games, make, precompile
+
+
+def run(
+    env_id: EnvId,
+    batch_size: int,
+    num_steps: int = 100,
+    *,
+    device: Optional[jax.Device] = None,
+    seed: int = 0,
+) -> Dict:
+    """Benchmark batched `init`, `step`, and `observe` of an environment.
+
+    Args:
+        env_id: environment id.
+        batch_size: number of environments stepped in parallel.
+        num_steps: number of batched steps.
+        device: device to run on. Default device of JAX if `None`.
+        seed: seed of initial states and random actions.
+
+    Returns:
+        Dict: benchmark result (JSON serializable).
+    """
+    if device is None:
+        device = jax.devices()[0]
+    with jax.default_device(device):
+        return _run(env_id, batch_size, num_steps, device, seed)
+
+
+def _run(env_id, batch_size, num_steps, device, seed):
+    ts = time.perf_counter()
+    env, init, step, observe = precompile(env_id, batch_size, auto_reset=True)
+    compile_sec = time.perf_counter() - ts
+
+    act = jax.jit(_act_randomly)
+    key = jax.random.PRNGKey(seed)
+    key, subkey = jax.random.split(key)
+    keys = jax.random.split(subkey, batch_size)
+    # warmup
+    state = jax.block_until_ready(init(keys))
+    jax.block_until_ready(act(subkey, state))
+
+    ts = time.perf_counter()
+    state = jax.block_until_ready(init(keys))
+    init_sec = time.perf_counter() - ts
+
+    step_sec, observe_sec = 0.0, 0.0
+    for _ in range(num_steps):
+        key, subkey = jax.random.split(key)
+        action = jax.block_until_ready(act(subkey, state))
+        ts = time.perf_counter()
+        state = jax.block_until_ready(step(state, action))
+        step_sec += time.perf_counter() - ts
+        ts = time.perf_counter()
+        jax.block_until_ready(observe(state, state.current_player))
+        observe_sec += time.perf_counter() - ts
+
+    total_steps = batch_size * num_steps
+    return {
+        "env_id": env_id,
+        "version": env.version,
+        "platform": device.platform,
+        "device": str(device),
+        "batch_size": batch_size,
+        "num_steps": num_steps,
+        "total_steps": total_steps,
+        "compile_sec": compile_sec,
+        "init_sec": init_sec,
+        "step_sec": step_sec,
+        "observe_sec": observe_sec,
+        "steps_per_sec": total_steps / step_sec,
+        "state_bytes": state_bytes(env_id),
+    }
+
+
+def state_bytes(env_id: EnvId) -> int:
+    """Memory size of a single (unbatched) state in bytes, summed over the leaves of `State`."""
+    env = make(env_id)
+    state = jax.eval_shape(env.init, jax.random.PRNGKey(0))
+    return sum(
+        int(np.prod(x.shape)) * x.dtype.itemsize
+        for x in jax.tree_util.tree_leaves(state)
+    )
+
+
+def _act_randomly(key, state):
+    logits = jnp.log(state.legal_action_mask.astype(jnp.float32))
+    return jax.random.categorical(key, logits=logits, axis=1).astype(jnp.int32)
+
+
+def _metadata() -> Dict:
+    try:
+        from importlib.metadata import PackageNotFoundError, version
+
+        pgx_version: Optional[str] = version("pgx")
+    except (ImportError, PackageNotFoundError):
+        pgx_version = None
+    return {
+        "pgx_version": pgx_version,
+        "jax_version": jax.__version__,
+        "python_version": platform.python_version(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+    }
+
+
+def main(argv: Optional[Sequence[str]] = None) -> Dict:
+    parser = argparse.ArgumentParser(
+        prog="python -m pgx.benchmark",
+        description="Benchmark throughput and compile time of Pgx environments.",
+    )
+    parser.add_argument(
+        "--env-ids",
+        nargs="+",
+        default=list(available_games()),
+        help="environment ids (default: all of pgx.available_games())",
+    )
+    parser.add_argument(
+        "--batch-sizes", nargs="+", type=int, default=[1, 16, 256, 1024]
+    )
+    parser.add_argument("--num-steps", type=int, default=100)
+    parser.add_argument(
+        "--platforms",
+        nargs="+",
+        default=None,
+        help="JAX platforms to run on, e.g., cpu gpu (default: JAX's default backend)",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--output", default=None, help="output JSON file (default: stdout)"
+    )
+    args = parser.parse_args(argv)
+
+    if args.platforms is None:
+        devices = [jax.devices()[0]]
+    else:
+        devices = [jax.devices(p)[0] for p in args.platforms]
+
+    results: List[Dict] = []
+    for device in devices:
+        for env_id in args.env_ids:
+            for batch_size in args.batch_sizes:
+                result = run(
+                    env_id,
+                    batch_size,
+                    args.num_steps,
+                    device=device,
+                    seed=args.seed,
+                )
+                print(
+                    f"{device.platform} {env_id} batch_size={batch_size}: "
+                    f"{result['steps_per_sec']:.1f} steps/sec "
+                    f"(compile {result['compile_sec']:.1f} sec)",
+                    file=sys.stderr,
+                )
+                results.append(result)
+
+    report = {**_metadata(), "results": results}
+    if args.output is None:
+        print(json.dumps(report, indent=2))
+    else:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    return report
+
+
+if __name__ == "__main__":
+    main()
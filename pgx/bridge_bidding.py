@@ -13,9 +13,11 @@
 # limitations under the License.
 
 import copy
+import glob
 import os
 import sys
-from typing import Optional, Tuple
+from functools import partial
+from typing import Callable, List, Optional, Tuple
 
 import jax
 import jax.numpy as jnp
@@ -50,12 +52,19 @@ class State(v1.State):
     # index = 0 ~ 12がN, 13 ~ 25がE, 26 ~ 38がS, 39 ~ 51がWの持つ手札
     # 各要素にはカードを表す0 ~ 51の整数が格納される
     _hand: jnp.ndarray = jnp.zeros(52, dtype=jnp.int32)
+    # hand_bitmap 各ポジション(NESW)の手札を52枚のカードのbitmapで表したもの
+    _hand_bitmap: jnp.ndarray = jnp.zeros((4, 52), dtype=jnp.bool_)
     # bidding_history 各プレイヤーのbidを時系列順に記憶
     # 最大の行動系列長 = 319
     # 各要素には、行動を表す整数が格納される
     # bidを表す0 ~ 34, passを表す35, doubleを表す36, redoubleを表す37, 行動が行われていない-1
     # 各ビッドがどのプレイヤーにより行われたかは、要素のindexから分かる（ix % 4）
     _bidding_history: jnp.ndarray = jnp.full(319, -1, dtype=jnp.int32)
+    # obs_history 観測のbidding history部分 (424 = 4 + 3 * 4 * 35)
+    # 0 ~ 3: 最初のbid以前にpassしたポジション
+    # 4 ~ 143: 各ポジションのbid, 144 ~ 283: double, 284 ~ 423: redouble
+    # 各ポジションの行動ごとに差分更新する
+    _obs_history: jnp.ndarray = jnp.zeros(424, dtype=jnp.bool_)
     # dealer どのプレイヤーがdealerかを表す
     # 0 = N, 1 = E, 2 = S, 3 = W
     # dealerは最初にbidを行うプレイヤー
@@ -90,35 +99,90 @@ class State(v1.State):
 
 
 class BridgeBidding(v1.Env):
+    """Bridge bidding environment.
+
+    Rewards are computed from the double dummy results in the dds hash table.
+    The table is memory-mapped and kept on host (see `_load_dds_hash_table`),
+    so processes on one host share its page cache and nothing of the table is copied to the device
+    or embedded in the compiled `init` and `step`.
+    `init` fetches the sampled deal and `step` looks up the scored deals via `jax.pure_callback`.
+    Under vmap, the lookup is called once per batched step, and only if a deal is scored at the step.
+    Deals missing in the table can be solved on host by passing `dds_solver`
+    (e.g., `pgx.experimental.dds.DDSSolver`). It is called with batched keys `(..., 4)`
+    and a mask of missing keys `(...,)`, and returns the values `(..., 4)` in the same format as the table.
+    Values of masked-out keys are ignored.
+    With `random_deal=True`, deals are generated randomly instead of sampled from the table,
+    which requires `dds_solver`.
+    """
+
     def __init__(
         self,
         *,
         auto_reset: bool = False,
-        dds_hash_table_path: Optional[str] = None
+        dds_hash_table_path: Optional[str] = None,
+        dds_solver: Optional[
+            Callable[[np.ndarray, np.ndarray], np.ndarray]
+        ] = None,
+        random_deal: bool = False,
     ):
         super().__init__(auto_reset=auto_reset)
+        if random_deal and dds_solver is None:
+            raise ValueError("random_deal=True requires dds_solver")
+        self.dds_solver = dds_solver
+        self.random_deal = random_deal
         if dds_hash_table_path is None:
             dds_hash_table_path = os.path.join(
                 os.getcwd(), "dds_hash_table.npz"
             )
         try:
-            self.hash_keys, self.hash_values = jnp.load(dds_hash_table_path)
+            self.dds_hash_table = _load_dds_hash_table(dds_hash_table_path)
         except FileNotFoundError as e:
-            print(e)
-            print("Try the following methods")
-            print(
-                "1. Place the 'keys.npy' and 'values.npy' you created or downloaded in 'current_directry/dds_hash_table'"
+            if not random_deal:
+                print(e)
+                print("Try the following methods")
+                print(
+                    "1. Place the 'dds_hash_table.npz' you created or downloaded in the current directory"
+                )
+                print(
+                    "2. Give the path of the dds hash table (a file or a directory saved by `_save_dds_hash_table`) as an argument"
+                )
+                sys.exit(1)
+            # no table: all deals are solved by dds_solver
+            self.dds_hash_table = _DDSHashTable(
+                [], np.zeros((0, 4), dtype=np.int32)
             )
-            print("2. Give the path of the dds hash table as an argument")
-            sys.exit(1)
+        # created once so that the compiled step is cached
+        self._dds_lookup = partial(
+            _lookup_dds_on_host, self.dds_hash_table, dds_solver
+        )
+
+    @property
+    def hash_keys(self) -> np.ndarray:
+        """All keys of the dds hash table (copied to host memory if the table is sharded)"""
+        return self.dds_hash_table.hash_keys
+
+    @property
+    def hash_values(self) -> np.ndarray:
+        """All values of the dds hash table (copied to host memory if the table is sharded)"""
+        return self.dds_hash_table.hash_values
 
     def _init(self, key: jax.random.KeyArray) -> State:
         key1, key2, key3 = jax.random.split(key, num=3)
-        return _init_by_key(jax.random.choice(key2, self.hash_keys), key3)
+        if self.random_deal:
+            return init(key2)
+        # same as jax.random.choice over the keys of the table
+        ix = jax.random.randint(key2, (), 0, len(self.dds_hash_table))
+        deal = jax.pure_callback(
+            self.dds_hash_table.take,
+            jax.ShapeDtypeStruct((4,), jnp.int32),
+            ix,
+            vectorized=True,
+        )
+        return _init_by_key(deal, key3)
 
     def _step(self, state: v1.State, action: jnp.ndarray) -> State:
         assert isinstance(state, State)
-        return _step(state, action, self.hash_keys, self.hash_values)
+        return _step(state, action, None, None, dds_solver=self._dds_lookup)
 
     def _observe(self, state: v1.State, player_id: jnp.ndarray) -> jnp.ndarray:
         assert isinstance(state, State)
@@ -160,6 +224,7 @@ def init(rng: jax.random.KeyArray) -> State:
         _shuffled_players=shuffled_players,
         current_player=current_player,
         _hand=hand,
+        _hand_bitmap=_hand_to_bitmap(hand),
         _dealer=dealer,
         _vul_NS=vul_NS,
         _vul_EW=vul_EW,
@@ -187,6 +252,7 @@ def _init_by_key(key: jnp.ndarray, rng: jax.random.KeyArray) -> State:
         _shuffled_players=shuffled_players,
         current_player=current_player,
         _hand=hand,
+        _hand_bitmap=_hand_to_bitmap(hand),
         _dealer=dealer,
         _vul_NS=vul_NS,
         _vul_EW=vul_EW,
@@ -195,6 +261,16 @@ def _init_by_key(key: jnp.ndarray, rng: jax.random.KeyArray) -> State:
     return state
 
 
+@jax.jit
+def _hand_to_bitmap(hand: jnp.ndarray) -> jnp.ndarray:
+    """Convert hand (52 cards in NESW order) to bitmaps of each position (4, 52)"""
+    return (
+        jnp.zeros((4, 52), dtype=jnp.bool_)
+        .at[jnp.arange(4).repeat(13), hand]
+        .set(True)
+    )
+
+
 @jax.jit
 def _shuffle_players(rng: jax.random.KeyArray) -> jnp.ndarray:
     """Randomly arranges player IDs in a list in NESW order.
@@ -251,16 +327,24 @@ def _player_position(player: jnp.ndarray, state: State) -> jnp.ndarray:
     )
 
 
-@jax.jit
+@partial(jax.jit, static_argnames=("dds_solver",))
 def _step(
     state: State,
     action: int,
-    hash_keys: jnp.ndarray,
-    hash_values: jnp.ndarray,
+    hash_keys: Optional[jnp.ndarray],
+    hash_values: Optional[jnp.ndarray],
+    dds_solver: Optional[Callable] = None,
 ) -> State:
     # fmt: off
     state = state.replace(_bidding_history=state._bidding_history.at[state._turn].set(action))  # type: ignore
     # fmt: on
+    # Under vmap, all the branches below are computed for every state.
+    # The mask of the deals actually scored at this step keeps dds_solver from solving the others.
+    is_scored = (
+        (action == 35)
+        & _is_terminated(_state_pass(state))
+        & (state._last_bid != -1)
+    )
     return jax.lax.cond(
         action >= 35,
         lambda: jax.lax.switch(
@@ -269,7 +353,11 @@ def _step(
                 lambda: jax.lax.cond(
                     _is_terminated(_state_pass(state)),
                     lambda: _terminated_step(
-                        _state_pass(state), hash_keys, hash_values
+                        _state_pass(state),
+                        hash_keys,
+                        hash_values,
+                        dds_solver=dds_solver,
+                        is_scored=is_scored,
                     ),
                     lambda: _continue_step(_state_pass(state)),
                 ),
@@ -286,74 +374,17 @@ def _observe(state: State, player_id: jnp.ndarray) -> jnp.ndarray:
     """Returns the observation of a given player"""
     # make vul of observation
     vul = jnp.array([state._vul_NS, state._vul_EW], dtype=jnp.bool_)
-
     # make hand of observation
-    hand = jnp.zeros(52, dtype=jnp.bool_)
-    position = _player_position(player_id, state).astype(jnp.int16)
-    hand = jax.lax.fori_loop(
-        position * 13,
-        (position + 1) * 13,
-        lambda i, hand: hand.at[state._hand[i]].set(True),
-        hand,
-    )
-
-    # make history of observation
-    obs_history = jnp.zeros(424, dtype=jnp.bool_)
-    last_bid = jnp.int16(-1)
-    flag = FALSE
-    obs_history, last_bid, flag, state = jax.lax.fori_loop(
-        0,
-        state._turn.astype(jnp.int32),
-        _make_obs_history,
-        (obs_history, last_bid, flag, state),
-    )
-    return jnp.concatenate((vul, obs_history, hand))
+    position = _player_position(player_id, state)
+    hand = state._hand_bitmap[position]
+    # history of observation is updated at each step
+    return jnp.concatenate((vul, state._obs_history, hand))
 
 
 @jax.jit
-def _make_obs_history(i, vals):
-    obs_history, last_bid, flag, state = vals
-    curr_pos = ((state._dealer + i) % 4).astype(jnp.int16)
-    return jax.lax.cond(
-        (flag != jnp.bool_(True)) & (state._bidding_history[i] == 35),
-        lambda: (obs_history.at[curr_pos].set(True), last_bid, flag, state),
-        lambda: jax.lax.cond(
-            (0 <= state._bidding_history[i])
-            & (state._bidding_history[i] <= 34),
-            lambda: (
-                obs_history.at[
-                    4
-                    + curr_pos * 35
-                    + state._bidding_history[i].astype(jnp.int16)
-                ].set(True),
-                state._bidding_history[i].astype(jnp.int16),
-                jnp.bool_(True),
-                state,
-            ),
-            lambda: jax.lax.switch(
-                state._bidding_history[i] - 35,
-                [
-                    lambda: (obs_history, last_bid, flag, state),
-                    lambda: (
-                        obs_history.at[144 + curr_pos * 35 + last_bid].set(
-                            True
-                        ),
-                        last_bid,
-                        flag,
-                        state,
-                    ),
-                    lambda: (
-                        obs_history.at[284 + curr_pos * 35 + last_bid].set(
-                            True
-                        ),
-                        last_bid,
-                        flag,
-                        state,
-                    ),
-                ],
-            ),
-        ),
-    )
+def _current_position(state: State) -> jnp.ndarray:
+    """Position (0 = N, 1 = E, 2 = S, 3 = W) of the player taking the action at this turn"""
+    return ((state._dealer + state._turn) % 4).astype(jnp.int32)
 
 
 @jax.jit
@@ -372,15 +403,23 @@ def duplicate(
     return duplicated_state
 
 
-@jax.jit
+@partial(jax.jit, static_argnames=("dds_solver",))
 def _terminated_step(
     state: State,
-    hash_keys: jnp.ndarray,
-    hash_values: jnp.ndarray,
+    hash_keys: Optional[jnp.ndarray],
+    hash_values: Optional[jnp.ndarray],
+    dds_solver: Optional[Callable] = None,
+    is_scored: jnp.ndarray = TRUE,
 ) -> State:
     """Return state if the game is successfully completed"""
     terminated = jnp.bool_(True)
-    reward = _reward(state, hash_keys, hash_values)
+    reward = _reward(
+        state,
+        hash_keys,
+        hash_values,
+        dds_solver=dds_solver,
+        is_scored=is_scored,
+    )
     # fmt: off
     return state.replace(terminated=terminated, reward=reward)  # type: ignore
     # fmt: on
@@ -419,11 +458,13 @@ def _is_terminated(state: State) -> bool:
     )
 
 
-@jax.jit
+@partial(jax.jit, static_argnames=("dds_solver",))
 def _reward(
     state: State,
-    hash_keys: jnp.ndarray,
-    hash_values: jnp.ndarray,
+    hash_keys: Optional[jnp.ndarray],
+    hash_values: Optional[jnp.ndarray],
+    dds_solver: Optional[Callable] = None,
+    is_scored: jnp.ndarray = TRUE,
 ) -> jnp.ndarray:
     """Return reward
     If pass out, 0 reward for everyone; if bid, calculate and return reward
@@ -432,16 +473,22 @@ def _reward(
         (state._last_bid == -1) & (state._pass_num == 4),
         lambda: jnp.zeros(4, dtype=jnp.float32),  # pass out
         lambda: _make_reward(  # caluculate reward
-            state, hash_keys, hash_values
+            state,
+            hash_keys,
+            hash_values,
+            dds_solver=dds_solver,
+            is_scored=is_scored,
         ),
     )
 
 
-@jax.jit
+@partial(jax.jit, static_argnames=("dds_solver",))
 def _make_reward(
     state: State,
-    hash_keys: jnp.ndarray,
-    hash_values: jnp.ndarray,
+    hash_keys: Optional[jnp.ndarray],
+    hash_values: Optional[jnp.ndarray],
+    dds_solver: Optional[Callable] = None,
+    is_scored: jnp.ndarray = TRUE,
 ) -> jnp.ndarray:
     """Calculate rewards for each player by dds results
 
@@ -451,7 +498,13 @@ def _make_reward(
     # Extract contract from state
     declare_position, denomination, level, vul = _contract(state)
     # Calculate trick table from hash table
-    dds_tricks = _calculate_dds_tricks(state, hash_keys, hash_values)
+    dds_tricks = _calculate_dds_tricks(
+        state,
+        hash_keys,
+        hash_values,
+        dds_solver=dds_solver,
+        is_scored=is_scored,
+    )
     # Calculate the tricks you could have accomplished with this contraption
     dds_trick = dds_tricks[declare_position * 5 + denomination]
     # Clculate score
@@ -672,27 +725,47 @@ def _state_pass(
     state: State,
 ) -> State:
     """Change state if pass is taken"""
-    return state.replace(_pass_num=state._pass_num + 1)  # type: ignore
+    # 最初のbid以前のpassのみ観測に含める
+    # (pass outを決める4回目のpassは含めない)
+    ix = _current_position(state)
+    obs_history = state._obs_history.at[ix].set(
+        state._obs_history[ix]
+        | ((state._last_bid == -1) & (state._pass_num < 3))
+    )
+    return state.replace(  # type: ignore
+        _pass_num=state._pass_num + 1, _obs_history=obs_history
+    )
 
 
 @jax.jit
 def _state_X(state: State) -> State:
     """Change state if double(X) is taken"""
-    return state.replace(_call_x=jnp.bool_(True), _pass_num=jnp.int32(0))  # type: ignore
+    ix = 144 + _current_position(state) * 35 + state._last_bid
+    return state.replace(  # type: ignore
+        _call_x=jnp.bool_(True),
+        _pass_num=jnp.int32(0),
+        _obs_history=state._obs_history.at[ix].set(True),
+    )
 
 
 @jax.jit
 def _state_XX(state: State) -> State:
     """Change state if double(XX) is taken"""
-    return state.replace(_call_xx=jnp.bool_(True), _pass_num=jnp.int32(0))  # type: ignore
+    ix = 284 + _current_position(state) * 35 + state._last_bid
+    return state.replace(  # type: ignore
+        _call_xx=jnp.bool_(True),
+        _pass_num=jnp.int32(0),
+        _obs_history=state._obs_history.at[ix].set(True),
+    )
 
 
 @jax.jit
 def _state_bid(state: State, action: int) -> State:
     """Change state if bid is taken"""
+    ix = 4 + _current_position(state) * 35 + action
     # 最後のbidとそのプレイヤーを保存
     # fmt: off
-    state = state.replace(_last_bid=jnp.int32(action), _last_bidder=state.current_player)  # type: ignore
+    state = state.replace(_last_bid=jnp.int32(action), _last_bidder=state.current_player, _obs_history=state._obs_history.at[ix].set(True))  # type: ignore
     # fmt: on
     # チーム内で各denominationを最初にbidしたプレイヤー
     denomination = _bid_to_denomination(action)
@@ -889,36 +962,273 @@ def _value_to_dds_tricks(value: jnp.ndarray) -> jnp.ndarray:
     return jnp.array(hex_digits, dtype=jnp.int32)
 
 
-@jax.jit
+@partial(jax.jit, static_argnames=("dds_solver",))
 def _calculate_dds_tricks(
     state: State,
-    hash_keys: jnp.ndarray,
-    hash_values: jnp.ndarray,
+    hash_keys: Optional[jnp.ndarray],
+    hash_values: Optional[jnp.ndarray],
+    dds_solver: Optional[Callable] = None,
+    is_scored: jnp.ndarray = TRUE,
 ) -> jnp.ndarray:
+    """Calculate dds tricks of the deal from the hash table on device.
+    If `dds_solver` is given, the deal missing in the table is solved on host
+    unless `is_scored` is False.
+    If the table is None (kept on host), the deal is looked up by `dds_solver`
+    (see `_lookup_dds_on_host`) unless `is_scored` is False.
+    """
     key = _state_to_key(state)
-    return _value_to_dds_tricks(
-        _find_value_from_key(key, hash_keys, hash_values)
-    )
+    if hash_keys is None or hash_values is None:
+        assert dds_solver is not None
+        return _value_to_dds_tricks(
+            _call_dds_on_host(dds_solver, key, is_scored)
+        )
+    ix = _find_index_from_key(key, hash_keys)
+    value = hash_values[ix]
+    if dds_solver is not None:
+        is_missing = (hash_keys[ix] != key).any() & is_scored
+        value = jnp.where(
+            is_missing, _call_dds_on_host(dds_solver, key, is_missing), value
+        )
+    return _value_to_dds_tricks(value)
+
+
+def _call_dds_on_host(
+    dds_solver: Callable, key: jnp.ndarray, is_missing: jnp.ndarray
+) -> jnp.ndarray:
+    """Values of the missing keys computed by `dds_solver` on host (zeros for the others).
+    Under vmap, `dds_solver` is called once for the batch and only if any key is missing,
+    so that no host callback (and synchronization) happens at steps without missing deals.
+    """
+
+    def solve(key, is_missing):
+        return jax.lax.cond(
+            is_missing.any(),
+            lambda: jax.pure_callback(
+                dds_solver,
+                jax.ShapeDtypeStruct(key.shape, key.dtype),
+                key,
+                is_missing,
+                vectorized=True,
+            ),
+            lambda: jnp.zeros_like(key),
+        )
+
+    @jax.custom_batching.custom_vmap
+    def _solve(key, is_missing):
+        return solve(key, is_missing)
+
+    @_solve.def_vmap
+    def _solve_batched(axis_size, in_batched, key, is_missing):
+        # the predicate of cond is not batched here
+        key_batched, is_missing_batched = in_batched
+        if not key_batched:
+            key = jnp.broadcast_to(key, (axis_size,) + key.shape)
+        if not is_missing_batched:
+            is_missing = jnp.broadcast_to(
+                is_missing, (axis_size,) + is_missing.shape
+            )
+        return solve(key, is_missing), True
+
+    return _solve(key, is_missing)
+
+
+def _lookup_dds_on_host(
+    table: "_DDSHashTable",
+    dds_solver: Optional[Callable],
+    keys: np.ndarray,
+    is_scored: np.ndarray,
+) -> np.ndarray:
+    """Values of the scored `keys` (..., 4) in the host-side table (zeros for the others).
+    Deals missing in the table are solved by `dds_solver` if given.
+    """
+    keys = np.asarray(keys, dtype=np.int32)
+    is_scored = np.broadcast_to(np.asarray(is_scored), keys.shape[:-1])
+    values = np.zeros(keys.shape, dtype=np.int32)
+    is_found = np.zeros(keys.shape[:-1], dtype=np.bool_)
+    values[is_scored], is_found[is_scored] = table.lookup(keys[is_scored])
+    is_missing = is_scored & ~is_found
+    if dds_solver is not None and is_missing.any():
+        values = np.where(
+            is_missing[..., None], dds_solver(keys, is_missing), values
+        )
+    return values
 
 
 @jax.jit
 def _find_value_from_key(
     key: jnp.ndarray, hash_keys: jnp.ndarray, hash_values: jnp.ndarray
 ):
-    """Find a value matching key without batch processing
+    """Find a value matching key by binary search in O(log N).
+    `hash_keys` must be sorted lexicographically (see `_sort_hash_table`).
     >>> VALUES = jnp.arange(20).reshape(5, 4)
     >>> KEYS = jnp.arange(20).reshape(5, 4)
     >>> key = jnp.arange(4, 8)
     >>> _find_value_from_key(key, KEYS, VALUES)
     Array([4, 5, 6, 7], dtype=int32)
     """
-    mask = jnp.where(
-        jnp.all((hash_keys == key), axis=1),
-        jnp.ones(1, dtype=np.bool_),
-        jnp.zeros(1, dtype=np.bool_),
+    return hash_values[_find_index_from_key(key, hash_keys)]
+
+
+@jax.jit
+def _find_index_from_key(key: jnp.ndarray, hash_keys: jnp.ndarray):
+    """Index of the first key not less than `key` (clipped to the last index)"""
+    n = hash_keys.shape[0]
+
+    def _search(i, x):
+        lo, hi = x
+        mid = (lo + hi) // 2
+        is_less = _is_lexicographically_less(hash_keys[mid], key)
+        return jax.lax.select(is_less, mid + 1, lo), jax.lax.select(
+            is_less, hi, mid
+        )
+
+    ix, _ = jax.lax.fori_loop(
+        0, n.bit_length(), _search, (jnp.int32(0), jnp.int32(n))
     )
-    ix = jnp.argmax(mask)
-    return hash_values[ix]
+    return jnp.minimum(ix, n - 1)
+
+
+def _is_lexicographically_less(x: jnp.ndarray, y: jnp.ndarray):
+    is_diff = x != y
+    ix = jnp.argmax(is_diff)
+    return is_diff[ix] & (x[ix] < y[ix])
+
+
+def _sort_hash_table(
+    hash_keys: np.ndarray, hash_values: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Sort dds hash table by keys for binary search (on host)"""
+    hash_keys, hash_values = np.asarray(hash_keys), np.asarray(hash_values)
+    ix = np.lexsort(hash_keys.T[::-1])
+    return hash_keys[ix], hash_values[ix]
+
+
+def _load_dds_hash_table(path: str) -> "_DDSHashTable":
+    """Load dds hash table kept on host from a directory saved by `_save_dds_hash_table`
+    or from a single file.
+
+    Each file stores keys and values stacked in an array of shape (2, N, 4).
+    The shards in a directory are memory-mapped, and the table is never copied to the device.
+    Its `index.npy` (the first key of each shard) is written after the sorted shards
+    and marks the table as sorted, so loading does not read the shards themselves.
+    A single file (e.g., the downloaded `dds_hash_table.npz`) is not known to be sorted,
+    so it is read and sorted in host memory on load.
+    Save it once by `_save_dds_hash_table` to load it in constant time.
+    """
+    if not os.path.isdir(path):
+        table = np.load(path)
+        keys, values = _sort_hash_table(table[0], table[1])
+        return _DDSHashTable([np.stack([keys, values])], keys[:1])
+    index_path = os.path.join(path, "index.npy")
+    if not os.path.exists(index_path):
+        raise FileNotFoundError(
+            f"No index of dds hash table found in {path}. Save the table by `_save_dds_hash_table`"
+        )
+    files = sorted(glob.glob(os.path.join(path, "[0-9]*.npy")))
+    first_keys = np.load(index_path)
+    if len(files) != len(first_keys):
+        raise ValueError(
+            f"{len(files)} shards found in {path}, but the index has {len(first_keys)}"
+        )
+    return _DDSHashTable(
+        [np.load(f, mmap_mode="r") for f in files], first_keys
+    )
+
+
+def _save_dds_hash_table(
+    path: str,
+    hash_keys: np.ndarray,
+    hash_values: np.ndarray,
+    num_shards: int = 1,
+):
+    """Sort dds hash table and save it to the directory `path` as `num_shards` shards and their index"""
+    hash_keys, hash_values = _sort_hash_table(hash_keys, hash_values)
+    os.makedirs(path, exist_ok=True)
+    shards = [
+        (keys, values)
+        for keys, values in zip(
+            np.array_split(hash_keys, num_shards),
+            np.array_split(hash_values, num_shards),
+        )
+        if len(keys) > 0
+    ]
+    for i, (keys, values) in enumerate(shards):
+        np.save(os.path.join(path, f"{i:05d}.npy"), np.stack([keys, values]))
+    # written last: the shards are complete and sorted
+    np.save(
+        os.path.join(path, "index.npy"),
+        np.array([keys[0] for keys, _ in shards], dtype=np.int32).reshape(
+            -1, 4
+        ),
+    )
+
+
+# keys compared lexicographically by np.searchsorted
+_KEY_DTYPE = np.dtype([(f"k{i}", np.int32) for i in range(4)])
+
+
+def _to_records(keys: np.ndarray) -> np.ndarray:
+    """View keys (..., 4) as records (...,) without copying them"""
+    keys = np.ascontiguousarray(keys, dtype=np.int32)
+    return keys.view(_KEY_DTYPE)[..., 0]
+
+
+class _DDSHashTable:
+    """Sorted dds hash table kept on host as (memory-mapped) shards of shape (2, N, 4).
+    Key ranges of the shards are ascending, and `first_keys` is the first key of each shard.
+    """
+
+    def __init__(self, shards: List[np.ndarray], first_keys: np.ndarray):
+        self.shards = shards
+        self.first_keys = _to_records(first_keys)
+        self.offsets = np.cumsum([0] + [shard.shape[1] for shard in shards])
+
+    def __len__(self) -> int:
+        return int(self.offsets[-1])
+
+    @property
+    def hash_keys(self) -> np.ndarray:
+        return np.concatenate(
+            [np.zeros((0, 4), dtype=np.int32)] + [s[0] for s in self.shards]
+        )
+
+    @property
+    def hash_values(self) -> np.ndarray:
+        return np.concatenate(
+            [np.zeros((0, 4), dtype=np.int32)] + [s[1] for s in self.shards]
+        )
+
+    def take(self, ix: np.ndarray) -> np.ndarray:
+        """Keys (..., 4) at the indices `ix` (...,)"""
+        ix = np.asarray(ix)
+        shard_ix = np.searchsorted(self.offsets, ix, side="right") - 1
+        keys = np.zeros(ix.shape + (4,), dtype=np.int32)
+        for i in np.unique(shard_ix):
+            mask = shard_ix == i
+            keys[mask] = self.shards[i][0][ix[mask] - self.offsets[i]]
+        return keys
+
+    def lookup(self, keys: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Values of `keys` (M, 4) found by binary search in O(log N), and whether they are found"""
+        records = _to_records(keys)
+        values = np.zeros((len(keys), 4), dtype=np.int32)
+        is_found = np.zeros(len(keys), dtype=np.bool_)
+        if not self.shards:
+            return values, is_found
+        # shard whose key range may contain the key
+        shard_ix = np.maximum(
+            np.searchsorted(self.first_keys, records, side="right") - 1, 0
+        )
+        for i in np.unique(shard_ix):
+            mask = shard_ix == i
+            shard_keys, shard_values = self.shards[i][0], self.shards[i][1]
+            ix = np.minimum(
+                np.searchsorted(_to_records(shard_keys), records[mask]),
+                len(shard_keys) - 1,
+            )
+            values[mask] = shard_values[ix]
+            is_found[mask] = (shard_keys[ix] == keys[mask]).all(axis=1)
+        return values, is_found
 
 
 def _load_sample_hash() -> Tuple[jnp.ndarray, jnp.ndarray]:
@@ -17,13 +17,17 @@ import jax.numpy as jnp
 
 import pgx.v1 as v1
 from pgx._src.chess_utils import (  # type: ignore
-    BETWEEN,
+    BETWEEN_BB,
     CAN_MOVE,
-    CAN_MOVE_ANY,
     HASH_TABLE,
     INIT_LEGAL_ACTION_MASK,
-    INIT_POSSIBLE_PIECE_POSITIONS,
+    KING_BB,
+    KNIGHT_BB,
+    LINE_BB,
+    PAWN_ATTACK_BB,
     PLANE_MAP,
+    RAYS_BB,
+    SQUARE_BB,
     TO_MAP,
 )
 from pgx._src.struct import dataclass
@@ -38,6 +42,10 @@ BISHOP = jnp.int8(3)
 ROOK = jnp.int8(4)
 QUEEN = jnp.int8(5)
 KING = jnp.int8(6)
+
+# Positions since the last pawn move or capture (at most 100 plies + current position).
+# Earlier positions can never be repeated, so only these are kept for repetition detection.
+HASH_HISTORY_LENGTH = 101
 # OPP_PAWN = -1
 # OPP_KNIGHT = -2
 # OPP_BISHOP = -3
@@ -124,13 +132,12 @@ class State(v1.State):
     _halfmove_count: jnp.ndarray = jnp.int32(0)
     _fullmove_count: jnp.ndarray = jnp.int32(1)  # increase every black move
     _zobrist_hash: jnp.ndarray = jnp.uint32([1429435994, 901419182])
+    # Ring buffer. Hash after `_step_count` plies is stored at `_step_count % HASH_HISTORY_LENGTH`
     _hash_history: jnp.ndarray = (
-        jnp.zeros((1001, 2), dtype=jnp.uint32)
+        jnp.zeros((HASH_HISTORY_LENGTH, 2), dtype=jnp.uint32)
         .at[0]
         .set(jnp.uint32([1429435994, 901419182]))
     )
-    # index to possible piece positions for speeding up. Flips every turn.
-    _possible_piece_positions: jnp.ndarray = INIT_POSSIBLE_PIECE_POSITIONS
 
     @property
     def env_id(self) -> v1.EnvId:
@@ -238,13 +245,13 @@ def _step(state: State, action: jnp.ndarray):
 
 def _check_termination(state: State):
     has_legal_action = state.legal_action_mask.any()
-    rep = (state._hash_history == state._zobrist_hash).any(axis=1).sum() - 1
+    rep = _num_repetitions(state)
     terminated = ~has_legal_action
     terminated |= state._halfmove_count >= 100
     terminated |= has_insufficient_pieces(state)
     terminated |= rep >= 2
 
-    is_checkmate = (~has_legal_action) & _is_checking(_flip(state))
+    is_checkmate = (~has_legal_action) & _is_checked(state)
     # fmt: off
     reward = jax.lax.select(
         is_checkmate,
@@ -387,13 +394,6 @@ def _apply_move(state: State, a: Action):
     state = state.replace(  # type: ignore
         _board=state._board.at[a.from_].set(EMPTY).at[a.to].set(piece)
     )
-    # update possible piece positions
-    ix = jnp.argmin(jnp.abs(state._possible_piece_positions[0, :] - a.from_))
-    state = state.replace(  # type: ignore
-        _possible_piece_positions=state._possible_piece_positions.at[
-            0, ix
-        ].set(a.to)
-    )
     return state
 
 
@@ -421,179 +421,238 @@ def _flip(state: State) -> State:
         _en_passant=_flip_pos(state._en_passant),
         _can_castle_queen_side=state._can_castle_queen_side[::-1],
         _can_castle_king_side=state._can_castle_king_side[::-1],
-        _possible_piece_positions=state._possible_piece_positions[::-1],
     )
 
 
 def _legal_action_mask(state):
-    def is_legal(a: Action):
-        ok = _is_pseudo_legal(state, a)
-        next_s = _flip(_apply_move(state, a))
-        ok &= ~_is_checking(next_s)
+    """Legal action mask computed by bitboards.
 
-        return ok
+    A set of squares is represented by a bitboard (pair of uint32, see `chess_utils`).
+    Pseudo-legal moves are filtered by
 
-    @jax.vmap
-    def legal_norml_moves(from_):
-        piece = state._board[from_]
-
-        @jax.vmap
-        def legal_label(to):
-            a = Action(from_=from_, to=to)
-            return jax.lax.select(
-                (from_ >= 0) & (piece > 0) & (to >= 0) & is_legal(a),
-                a._to_label(),
-                jnp.int32(-1),
-            )
-
-        return legal_label(CAN_MOVE[piece, from_])
-
-    def legal_underpromotions(mask):
-        # from_ = 6 14 22 30 38 46 54 62
-        # plane = 0 ... 8
-        @jax.vmap
-        def make_labels(from_):
-            return from_ * 73 + jnp.arange(9)
-
-        labels = make_labels(
-            jnp.int32([6, 14, 22, 30, 38, 46, 54, 62])
-        ).flatten()
-
-        @jax.vmap
-        def legal_labels(label):
-            a = Action._from_label(label)
-            ok = (state._board[a.from_] == PAWN) & (a.to >= 0)
-            ok &= mask[Action(from_=a.from_, to=a.to)._to_label()]
-            return jax.lax.select(ok, label, -1)
-
-        ok_labels = legal_labels(labels)
-        return ok_labels.flatten()
-
-    def legal_en_passants():
-        to = state._en_passant
-
-        @jax.vmap
-        def legal_labels(from_):
-            ok = (
-                (from_ >= 0)
-                & (from_ < 64)
-                & (to >= 0)
-                & (state._board[from_] == PAWN)
-                & (state._board[to - 1] == -PAWN)
-            )
-            a = Action(from_=from_, to=to)
-            ok &= ~_is_checking(_flip(_apply_move(state, a)))
-            return jax.lax.select(ok, a._to_label(), -1)
-
-        return legal_labels(jnp.int32([to - 9, to + 7]))
-
-    def can_castle_king_side():
-        ok = state._board[32] == KING
-        ok &= state._board[56] == ROOK
-        ok &= state._can_castle_king_side[0]
-        ok &= state._board[40] == EMPTY
-        ok &= state._board[48] == EMPTY
-
-        @jax.vmap
-        def is_ok(label):
-            return ~_is_checking(
-                _flip(_apply_move(state, Action._from_label(label)))
-            )
-
-        ok &= ~_is_checking(_flip(state))
-        ok &= is_ok(jnp.int32([2366, 2367])).all()
-
-        return ok
+    - check: if checked, the move must capture the checking piece or block between the king and the checking piece
+    - pin: pinned piece can only move along the line through the king
+    - king move: destination must not be attacked
+    """
+    board = state._board
+    pieces, occ = _to_bitboards(board)
+    mine = _to_bb(board > 0)
+    opp = occ & ~mine
+    king_pos = jnp.argmax(board == KING)
+    ALL = jnp.uint32([0xFFFFFFFF, 0xFFFFFFFF])
+    ZERO = jnp.uint32([0, 0])
+
+    # pseudo-legal moves from each square (except king)
+    sq = jnp.arange(64)
+    slide = _sliding_attacks(sq, occ)  # (8, 64, 2)
+    rook_attacks = _reduce_or(slide[0::2])
+    bishop_attacks = _reduce_or(slide[1::2])
+    is_empty = board == EMPTY
+    single_push = (sq % 8 < 7) & is_empty[jnp.minimum(sq + 1, 63)]
+    double_push = (sq % 8 == 1) & single_push & is_empty[sq + 2 - (sq == 63)]
+    pawn_moves = (
+        SQUARE_BB[jnp.where(single_push, sq + 1, 64)]
+        | SQUARE_BB[jnp.where(double_push, sq + 2, 64)]
+        | (PAWN_ATTACK_BB & opp)
+    )
+    piece = board[:, None]
+    # fmt: off
+    moves = (
+        jnp.where(piece == PAWN, pawn_moves, ZERO)
+        | jnp.where(piece == KNIGHT, KNIGHT_BB, ZERO)
+        | jnp.where((piece == BISHOP) | (piece == QUEEN), bishop_attacks, ZERO)
+        | jnp.where((piece == ROOK) | (piece == QUEEN), rook_attacks, ZERO)
+    ) & ~mine
+    # fmt: on
 
-    def can_castle_queen_side():
-        ok = state._board[32] == KING
-        ok &= state._board[0] == ROOK
-        ok &= state._can_castle_queen_side[0]
-        ok &= state._board[8] == EMPTY
-        ok &= state._board[16] == EMPTY
-        ok &= state._board[24] == EMPTY
+    # check
+    checkers = _attackers(king_pos, occ, pieces)
+    num_checkers = jax.lax.population_count(checkers).sum()
+    checker_pos = jnp.minimum(_lsb(checkers), 63)
+    check_mask = jax.lax.select(
+        num_checkers == 0,
+        ALL,
+        jax.lax.select(
+            num_checkers == 1,
+            checkers | BETWEEN_BB[king_pos, checker_pos],
+            ZERO,
+        ),
+    )
 
-        @jax.vmap
-        def is_ok(label):
-            return ~_is_checking(
-                _flip(_apply_move(state, Action._from_label(label)))
-            )
+    # pin
+    rays = RAYS_BB[:, king_pos]  # (8, 2)
+    blocker = _first_blocker(rays & occ)
+    xray_blocker = _first_blocker(rays & occ & ~SQUARE_BB[blocker])
+    opp_sliders = _opp_sliders(pieces)  # (8, 2)
+    is_pinned = _is_in(blocker, mine) & _is_in(xray_blocker, opp_sliders)
+    is_pinned = (is_pinned[:, None] & (blocker[:, None] == sq)).any(axis=0)
+    pin_mask = jnp.where(is_pinned[:, None], LINE_BB[king_pos], ALL)
 
-        ok &= ~_is_checking(_flip(state))
-        ok &= is_ok(jnp.int32([2364, 2365])).all()
+    moves = moves & check_mask & pin_mask
 
-        return ok
+    # king moves
+    occ_wo_king = occ & ~SQUARE_BB[king_pos]
 
-    actions = legal_norml_moves(
-        state._possible_piece_positions[0]
-    ).flatten()  # include -1
+    @jax.vmap
+    def is_safe(to):
+        return ~_attackers(to, occ_wo_king, pieces).any()
+
+    king_to = CAN_MOVE[KING, king_pos, :8]  # -1 padded
+    king_to = jnp.where(is_safe(king_to), king_to, -1)
+    king_moves = _reduce_or(SQUARE_BB[king_to]) & ~mine
+    moves = moves.at[king_pos].set(king_moves)
+
+    # (from, to) => (from, plane)
+    is_legal = _from_bb(moves)  # (64, 64)
+    is_legal = jnp.take_along_axis(is_legal, jnp.int32(TO_MAP) % 64, axis=1)
+    is_legal &= TO_MAP >= 0
+    # underpromotions
+    is_legal = is_legal.at[:, :9].set(
+        is_legal[:, :9] & (board == PAWN)[:, None]
+    )
     # +1 is to avoid setting True to the last element
     mask = jnp.zeros(64 * 73 + 1, dtype=jnp.bool_)
-    mask = mask.at[actions].set(TRUE)
+    mask = mask.at[:-1].set(is_legal.flatten())
 
     # castling
-    mask = mask.at[2364].set(
-        jax.lax.select(can_castle_queen_side(), TRUE, mask[2364])
+    can_castle_queen_side = (
+        (board[32] == KING)
+        & (board[0] == ROOK)
+        & state._can_castle_queen_side[0]
+        & (board[8] == EMPTY)
+        & (board[16] == EMPTY)
+        & (board[24] == EMPTY)
+        & (num_checkers == 0)
+        & is_safe(jnp.int32([16, 24])).all()
     )
-    mask = mask.at[2367].set(
-        jax.lax.select(can_castle_king_side(), TRUE, mask[2367])
+    can_castle_king_side = (
+        (board[32] == KING)
+        & (board[56] == ROOK)
+        & state._can_castle_king_side[0]
+        & (board[40] == EMPTY)
+        & (board[48] == EMPTY)
+        & (num_checkers == 0)
+        & is_safe(jnp.int32([40, 48])).all()
     )
+    mask = mask.at[2364].set(mask[2364] | can_castle_queen_side)
+    mask = mask.at[2367].set(mask[2367] | can_castle_king_side)
 
-    # set en passant
-    actions = legal_en_passants()
-    mask = mask.at[actions].set(TRUE)
+    # en passant
+    to = jnp.int32(state._en_passant)
 
-    # set underpromotions
-    actions = legal_underpromotions(mask)
-    mask = mask.at[actions].set(TRUE)
+    @jax.vmap
+    def legal_en_passants(from_):
+        ok = (
+            (from_ >= 0)
+            & (from_ < 64)
+            & (to >= 0)
+            & (board[from_] == PAWN)
+            & (board[to - 1] == -PAWN)
+        )
+        from_ = jnp.clip(from_, 0, 63)
+        captured = SQUARE_BB[jnp.clip(to - 1, 0, 63)]
+        _occ = occ & ~SQUARE_BB[from_] & ~captured | SQUARE_BB[jnp.clip(to, 0)]
+        _pieces = pieces.at[6 - PAWN].set(pieces[6 - PAWN] & ~captured)
+        ok &= ~_attackers(king_pos, _occ, _pieces).any()
+        a = Action(from_=from_, to=to)
+        return jax.lax.select(ok, a._to_label(), -1)
+
+    mask = mask.at[legal_en_passants(jnp.int32([to - 9, to + 7]))].set(TRUE)
 
     return mask[:-1]
 
 
-def _is_attacking(state: State, pos):
-    @jax.vmap
-    def can_move(from_):
-        a = Action(from_=from_, to=pos)
-        return (from_ != -1) & _is_pseudo_legal(state, a)
+def _is_checked(state: State):
+    """True if the king of current player is attacked"""
+    pieces, occ = _to_bitboards(state._board)
+    king_pos = jnp.argmax(state._board == KING)
+    return _attackers(king_pos, occ, pieces).any()
 
-    return can_move(CAN_MOVE_ANY[pos, :]).any()
 
+def _to_bb(mask):
+    """bool (..., 64) -> bitboard (..., 2)"""
+    bits = mask.reshape(mask.shape[:-1] + (2, 32)).astype(jnp.uint32)
+    return (bits << jnp.arange(32, dtype=jnp.uint32)).sum(
+        axis=-1, dtype=jnp.uint32
+    )
 
-def _is_checking(state: State):
-    """True if possible to capture the opponent king"""
-    opp_king_pos = jnp.argmin(jnp.abs(state._board - -KING))
-    return _is_attacking(state, opp_king_pos)
 
+def _from_bb(bb):
+    """bitboard (..., 2) -> bool (..., 64)"""
+    bits = (bb[..., None] >> jnp.arange(32, dtype=jnp.uint32)) & 1
+    return bits.astype(jnp.bool_).reshape(bb.shape[:-1] + (64,))
 
-def _is_pseudo_legal(state: State, a: Action):
-    piece = state._board[a.from_]
-    ok = (piece >= 0) & (state._board[a.to] <= 0)
-    ok &= (CAN_MOVE[piece, a.from_] == a.to).any()
-    between_ixs = BETWEEN[a.from_, a.to]
-    ok &= ((between_ixs < 0) | (state._board[between_ixs] == EMPTY)).all()
-    # filter pawn move
-    ok &= ~((piece == PAWN) & ((a.to % 8) < (a.from_ % 8)))
-    ok &= ~(
-        (piece == PAWN)
-        & (jnp.abs(a.to - a.from_) <= 2)
-        & (state._board[a.to] < 0)
-    )
-    ok &= ~(
-        (piece == PAWN)
-        & (jnp.abs(a.to - a.from_) > 2)
-        & (state._board[a.to] >= 0)
+
+def _to_bitboards(board):
+    """Return bitboards of each piece (13, 2) and all pieces (2,).
+    pieces[6 + p] is the bitboard of my piece p and pieces[6 - p] is the opponent's.
+    """
+    pieces = _to_bb(board[None, :] == jnp.arange(-6, 7)[:, None])
+    occ = _to_bb(board != EMPTY)
+    return pieces, occ
+
+
+def _reduce_or(bb):
+    return jax.lax.reduce(bb, jnp.uint32(0), jax.lax.bitwise_or, (0,))
+
+
+def _is_in(pos, bb):
+    """True if `pos` is in the bitboard `bb`. pos = 64 is never in bb."""
+    return (SQUARE_BB[pos] & bb).any(axis=-1)
+
+
+def _lsb(bb):
+    """Smallest index in the bitboard (64 if empty)"""
+    lo, hi = bb[..., 0], bb[..., 1]
+
+    def ctz(x):  # 32 if x == 0
+        return jax.lax.population_count((x & (~x + 1)) - 1).astype(jnp.int32)
+
+    return jnp.where(lo != 0, ctz(lo), 32 + ctz(hi))
+
+
+def _msb(bb):
+    """Largest index in the bitboard (-1 if empty)"""
+    lo, hi = bb[..., 0], bb[..., 1]
+    clz = jax.lax.clz
+    return jnp.where(
+        hi != 0, 63 - clz(hi).astype(jnp.int32), 31 - clz(lo).astype(jnp.int32)
     )
-    return (a.to >= 0) & ok
 
 
-def _possible_piece_positions(state):
-    my_pos = jnp.nonzero(state._board > 0, size=16, fill_value=-1)[0].astype(
-        jnp.int8
+def _first_blocker(blockers):
+    """Nearest square in `blockers` (8, ..., 2) along each direction (64 if empty)"""
+    d = jnp.arange(8).reshape((8,) + (1,) * (blockers.ndim - 2))
+    msb = _msb(blockers)
+    return jnp.where(d < 4, _lsb(blockers), jnp.where(msb < 0, 64, msb))
+
+
+def _sliding_attacks(pos, occ):
+    """Squares attacked from `pos` along each of 8 directions (8, ..., 2).
+    Attacked squares include the first occupied square."""
+    rays = RAYS_BB[:, pos]
+    blocker = _first_blocker(rays & occ)
+    d = jnp.arange(8).reshape((8,) + (1,) * (blocker.ndim - 1))
+    return rays & ~RAYS_BB[d, blocker]
+
+
+def _opp_sliders(pieces):
+    """Opponent's pieces which can slide along each of 8 directions (8, 2)"""
+    rook_queen = pieces[6 - ROOK] | pieces[6 - QUEEN]
+    bishop_queen = pieces[6 - BISHOP] | pieces[6 - QUEEN]
+    is_rook_dir = (jnp.arange(8) % 2 == 0)[:, None]
+    return jnp.where(is_rook_dir, rook_queen, bishop_queen)
+
+
+def _attackers(pos, occ, pieces):
+    """Opponent's pieces attacking `pos`"""
+    sliders = _reduce_or(_sliding_attacks(pos, occ) & _opp_sliders(pieces))
+    return (
+        sliders
+        | (KNIGHT_BB[pos] & pieces[6 - KNIGHT])
+        | (PAWN_ATTACK_BB[pos] & pieces[6 - PAWN])
+        | (KING_BB[pos] & pieces[6 - KING])
     )
-    opp_pos = jnp.nonzero(_flip(state)._board > 0, size=16, fill_value=-1)[
-        0
-    ].astype(jnp.int8)
-    return jnp.vstack((my_pos, opp_pos))
 
 
 def _observe(state: State):
@@ -624,7 +683,7 @@ def _observe(state: State):
     my_pieces = is_piece(jnp.arange(1, 7))
     opp_pieces = is_piece(-jnp.arange(1, 7))
     # See also https://github.com/LeelaChessZero/lc0/blob/f39ad6ceb62c186136fc80ad08c466217c485aa1/src/neural/encoder.cc#L290
-    rep = (state._hash_history == state._zobrist_hash).all(axis=1).sum() - 1
+    rep = _num_repetitions(state)
     repetitions = ONE_PLANE * (rep >= 1)
     color = ONE_PLANE * state._turn
     my_queen_side_castling_right = ONE_PLANE * state._can_castle_queen_side[0]
@@ -688,10 +747,24 @@ def _update_zobrist_hash(state: State, action: Action):
     hash_ ^= HASH_TABLE[to][piece]
     return state.replace(  # type: ignore
         _zobrist_hash=hash_,
-        _hash_history=state._hash_history.at[state._step_count].set(hash_),
+        _hash_history=state._hash_history.at[
+            state._step_count % HASH_HISTORY_LENGTH
+        ].set(hash_),
     )
 
 
+def _num_repetitions(state: State):
+    """Number of previous occurrences of the current position.
+
+    Only positions since the last pawn move or capture are compared.
+    """
+    ix = jnp.arange(HASH_HISTORY_LENGTH)
+    num_plies_ago = (state._step_count - ix) % HASH_HISTORY_LENGTH
+    in_window = num_plies_ago <= state._halfmove_count
+    is_same = (state._hash_history == state._zobrist_hash).all(axis=1)
+    return (is_same & in_window).sum() - 1
+
+
 def _from_fen(fen: str):
     """Restore state from FEN
 
@@ -770,9 +843,6 @@ def _from_fen(fen: str):
         _halfmove_count=jnp.int32(halfmove_cnt),
         _fullmove_count=jnp.int32(fullmove_cnt),
     )
-    state = state.replace(  # type: ignore
-        _possible_piece_positions=jax.jit(_possible_piece_positions)(state)
-    )
     state = state.replace(  # type: ignore
         legal_action_mask=jax.jit(_legal_action_mask)(state),
     )
@@ -42,6 +42,17 @@ class State(v1.State):
     #  [35, 36, 37, 38, 39, 40, 41]]
     _board: jnp.ndarray = -jnp.ones(42, jnp.int8)  # -1 (empty), 0, 1
     _blank_row: jnp.ndarray = jnp.full(7, 5)
+    # bitboard of each turn (0, 1) as a pair of uint32 (lower 32 bits, upper 32 bits)
+    # column-major: bit (col * 7 + height) where height is 0 for the bottom row.
+    # The top bit (height 6) of each column is always 0 to stop four-in-a-rows wrapping around.
+    #  6 13 20 27 34 41 48
+    #  5 12 19 26 33 40 47
+    #  4 11 18 25 32 39 46
+    #  3 10 17 24 31 38 45
+    #  2  9 16 23 30 37 44
+    #  1  8 15 22 29 36 43
+    #  0  7 14 21 28 35 42
+    _bitboard: jnp.ndarray = jnp.zeros((2, 2), dtype=jnp.uint32)
 
     @property
     def env_id(self) -> v1.EnvId:
@@ -76,32 +87,8 @@ class ConnectFour(v1.Env):
         return 2
 
 
-def _make_win_cache():
-    idx = []
-    # 縦
-    for i in range(3):
-        for j in range(7):
-            a = i * 7 + j
-            idx.append([a, a + 7, a + 14, a + 21])
-    # 横
-    for i in range(6):
-        for j in range(4):
-            a = i * 7 + j
-            idx.append([a, a + 1, a + 2, a + 3])
-
-    # 斜め
-    for i in range(3):
-        for j in range(4):
-            a = i * 7 + j
-            idx.append([a, a + 8, a + 16, a + 24])
-    for i in range(3):
-        for j in range(3, 7):
-            a = i * 7 + j
-            idx.append([a, a + 6, a + 12, a + 18])
-    return jnp.int8(idx)
-
-
-IDX = _make_win_cache()
+# shifts of the bitboard along vertical, horizontal, and two diagonal lines
+SHIFTS = (1, 7, 6, 8)
 
 
 def _init(rng: jax.random.KeyArray) -> State:
@@ -115,7 +102,12 @@ def _step(state: State, action: jnp.ndarray) -> State:
     row = state._blank_row[action]
     blank_row = state._blank_row.at[action].set(row - 1)
     board = board.at[_to_idx(row, action)].set(state._turn)
-    won = _win_check(board, state._turn)
+    pos = action * 7 + (5 - row)
+    bitboard = state._bitboard.at[state._turn].set(
+        state._bitboard[state._turn] | _to_bit(pos)
+    )
+    # only lines through the last disc can be newly completed
+    won = _win_check(bitboard[state._turn], pos)
     reward = jax.lax.cond(
         won,
         lambda: jnp.float32([-1, -1]).at[state.current_player].set(1),
@@ -127,6 +119,7 @@ def _step(state: State, action: jnp.ndarray) -> State:
         _turn=1 - state._turn,
         _board=board,
         _blank_row=blank_row,
+        _bitboard=bitboard,
         terminated=won | jnp.all(blank_row == -1),
         reward=reward,
     )
@@ -136,8 +129,32 @@ def _to_idx(row, col):
     return row * 7 + col
 
 
-def _win_check(board, turn) -> jnp.ndarray:
-    return ((board[IDX] == turn).all(axis=1)).any()
+def _to_bit(pos):
+    # bitboard with only the bit `pos` set
+    bit = jnp.uint32(1) << jnp.uint32(pos % 32)
+    return jnp.where(pos < 32, jnp.uint32([1, 0]), jnp.uint32([0, 1])) * bit
+
+
+def _shift(bitboard, s: int):
+    # right shift of the 64-bit bitboard by 0 < s < 32
+    lo, hi = bitboard[0], bitboard[1]
+    return jnp.stack([(lo >> s) | (hi << (32 - s)), hi >> s])
+
+
+def _win_check(bitboard, pos=None) -> jnp.ndarray:
+    """Whether the bitboard of a player has four in a row.
+    If `pos` is given, only lines through the bit `pos` are checked."""
+    won = FALSE
+    for s in SHIFTS:
+        x = bitboard & _shift(bitboard, s)
+        # bit p is set iff p, p + s, p + 2s, p + 3s are all set
+        x = x & _shift(x, 2 * s)
+        if pos is not None:
+            bit = _to_bit(pos)
+            bit = bit | _shift(bit, s)
+            x = x & (bit | _shift(bit, 2 * s))
+        won |= (x != 0).any()
+    return won
 
 
 def _observe(state: State, player_id: jnp.ndarray) -> jnp.ndarray:
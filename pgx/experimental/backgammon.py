@@ -0,0 +1,139 @@
+import itertools
+from typing import Tuple
+
+import jax
+import jax.numpy as jnp
+import numpy as np
+
+from pgx.backgammon import (
+    FALSE,
+    TRUE,
+    State,
+    _is_all_off,
+    _legal_action_matrix,
+    _move,
+)
+from pgx.v1 import Env
+
+
+def _make_candidates():
+    """Candidates of a full turn as (src, slot of playable dice) for each of 4 micro actions.
+
+    src is the same as in micro actions (0: no-op, 1: bar, 2-25: points) or -1 (not played).
+    For doubles, moves are enumerated in ascending order of src,
+    which covers all the resulting boards because checkers only move forward.
+    """
+    srcs, slots = [], []
+    moves = range(1, 26)
+    # different dice: slot 0 and 1 in either order
+    for order in [(0, 1), (1, 0)]:
+        for seq in (
+            [(-1, -1), (0, -1)]
+            + [(a, t) for a in moves for t in (-1, 0)]
+            + [(a, b) for a in moves for b in moves]
+        ):
+            srcs.append(list(seq) + [-1, -1])
+            slots.append(list(order) + [2, 3])
+    # doubles
+    for k in range(5):
+        for seq in itertools.combinations_with_replacement(moves, k):
+            for tail in [[-1], [0]] if k < 4 else [[]]:
+                srcs.append((list(seq) + tail + [-1] * 4)[:4])
+                slots.append([0, 1, 2, 3])
+    return np.int32(srcs), np.int32(slots)
+
+
+_srcs, _slots = _make_candidates()
+CANDIDATE_SRCS = jnp.array(_srcs)  # (28381, 4)
+CANDIDATE_SLOTS = jnp.array(_slots)  # (28381, 4)
+
+
+def legal_turns(state: State) -> Tuple[jnp.ndarray, jnp.ndarray, jnp.ndarray]:
+    """Enumerate full turns (sequences of micro actions) of the current player.
+
+    A full turn plays the remaining dice with micro actions until the dice are used up,
+    no micro action is legal (no-op), or the game ends.
+    Turns resulting in the same board are listed only once.
+
+    !!! example "Example usage"
+
+        ```py
+        actions, boards, mask = legal_turns(state)
+        ix = jax.random.choice(key, jnp.arange(mask.shape[0]), p=mask)
+        state = play_turn(env, state, actions[ix])
+        ```
+
+    Returns:
+        Tuple[jnp.ndarray, jnp.ndarray, jnp.ndarray]: micro actions of each turn
+            `(num_candidates, 4)` (padded by -1), the board after each turn from
+            the view of the current player `(num_candidates, 28)`, and the mask of legal
+            and distinct turns `(num_candidates,)`.
+    """
+    actions, boards, is_legal = jax.vmap(
+        _simulate_turn, in_axes=(None, None, 0, 0)
+    )(state._board, state._playable_dice, CANDIDATE_SRCS, CANDIDATE_SLOTS)
+    return actions, boards, is_legal & _is_first_occurrence(boards, is_legal)
+
+
+def play_turn(env: Env, state: State, actions: jnp.ndarray) -> State:
+    """Step `env` with micro actions of a turn returned by `legal_turns`."""
+
+    def body_fn(state, action):
+        state = jax.lax.cond(
+            action >= 0, lambda: env.step(state, action), lambda: state
+        )
+        return state, None
+
+    state, _ = jax.lax.scan(body_fn, state, actions)
+    return state
+
+
+def _simulate_turn(board, playable_dice, srcs, slots):
+    def body_fn(carry, x):
+        board, used, ended, is_legal = carry
+        src, slot = x
+        die = playable_dice[slot]
+        is_available = (die != -1) & ~used[slot] & ~ended
+        legal_action_matrix = _legal_action_matrix(board)
+        remaining_dice = (
+            (playable_dice[:, None] == jnp.arange(6)) & ~used[:, None]
+        ).any(axis=0)
+        is_no_op_legal = ~(legal_action_matrix & remaining_dice).any()
+        action = 6 * src + die
+        is_move = is_available & (src >= 1)
+        ok = jax.lax.select(
+            is_available,
+            jax.lax.select(
+                src == 0,
+                is_no_op_legal,
+                (src >= 1) & legal_action_matrix[src, die],
+            ),
+            src == -1,
+        )
+        board = jax.lax.select(is_move, _move(board, action), board)
+        used = used.at[slot].set(used[slot] | is_move)
+        ended |= (is_available & (src == 0)) | _is_all_off(board)
+        action = jnp.where(is_available & (src >= 0), action, -1)
+        return (board, used, ended, is_legal & ok), action
+
+    init = (board, jnp.zeros(4, dtype=jnp.bool_), FALSE, TRUE)
+    (board, _, _, is_legal), actions = jax.lax.scan(
+        body_fn, init, (srcs, slots)
+    )
+    return actions.astype(jnp.int32), board, is_legal
+
+
+def _is_first_occurrence(boards, mask):
+    """True for the first row of each distinct board among masked rows"""
+    n = boards.shape[0]
+    # sort by (mask, board, index) and compare adjacent rows
+    keys = (
+        [jnp.arange(n)] + [boards[:, i] for i in range(27, -1, -1)] + [~mask]
+    )
+    order = jnp.lexsort(keys)
+    sorted_boards = boards[order]
+    is_new = jnp.ones(n, dtype=jnp.bool_)
+    is_new = is_new.at[1:].set(
+        (sorted_boards[1:] != sorted_boards[:-1]).any(axis=1)
+    )
+    return jnp.zeros(n, dtype=jnp.bool_).at[order].set(is_new)
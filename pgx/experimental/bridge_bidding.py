@@ -119,6 +119,7 @@ def _duplicate_init(
         _shuffled_players=state._shuffled_players[ix],
         current_player=current_player,
         _hand=state._hand,
+        _hand_bitmap=state._hand_bitmap,
         _dealer=state._dealer,
         _vul_NS=state._vul_NS,
         _vul_EW=state._vul_EW,
@@ -0,0 +1,259 @@
+import multiprocessing
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from pgx.bridge_bidding import TO_CARD, _sort_hash_table
+
+# suits in the order of card ids (0 ~ 12 spade, 13 ~ 25 heart, 26 ~ 38 diamond, 39 ~ 51 club)
+# ranks are listed from A, K, Q, ... to 2 in PBN
+_RANK_ORDER = [0] + list(range(12, 0, -1))
+
+
+class DDSSolver:
+    """Host-side double dummy solver with a persistent LRU cache.
+
+    Pass it to `BridgeBidding(dds_solver=...)` to score deals missing in the dds hash table.
+    Missing deals in a batch are deduplicated, looked up in the in-memory and on-disk caches,
+    and the rest are solved in a pool of `num_workers` processes.
+    The results are stored in the caches keyed by `_state_to_key`.
+    The on-disk cache (SQLite) can be shared by processes and keeps at most `max_cache_size` deals,
+    evicting the least recently used ones.
+
+    !!! example "Example usage"
+
+        ```py
+        solver = DDSSolver("dds_cache.sqlite")
+        env = BridgeBidding(dds_solver=solver, random_deal=True)
+        ...
+        # merge the solved deals into the hash table
+        keys, values = solver.merge(env.hash_keys, env.hash_values)
+        _save_dds_hash_table("dds_hash_table", keys, values)
+        ```
+
+    Args:
+        cache_path: path of the on-disk cache. Only the in-memory cache is used if `None`.
+        max_cache_size: maximum number of deals kept in each of the caches.
+        num_workers: number of solver processes. Deals are solved in the calling process if 0.
+        solve_fn: function that takes a deal in PBN format and returns 20 tricks
+            in the order of `position * 5 + denomination` (NESW x CDHSN).
+            Must be picklable if `num_workers > 0`. Defaults to `solve_with_endplay`.
+    """
+
+    def __init__(
+        self,
+        cache_path: Optional[str] = None,
+        *,
+        max_cache_size: int = 1_000_000,
+        num_workers: Optional[int] = None,
+        solve_fn: Optional[Callable[[str], Sequence[int]]] = None,
+    ):
+        self.cache_path = cache_path
+        self.max_cache_size = max_cache_size
+        if num_workers is None:
+            num_workers = os.cpu_count() or 1
+        self.num_workers = num_workers
+        self.solve_fn = solve_with_endplay if solve_fn is None else solve_fn
+        self._memory: "OrderedDict[Tuple[int, ...], np.ndarray]" = (
+            OrderedDict()
+        )
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._db: Optional[sqlite3.Connection] = None
+        self._counter = 0
+        self._lock = threading.Lock()
+        if cache_path is not None:
+            # callbacks may run in threads of JAX runtime
+            self._db = sqlite3.connect(cache_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS dds ("
+                "k0 INTEGER, k1 INTEGER, k2 INTEGER, k3 INTEGER, "
+                "v0 INTEGER, v1 INTEGER, v2 INTEGER, v3 INTEGER, "
+                "used INTEGER, PRIMARY KEY (k0, k1, k2, k3))"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS lru ON dds (used)")
+            self._db.commit()
+            (counter,) = self._db.execute(
+                "SELECT COALESCE(MAX(used), 0) FROM dds"
+            ).fetchone()
+            self._counter = counter
+
+    def __call__(self, keys: np.ndarray, is_missing: np.ndarray) -> np.ndarray:
+        """Values of `keys` (..., 4) in the dds hash table format. Keys not `is_missing` are skipped (zeros)."""
+        keys = np.asarray(keys, dtype=np.int32)
+        values = np.zeros(keys.shape, dtype=np.int32)
+        mask = np.broadcast_to(np.asarray(is_missing), keys.shape[:-1])
+        if mask.any():
+            values[mask] = self.solve(keys[mask])
+        return values
+
+    def solve(self, keys: np.ndarray) -> np.ndarray:
+        """Values of `keys` (N, 4) in the dds hash table format"""
+        with self._lock:
+            keys = np.asarray(keys, dtype=np.int32).reshape(-1, 4)
+            unique_keys, inverse = np.unique(keys, axis=0, return_inverse=True)
+            found = [
+                self._lookup(tuple(int(k) for k in key)) for key in unique_keys
+            ]
+            hit = [i for i, v in enumerate(found) if v is not None]
+            missing = [i for i, v in enumerate(found) if v is None]
+            self._touch(unique_keys[hit])
+            if missing:
+                solved = self._solve(unique_keys[missing])
+                for i, value in zip(missing, solved):
+                    found[i] = value
+                self._store(unique_keys[missing], solved)
+            values = [v for v in found if v is not None]
+            assert len(values) == len(unique_keys)
+            return np.stack(values)[inverse.reshape(-1)]
+
+    def table(self) -> Tuple[np.ndarray, np.ndarray]:
+        """All cached keys and values"""
+        with self._lock:
+            if self._db is not None:
+                rows = np.array(
+                    self._db.execute(
+                        "SELECT k0, k1, k2, k3, v0, v1, v2, v3 FROM dds"
+                    ).fetchall(),
+                    dtype=np.int32,
+                ).reshape(-1, 8)
+                return rows[:, :4], rows[:, 4:]
+            keys = np.array(list(self._memory.keys()), dtype=np.int32)
+            values = np.array(list(self._memory.values()), dtype=np.int32)
+            return keys.reshape(-1, 4), values.reshape(-1, 4)
+
+    def merge(
+        self, hash_keys: np.ndarray, hash_values: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Merge the cached deals into the dds hash table. The result is sorted for binary search."""
+        keys, values = self.table()
+        hash_keys = np.concatenate([np.asarray(hash_keys), keys])
+        hash_values = np.concatenate([np.asarray(hash_values), values])
+        hash_keys, ix = np.unique(hash_keys, axis=0, return_index=True)
+        return _sort_hash_table(hash_keys, hash_values[ix])
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def _lookup(self, key: Tuple[int, ...]) -> Optional[np.ndarray]:
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            return self._memory[key]
+        if self._db is None:
+            return None
+        row = self._db.execute(
+            "SELECT v0, v1, v2, v3 FROM dds WHERE k0=? AND k1=? AND k2=? AND k3=?",
+            key,
+        ).fetchone()
+        if row is None:
+            return None
+        value = np.array(row, dtype=np.int32)
+        self._remember(key, value)
+        return value
+
+    def _touch(self, keys: np.ndarray):
+        """Mark `keys` as recently used in the on-disk cache"""
+        if self._db is None or len(keys) == 0:
+            return
+        rows = []
+        for key in keys:
+            self._counter += 1
+            rows.append((self._counter,) + tuple(int(k) for k in key))
+        self._db.executemany(
+            "UPDATE dds SET used=? WHERE k0=? AND k1=? AND k2=? AND k3=?",
+            rows,
+        )
+        self._db.commit()
+
+    def _solve(self, keys: np.ndarray) -> List[np.ndarray]:
+        pbns = [_key_to_pbn(key) for key in keys]
+        if self.num_workers == 0:
+            tricks = list(map(self.solve_fn, pbns))
+        else:
+            if self._executor is None:
+                # JAX is multithreaded and not fork-safe
+                self._executor = ProcessPoolExecutor(
+                    self.num_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            chunksize = max(1, len(pbns) // (4 * self.num_workers))
+            tricks = list(
+                self._executor.map(self.solve_fn, pbns, chunksize=chunksize)
+            )
+        return [_tricks_to_value(t) for t in tricks]
+
+    def _store(self, keys: np.ndarray, values: List[np.ndarray]):
+        rows = []
+        for key, value in zip(keys, values):
+            k = tuple(int(x) for x in key)
+            self._remember(k, value)
+            self._counter += 1
+            rows.append(k + tuple(int(x) for x in value) + (self._counter,))
+        if self._db is None:
+            return
+        self._db.executemany(
+            "INSERT OR REPLACE INTO dds VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+        # evict least recently used deals
+        self._db.execute(
+            "DELETE FROM dds WHERE used <= ("
+            "SELECT used FROM dds ORDER BY used DESC LIMIT 1 OFFSET ?)",
+            (self.max_cache_size,),
+        )
+        self._db.commit()
+
+    def _remember(self, key: Tuple[int, ...], value: np.ndarray):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_cache_size:
+            self._memory.popitem(last=False)
+
+
+def solve_with_endplay(pbn: str) -> List[int]:
+    """Solve a deal by the double dummy solver of `endplay` (optional dependency)
+
+    Returns:
+        List[int]: 20 tricks in the order of `position * 5 + denomination` (NESW x CDHSN).
+    """
+    from endplay.dds import calc_dd_table  # type: ignore
+    from endplay.types import Deal, Denom, Player  # type: ignore
+
+    table = calc_dd_table(Deal(pbn))
+    return [table[p, d] for p in Player for d in Denom.bidorder()]
+
+
+def _key_to_pbn(key: np.ndarray) -> str:
+    """Convert key of dds table to pbn format"""
+    shifts = np.arange(24, -1, step=-2)
+    # owner (N: 0, E: 1, S: 2, W: 3) of each card
+    owners = ((np.asarray(key)[:, None] >> shifts) & 0b11).reshape(-1)
+    hands = []
+    for player in range(4):
+        suits = []
+        for suit in range(4):
+            suits.append(
+                "".join(
+                    TO_CARD[r]
+                    for r in _RANK_ORDER
+                    if owners[suit * 13 + r] == player
+                )
+            )
+        hands.append(".".join(suits))
+    return "N:" + " ".join(hands)
+
+
+def _tricks_to_value(tricks: Sequence[int]) -> np.ndarray:
+    """Convert 20 dds tricks to value of dds table (inverse of `_value_to_dds_tricks`)"""
+    digits = np.asarray(tricks, dtype=np.int32).reshape(4, 5)
+    shifts = np.arange(16, -1, step=-4)
+    return (digits << shifts).sum(axis=1).astype(np.int32)
@@ -0,0 +1,113 @@
+from typing import Callable, Optional, Tuple
+
+import jax
+import jax.numpy as jnp
+import numpy as np
+
+from pgx.v1 import Env, State
+
+
+class Evaluator:
+    """Play batched games until all of them terminate, compacting finished games away.
+
+    Under `jax.vmap`, `Env.step` costs the same for terminated states as for live ones.
+    Every `steps_per_compaction` steps, the evaluator gathers the live states into a smaller
+    power-of-two bucket, runs the next steps only on the bucket, and scatters the results back.
+    Each bucket size is compiled once and reused across calls.
+
+    !!! example "Example usage"
+
+        ```py
+        env = pgx.make("chess")
+        evaluator = Evaluator(env, policy_fn)
+        state = jax.jit(jax.vmap(env.init))(jax.random.split(key, 4096))
+        reward_sum, length = evaluator.run(state, key)
+        ```
+
+    Args:
+        env: environment without auto reset.
+        policy_fn: `policy_fn(key, state) -> action` for batched states.
+        steps_per_compaction: number of steps between compactions.
+        min_bucket_size: smallest batch size of the bucket.
+    """
+
+    def __init__(
+        self,
+        env: Env,
+        policy_fn: Callable[[jax.random.KeyArray, State], jnp.ndarray],
+        *,
+        steps_per_compaction: int = 8,
+        min_bucket_size: int = 8,
+    ):
+        assert not env.auto_reset, "Evaluator requires env without auto reset."
+        self.env = env
+        self.policy_fn = policy_fn
+        self.steps_per_compaction = steps_per_compaction
+        self.min_bucket_size = min_bucket_size
+        self._run_steps = jax.jit(self._run_steps_impl)
+        self._gather = jax.jit(_gather)
+        self._scatter = jax.jit(_scatter)
+
+    def run(
+        self,
+        state: State,
+        key: jax.random.KeyArray,
+        max_steps: Optional[int] = None,
+    ) -> Tuple[jnp.ndarray, jnp.ndarray]:
+        """Play batched games from `state` until all of them terminate.
+
+        Args:
+            state: batched states.
+            key: pseudo-random generator key in JAX passed to `policy_fn`.
+            max_steps: if given, stop after (about) this number of steps.
+                Checked only every `steps_per_compaction` steps.
+
+        Returns:
+            Tuple[jnp.ndarray, jnp.ndarray]: sum of rewards of shape `(batch_size, num_players)`
+                and episode length (number of steps taken by each game) of shape `(batch_size,)`.
+        """
+        batch_size = state.terminated.shape[0]
+        carry = (
+            state,
+            jnp.zeros_like(state.reward),
+            jnp.zeros(batch_size, dtype=jnp.int32),
+        )
+        num_steps = 0
+        live = np.nonzero(~np.asarray(state.terminated))[0]
+        while live.size > 0 and (max_steps is None or num_steps < max_steps):
+            bucket_size = 1 << (live.size - 1).bit_length()
+            bucket_size = min(
+                max(bucket_size, self.min_bucket_size), batch_size
+            )
+            # out-of-bound indices (= batch_size) are padding and dropped by scatter
+            ix = np.full(bucket_size, batch_size, dtype=np.int32)
+            ix[: live.size] = live
+            key, subkey = jax.random.split(key)
+            bucket = self._run_steps(self._gather(carry, ix), subkey)
+            carry = self._scatter(carry, ix, bucket)
+            num_steps += self.steps_per_compaction
+            live = np.nonzero(~np.asarray(carry[0].terminated))[0]
+        _, reward_sum, length = carry
+        return reward_sum, length
+
+    def _run_steps_impl(self, carry, key: jax.random.KeyArray):
+        def body_fn(carry, key):
+            state, reward_sum, length = carry
+            action = self.policy_fn(key, state)
+            length = length + (~state.terminated).astype(jnp.int32)
+            state = jax.vmap(self.env.step)(state, action)
+            return (state, reward_sum + state.reward, length), None
+
+        keys = jax.random.split(key, self.steps_per_compaction)
+        carry, _ = jax.lax.scan(body_fn, carry, keys)
+        return carry
+
+
+def _gather(tree, ix):
+    return jax.tree_util.tree_map(lambda x: x[ix], tree)
+
+
+def _scatter(tree, ix, sub_tree):
+    return jax.tree_util.tree_map(
+        lambda x, y: x.at[ix].set(y, mode="drop"), tree, sub_tree
+    )
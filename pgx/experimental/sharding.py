@@ -0,0 +1,113 @@
+from typing import Dict, Optional, Sequence
+
+import jax
+import jax.numpy as jnp
+import numpy as np
+from jax.experimental.shard_map import shard_map
+from jax.sharding import Mesh, NamedSharding
+from jax.sharding import PartitionSpec as P
+
+from pgx.v1 import Env, State
+
+
+class ShardedEnv:
+    """Split a global batch of states across local devices.
+
+    The leading (batch) axis of keys, states, and actions is sharded over a
+    1D device mesh whose axis is named `axis_name`. Each device runs
+    `jax.vmap(env.init)` / batched `env.step` on its own shard, so
+    throughput scales with the number of devices. On CPU-only hosts, multiple
+    devices can be emulated by setting
+    `XLA_FLAGS=--xla_force_host_platform_device_count=N` before importing JAX.
+
+    !!! example "Example usage"
+
+        ```py
+        env = ShardedEnv(pgx.make("go_9x9", auto_reset=True))
+        state = env.init(jax.random.split(key, 1024))
+        state = env.step(state, action)
+        stats = env.episode_stats(state)
+        ```
+
+    """
+
+    def __init__(
+        self,
+        env: Env,
+        *,
+        devices: Optional[Sequence[jax.Device]] = None,
+        axis_name: str = "batch",
+    ):
+        if devices is None:
+            devices = jax.local_devices()
+        self.env = env
+        self.axis_name = axis_name
+        self.mesh = Mesh(np.array(devices), (axis_name,))
+        self.num_devices = len(devices)
+        self.sharding = NamedSharding(self.mesh, P(axis_name))
+
+        spec = P(axis_name)
+        # check_rep=False: replication checking does not support all primitives used in envs
+        self._init = jax.jit(
+            shard_map(
+                jax.vmap(env.init),
+                mesh=self.mesh,
+                in_specs=spec,
+                out_specs=spec,
+                check_rep=False,
+            )
+        )
+        self._step = jax.jit(
+            shard_map(
+                env._batch_step,
+                mesh=self.mesh,
+                in_specs=(spec, spec),
+                out_specs=spec,
+                check_rep=False,
+            ),
+            donate_argnums=(0,),
+        )
+        self._episode_stats = jax.jit(
+            shard_map(
+                self._local_episode_stats,
+                mesh=self.mesh,
+                in_specs=spec,
+                out_specs=P(),
+                check_rep=False,
+            )
+        )
+
+    def init(self, keys: jax.random.KeyArray) -> State:
+        """Return batched initial states sharded over devices.
+
+        Args:
+            keys: batched keys whose batch size is divisible by the number of devices.
+        """
+        self._check_batch_size(keys.shape[0])
+        return self._init(keys)
+
+    def step(self, state: State, action: jnp.ndarray) -> State:
+        """Step the sharded states. The buffers of `state` are donated."""
+        self._check_batch_size(action.shape[0])
+        return self._step(state, action)
+
+    def episode_stats(self, state: State) -> Dict[str, jnp.ndarray]:
+        """Aggregate statistics over the global batch with `psum` across devices.
+
+        Returns:
+            Dict[str, jnp.ndarray]: `num_terminated` (number of states terminated at this step) and
+                `reward_sum` (sum of rewards at this step for each player).
+        """
+        return self._episode_stats(state)
+
+    def _local_episode_stats(self, state: State) -> Dict[str, jnp.ndarray]:
+        stats = {
+            "num_terminated": state.terminated.sum(dtype=jnp.int32),
+            "reward_sum": state.reward.sum(axis=0),
+        }
+        return jax.lax.psum(stats, self.axis_name)
+
+    def _check_batch_size(self, batch_size: int):
+        assert (
+            batch_size % self.num_devices == 0
+        ), f"Batch size ({batch_size}) must be divisible by the number of devices ({self.num_devices})."
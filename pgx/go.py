@@ -23,6 +23,11 @@ from pgx._src.struct import dataclass
 FALSE = jnp.bool_(False)
 TRUE = jnp.bool_(True)
 
+# Zobrist hash of each (point, color = black/white). Supports up to 19x19.
+ZOBRIST_BOARD = jax.random.bits(
+    jax.random.PRNGKey(12345), shape=(19 * 19, 2, 2), dtype=jnp.uint32
+)
+
 
 @dataclass
 class State(v1.State):
@@ -39,6 +44,12 @@ class State(v1.State):
     # positive for black, negative for white, and zero for empty.
     # require at least 19 * 19 > int8, idx_squared_sum can be 361^2 > int16
     _chain_id_board: jnp.ndarray = jnp.zeros(19 * 19, dtype=jnp.int32)
+    # pseudo-liberty statistics of each chain indexed by (chain id - 1)
+    # updated incrementally around the placed and the removed stones
+    # see `_is_atari` for the definitions
+    _num_pseudo: jnp.ndarray = jnp.zeros(19 * 19, dtype=jnp.int32)
+    _idx_sum: jnp.ndarray = jnp.zeros(19 * 19, dtype=jnp.int32)
+    _idx_squared_sum: jnp.ndarray = jnp.zeros(19 * 19, dtype=jnp.int32)
     _board_history: jnp.ndarray = jnp.full((8, 19 * 19), 2, dtype=jnp.int8)
     _turn: jnp.ndarray = jnp.int8(0)  # 0 = black's turn, 1 = white's turn
     _num_captured_stones: jnp.ndarray = jnp.zeros(
@@ -48,6 +59,10 @@ class State(v1.State):
     _ko: jnp.ndarray = jnp.int32(-1)  # by SSK
     _komi: jnp.ndarray = jnp.float32(7.5)
     _black_player: jnp.ndarray = jnp.int8(0)
+    # Zobrist hash of the board (zero for the empty board)
+    _zobrist_hash: jnp.ndarray = jnp.uint32([0, 0])
+    # hash of the board after each step. Only used if superko=True (empty otherwise)
+    _hash_history: jnp.ndarray = jnp.zeros((0, 2), dtype=jnp.uint32)
 
     @property
     def env_id(self) -> v1.EnvId:
@@ -66,20 +81,28 @@ class Go(v1.Env):
         size: int = 19,
         komi: float = 7.5,
         history_length: int = 8,
+        superko: bool = False,
     ):
         super().__init__(auto_reset=auto_reset)
         assert isinstance(size, int)
+        assert not superko or size <= 19, "superko supports up to 19x19"
         self.size = size
         self.komi = komi
         self.history_length = history_length
+        # See `_check_PSK` and `_check_superko`
+        self.superko = superko
         self.max_termination_steps = self.size * self.size * 2
 
     def _init(self, key: jax.random.KeyArray) -> State:
-        return partial(_init, size=self.size, komi=self.komi)(key=key)
+        return partial(
+            _init, size=self.size, komi=self.komi, superko=self.superko
+        )(key=key)
 
     def _step(self, state: v1.State, action: jnp.ndarray) -> State:
         assert isinstance(state, State)
-        state = partial(_step, size=self.size)(state, action)
+        state = partial(_step, size=self.size, superko=self.superko)(
+            state, action
+        )
         # terminates if size * size * 2 (722 if size=19) steps are elapsed
         state = jax.lax.cond(
             (0 <= self.max_termination_steps)
@@ -160,21 +183,34 @@ def _observe(state: State, player_id, size, history_length):
     return jnp.vstack([log, color]).transpose().reshape((size, size, -1))
 
 
-def _init(key: jax.random.KeyArray, size: int, komi: float = 7.5) -> State:
+def _init(
+    key: jax.random.KeyArray,
+    size: int,
+    komi: float = 7.5,
+    superko: bool = False,
+) -> State:
     black_player = jnp.int8(jax.random.bernoulli(key))
     current_player = black_player
+    # hash of the initial (empty) board + each step up to max_termination_steps
+    hash_history_length = size * size * 2 + 1 if superko else 0
     return State(  # type:ignore
         _size=jnp.int32(size),
         _chain_id_board=jnp.zeros(size**2, dtype=jnp.int32),
+        _num_pseudo=jnp.zeros(size**2, dtype=jnp.int32),
+        _idx_sum=jnp.zeros(size**2, dtype=jnp.int32),
+        _idx_squared_sum=jnp.zeros(size**2, dtype=jnp.int32),
         legal_action_mask=jnp.ones(size**2 + 1, dtype=jnp.bool_),
         _board_history=jnp.full((8, size**2), 2, dtype=jnp.int8),
         current_player=current_player,
         _komi=jnp.float32(komi),
         _black_player=black_player,
+        _hash_history=jnp.zeros((hash_history_length, 2), dtype=jnp.uint32),
     )
 
 
-def _step(state: State, action: int, size: int) -> State:
+def _step(
+    state: State, action: int, size: int, superko: bool = False
+) -> State:
     state = state.replace(_ko=jnp.int32(-1))  # type: ignore
     # update state
     state = jax.lax.cond(
@@ -202,8 +238,12 @@ def _step(state: State, action: int, size: int) -> State:
     )
     state = state.replace(_board_history=board_history)  # type:ignore
 
-    # check PSK up to 8-steps before
-    state = _check_PSK(state)
+    if superko:
+        # check PSK over all the previous boards
+        state = _check_superko(state)
+    else:
+        # check PSK up to 8-steps before
+        state = _check_PSK(state)
     return state
 
 
@@ -228,12 +268,11 @@ def _not_pass_move(state: State, action, size) -> State:
     adj_xy = _neighbour(xy, size)
     oppo_color = _opponent_color(state)
     chain_id = state._chain_id_board[adj_xy]
-    num_pseudo, idx_sum, idx_squared_sum = _count(state, size)
     chain_ix = jnp.abs(chain_id) - 1
-    is_atari = (idx_sum[chain_ix] ** 2) == idx_squared_sum[
-        chain_ix
-    ] * num_pseudo[chain_ix]
-    single_liberty = (idx_squared_sum[chain_ix] // idx_sum[chain_ix]) - 1
+    is_atari = _is_atari(state, chain_ix)
+    single_liberty = (
+        state._idx_squared_sum[chain_ix] // state._idx_sum[chain_ix]
+    ) - 1
     is_killed = (
         (adj_xy != -1)
         & (chain_id * oppo_color > 0)
@@ -245,12 +284,14 @@ def _not_pass_move(state: State, action, size) -> State:
         4,
         lambda i, s: jax.lax.cond(
             is_killed[i],
-            lambda: _remove_stones(s, chain_id[i], adj_xy[i], ko_may_occur),
+            lambda: _remove_stones(
+                s, chain_id[i], adj_xy[i], ko_may_occur, size
+            ),
             lambda: s,
         ),
         state,
     )
-    state = _set_stone(state, xy)
+    state = _set_stone(state, xy, size)
 
     # Merge neighbours
     state = jax.lax.fori_loop(
@@ -282,10 +323,34 @@ def _merge_around_xy(i, state: State, xy, size):
     return state
 
 
-def _set_stone(state: State, xy) -> State:
+def _set_stone(state: State, xy, size) -> State:
     my_color = _my_color(state)
+    adj_xy = _neighbour(xy, size)
+    on_board = adj_xy != -1
+    adj_chain_id = state._chain_id_board[adj_xy]
+    is_empty = on_board & (adj_chain_id == 0)
+    is_stone = on_board & (adj_chain_id != 0)
+
+    # xy is no longer a pseudo liberty of the adjacent chains
+    adj_chain_ix = jnp.where(is_stone, jnp.abs(adj_chain_id) - 1, size**2)
+    num_pseudo = state._num_pseudo.at[adj_chain_ix].add(-1, mode="drop")
+    idx_sum = state._idx_sum.at[adj_chain_ix].add(-(xy + 1), mode="drop")
+    idx_squared_sum = state._idx_squared_sum.at[adj_chain_ix].add(
+        -((xy + 1) ** 2), mode="drop"
+    )
+
+    # pseudo liberties of the new single-stone chain
+    adj_idx = jnp.where(is_empty, adj_xy + 1, 0)
+    num_pseudo = num_pseudo.at[xy].set(is_empty.sum())
+    idx_sum = idx_sum.at[xy].set(adj_idx.sum())
+    idx_squared_sum = idx_squared_sum.at[xy].set((adj_idx**2).sum())
+
     return state.replace(  # type:ignore
         _chain_id_board=state._chain_id_board.at[xy].set((xy + 1) * my_color),
+        _zobrist_hash=state._zobrist_hash ^ ZOBRIST_BOARD[xy, state._turn],
+        _num_pseudo=num_pseudo,
+        _idx_sum=idx_sum,
+        _idx_squared_sum=idx_squared_sum,
     )
 
 
@@ -293,19 +358,35 @@ def _merge_chain(state: State, xy, adj_xy):
     my_color = _my_color(state)
     new_id = jnp.abs(state._chain_id_board[xy])
     adj_chain_id = jnp.abs(state._chain_id_board[adj_xy])
-    small_id = jnp.minimum(new_id, adj_chain_id) * my_color
-    large_id = jnp.maximum(new_id, adj_chain_id) * my_color
+    small_id = jnp.minimum(new_id, adj_chain_id)
+    large_id = jnp.maximum(new_id, adj_chain_id)
 
     # 大きいidの連を消し、小さいidの連と繋げる
     chain_id_board = jnp.where(
-        state._chain_id_board == large_id, small_id, state._chain_id_board
+        state._chain_id_board == large_id * my_color,
+        small_id * my_color,
+        state._chain_id_board,
     )
 
-    return state.replace(_chain_id_board=chain_id_board)  # type: ignore
+    # the statistics of the large chain are moved to the small chain
+    # (nothing happens if xy and adj_xy already belong to the same chain)
+    def _move(x):
+        return x.at[small_id - 1].add(x[large_id - 1]).at[large_id - 1].set(0)
+
+    return jax.lax.cond(
+        small_id == large_id,
+        lambda: state,
+        lambda: state.replace(  # type: ignore
+            _chain_id_board=chain_id_board,
+            _num_pseudo=_move(state._num_pseudo),
+            _idx_sum=_move(state._idx_sum),
+            _idx_squared_sum=_move(state._idx_squared_sum),
+        ),
+    )
 
 
 def _remove_stones(
-    state: State, rm_chain_id, rm_stone_xy, ko_may_occur
+    state: State, rm_chain_id, rm_stone_xy, ko_may_occur, size
 ) -> State:
     surrounded_stones = state._chain_id_board == rm_chain_id
     num_captured_stones = jnp.count_nonzero(surrounded_stones)
@@ -315,8 +396,56 @@ def _remove_stones(
         lambda: jnp.int32(rm_stone_xy),
         lambda: state._ko,
     )
+
+    # removed stones become pseudo liberties of the adjacent chains
+    # (i.e., the opponent's chains surrounding the removed chain)
+    neighbours = _neighbours(size)  # (size**2, 4)
+    adj_chain_id = chain_id_board[neighbours]
+    is_adj_stone = (
+        surrounded_stones[:, None] & (neighbours != -1) & (adj_chain_id != 0)
+    )
+    adj_chain_ix = jnp.where(
+        is_adj_stone, jnp.abs(adj_chain_id) - 1, size**2
+    )
+    idx = jnp.broadcast_to(
+        jnp.arange(1, size**2 + 1)[:, None], (size**2, 4)
+    )
+    rm_chain_ix = jnp.abs(rm_chain_id) - 1
+    num_pseudo = (
+        state._num_pseudo.at[adj_chain_ix]
+        .add(1, mode="drop")
+        .at[rm_chain_ix]
+        .set(0)
+    )
+    idx_sum = (
+        state._idx_sum.at[adj_chain_ix]
+        .add(idx, mode="drop")
+        .at[rm_chain_ix]
+        .set(0)
+    )
+    idx_squared_sum = (
+        state._idx_squared_sum.at[adj_chain_ix]
+        .add(idx**2, mode="drop")
+        .at[rm_chain_ix]
+        .set(0)
+    )
+
+    # removed stones are opponent's
+    removed_hash = jnp.where(
+        surrounded_stones[:, None],
+        ZOBRIST_BOARD[: size**2, 1 - state._turn],
+        jnp.uint32(0),
+    )
+    zobrist_hash = state._zobrist_hash ^ jax.lax.reduce(
+        removed_hash, jnp.uint32(0), jax.lax.bitwise_xor, (0,)
+    )
+
     return state.replace(  # type:ignore
         _chain_id_board=chain_id_board,
+        _zobrist_hash=zobrist_hash,
+        _num_pseudo=num_pseudo,
+        _idx_sum=idx_sum,
+        _idx_squared_sum=idx_squared_sum,
         _num_captured_stones=state._num_captured_stones.at[state._turn].add(
             num_captured_stones
         ),
@@ -330,12 +459,9 @@ def legal_actions(state: State, size: int) -> jnp.ndarray:
 
     my_color = _my_color(state)
     opp_color = _opponent_color(state)
-    num_pseudo, idx_sum, idx_squared_sum = _count(state, size)
 
     chain_ix = jnp.abs(state._chain_id_board) - 1
-    # fmt: off
-    in_atari = (idx_sum[chain_ix] ** 2) == idx_squared_sum[chain_ix] * num_pseudo[chain_ix]
-    # fmt: on
+    in_atari = _is_atari(state, chain_ix)
     has_liberty = (state._chain_id_board * my_color > 0) & ~in_atari
     kills_opp = (state._chain_id_board * opp_color > 0) & in_atari
 
@@ -362,43 +488,22 @@ def legal_actions(state: State, size: int) -> jnp.ndarray:
     )
 
 
-def _count(state: State, size):
-    ZERO = jnp.int32(0)
-    chain_id_board = jnp.abs(state._chain_id_board)
-    is_empty = chain_id_board == 0
-    idx_sum = jnp.where(is_empty, jnp.arange(1, size**2 + 1), ZERO)
-    idx_squared_sum = jnp.where(
-        is_empty, jnp.arange(1, size**2 + 1) ** 2, ZERO
-    )
+def _is_atari(state: State, chain_ix):
+    """Pseudo-liberty trick used in OpenSpiel's Go implementation.
 
-    @jax.vmap
-    def _count_neighbor(xy):
-        neighbors = _neighbour(xy, size)
-        on_board = neighbors != -1
-        # fmt: off
-        return (jnp.where(on_board, is_empty[neighbors], ZERO).sum(),
-                jnp.where(on_board, idx_sum[neighbors], ZERO).sum(),
-                jnp.where(on_board, idx_squared_sum[neighbors], ZERO).sum())
-        # fmt: on
-
-    idx = jnp.arange(size**2)
-    num_pseudo, idx_sum, idx_squared_sum = _count_neighbor(idx)
-
-    @jax.vmap
-    def _num_pseudo(x):
-        return jnp.where(chain_id_board == (x + 1), num_pseudo, ZERO).sum()
+    For each chain, we track (over all pairs of a stone and its adjacent empty point)
 
-    @jax.vmap
-    def _idx_sum(x):
-        return jnp.where(chain_id_board == (x + 1), idx_sum, ZERO).sum()
-
-    @jax.vmap
-    def _idx_squared_sum(x):
-        return jnp.where(
-            chain_id_board == (x + 1), idx_squared_sum, ZERO
-        ).sum()
+      - num_pseudo: the number of such pairs
+      - idx_sum: sum of (empty point idx + 1)
+      - idx_squared_sum: sum of (empty point idx + 1) ** 2
 
-    return _num_pseudo(idx), _idx_sum(idx), _idx_squared_sum(idx)
+    The chain has a single liberty iff all the pseudo liberties point the same empty point, i.e.,
+    idx_sum ** 2 == idx_squared_sum * num_pseudo (Cauchy-Schwarz).
+    """
+    num_pseudo = state._num_pseudo[chain_ix]
+    idx_sum = state._idx_sum[chain_ix]
+    idx_squared_sum = state._idx_squared_sum[chain_ix]
+    return (idx_sum**2) == idx_squared_sum * num_pseudo
 
 
 def _my_color(state: State):
@@ -422,11 +527,12 @@ def _ko_may_occur(state: State, xy: int) -> jnp.ndarray:
 
 
 def _count_point(state, size):
+    region = _empty_region(state._chain_id_board, size)
     return jnp.array(
         [
-            _count_ji(state, 1, size)
+            _count_ji_by_region(state._chain_id_board, region, 1, size)
             + jnp.count_nonzero(state._chain_id_board > 0),
-            _count_ji(state, -1, size)
+            _count_ji_by_region(state._chain_id_board, region, -1, size)
             + jnp.count_nonzero(state._chain_id_board < 0),
         ],
         dtype=jnp.float32,
@@ -462,30 +568,73 @@ def _neighbours(size):
 
 
 def _count_ji(state: State, color: int, size: int):
-    board = jnp.zeros_like(state._chain_id_board)
-    board = jnp.where(state._chain_id_board * color > 0, 1, board)
-    board = jnp.where(state._chain_id_board * color < 0, -1, board)
-    # 0 = empty, 1 = mine, -1 = opponent's
+    region = _empty_region(state._chain_id_board, size)
+    return _count_ji_by_region(state._chain_id_board, region, color, size)
 
-    neighbours = _neighbours(size)
 
-    def is_opp_neighbours(b):
-        # True if empty and any of neighbours is opponent
-        return (b == 0) & (
-            (b[neighbours.flatten()] == -1).reshape(size**2, 4)
-            & (neighbours != -1)
-        ).any(axis=1)
+def _count_ji_by_region(chain_id_board, region, color: int, size: int):
+    """Number of empty points in the regions not adjacent to the opponent's stones"""
+    neighbours = _neighbours(size)
+    is_empty = chain_id_board == 0
+    is_opp = chain_id_board * color < 0
+    is_adj_opp = (
+        is_empty & ((neighbours >= 0) & is_opp[neighbours]).any(axis=1)
+    ).astype(jnp.int32)
+    is_region_adj_opp = (
+        jnp.zeros_like(is_adj_opp).at[region].max(is_adj_opp) > 0
+    )
+    return (is_empty & ~is_region_adj_opp[region]).sum()
 
-    def fill_opp(x):
-        b, _ = x
-        mask = is_opp_neighbours(b)
-        return jnp.where(mask, -1, b), mask.any()
 
-    # fmt off
-    b, _ = jax.lax.while_loop(lambda x: x[1], fill_opp, (board, TRUE))
-    # fmt on
+def _empty_region(chain_id_board, size: int):
+    """Label each empty point by the smallest point of its connected empty region.
+    Stones are labelled by themselves.
 
-    return (b == 0).sum()
+    Connected component labelling by hooking and pointer jumping with a fixed number of rounds.
+    In each round, every tree of a region is hooked to a neighbouring tree with a smaller label
+    (trees always point to smaller labels, so no cycle is made).
+    The number of trees in a region at least halves in each round, so
+    at most ceil(log2(size^2)) rounds of O(size^2 log(size^2)) work are needed,
+    while the flood fill takes O(size^2) iterations for a long, winding region.
+    """
+    n = size * size
+    num_rounds = max(1, (n - 1).bit_length())
+    neighbours = _neighbours(size)
+    is_empty = chain_id_board == 0
+    is_connected = is_empty[:, None] & (neighbours >= 0) & is_empty[neighbours]
+    # self for unconnected neighbours
+    neighbours = jnp.where(is_connected, neighbours, jnp.arange(n)[:, None])
+
+    def jump(x):
+        parent, i = x
+        return parent[parent], i + 1
+
+    def is_jumping(x):
+        parent, i = x
+        return (i < num_rounds) & (parent[parent] != parent).any()
+
+    def hook(x):
+        parent, _, i = x
+        # trees are stars here: parent is the root
+        root = parent
+        # hook each root to the smallest neighbouring root
+        parent = parent.at[root].min(parent[neighbours].min(axis=1))
+        # hook the remaining roots (e.g., stagnant ones whose neighbours
+        # are hooked to others) to the new parent of neighbouring trees
+        is_root = parent[root] == root
+        parent = parent.at[jnp.where(is_root, root, n)].min(
+            parent[parent[neighbours]].min(axis=1), mode="drop"
+        )
+        # pointer jumping makes all trees stars
+        parent, _ = jax.lax.while_loop(is_jumping, jump, (parent, 0))
+        return parent, (parent != root).any(), i + 1
+
+    parent, _, _ = jax.lax.while_loop(
+        lambda x: x[1] & (x[2] < num_rounds),
+        hook,
+        (jnp.arange(n), TRUE, 0),
+    )
+    return parent
 
 
 def _check_PSK(state):
@@ -514,6 +663,7 @@ def _check_PSK(state):
       - Cons: Ignoring the old same boards
 
     Anyway, we believe it's effect is very small as PSK rarely happens, especially in 19x19 board.
+    If strict PSK detection is required, use `Go(superko=True)` (see `_check_superko`).
     """
     # fmt: off
     is_psk = ~state._passed & (jnp.abs(state._board_history[0] - state._board_history[1:]).sum(axis=1) == 0).any()
@@ -530,6 +680,32 @@ def _check_PSK(state):
     return state
 
 
+def _check_superko(state):
+    """Strict version of `_check_PSK` enabled by `Go(superko=True)`.
+
+    The Zobrist hash of the board is compared with the hashes of all the previous boards
+    (stored in `_hash_history`) instead of comparing the last 8 boards.
+    As with `_check_PSK`, PSK action (except pass) leads to immediate lose.
+    """
+    is_same = (state._hash_history == state._zobrist_hash).all(axis=1)
+    is_previous = jnp.arange(state._hash_history.shape[0]) < state._step_count
+    is_psk = ~state._passed & (is_same & is_previous).any()
+    winner = state.current_player
+    state = jax.lax.cond(
+        is_psk,
+        lambda: state.replace(  # type: ignore
+            terminated=TRUE,
+            reward=jnp.float32([-1, -1]).at[winner].set(1.0),
+        ),
+        lambda: state,
+    )
+    return state.replace(  # type: ignore
+        _hash_history=state._hash_history.at[state._step_count].set(
+            state._zobrist_hash
+        )
+    )
+
+
 # only for debug
 def _show(state: State) -> None:
     BLACK_CHAR = "@"
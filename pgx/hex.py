@@ -44,9 +44,14 @@ class State(v1.State):
     #  .
     #  .
     #  [110, 111, 112, ...,  119, 120]]
-    _board: jnp.ndarray = -jnp.zeros(
+    _board: jnp.ndarray = jnp.zeros(
         11 * 11, jnp.int32
-    )  # <0(oppo), 0(empty), 0<(self)
+    )  # -1(oppo), 0(empty), 1(self)
+    # union-find of connected stones
+    # parent of each stone, or -(size of the group) if the stone is the root
+    _parent: jnp.ndarray = -jnp.ones(11 * 11, jnp.int32)
+    # whether the group of each root touches the two edges to connect
+    _edges: jnp.ndarray = jnp.zeros((11 * 11, 2), jnp.bool_)
 
     @property
     def env_id(self) -> v1.EnvId:
@@ -91,24 +96,47 @@ def _init(rng: jax.random.KeyArray, size: int) -> State:
         current_player=current_player,
         legal_action_mask=jnp.ones(size * size, dtype=jnp.bool_),
         _board=jnp.zeros(size * size, dtype=jnp.int32),
+        _parent=-jnp.ones(size * size, dtype=jnp.int32),
+        _edges=jnp.zeros((size * size, 2), dtype=jnp.bool_),
     )  # type:ignore
 
 
 def _step(state: State, action: jnp.ndarray, size: int) -> State:
-    set_place_id = action + 1
-    board = state._board.at[action].set(set_place_id)
-    neighbour = _neighbour(action, size)
-
-    def merge(i, b):
-        adj_pos = neighbour[i]
-        return jax.lax.cond(
-            (adj_pos >= 0) & (b[adj_pos] > 0),
-            lambda: jnp.where(b == b[adj_pos], set_place_id, b),
-            lambda: b,
-        )
+    board = state._board.at[action].set(1)
+    x, y = action // size, action % size
+    edge = jax.lax.select(
+        state._turn == 0,
+        jnp.array([x == 0, x == size - 1]),
+        jnp.array([y == 0, y == size - 1]),
+    )
 
-    board = jax.lax.fori_loop(0, 6, merge, board)
-    won = _is_game_end(board, size, state._turn)
+    # merge the groups of adjacent stones into the largest one (union by size)
+    parent = state._parent
+    action = action.astype(parent.dtype)
+    neighbour = _neighbour(action, size)
+    is_mine = (neighbour >= 0) & (board[neighbour] > 0)
+    roots = _find(parent, jnp.where(is_mine, neighbour, action))
+    is_dup = (roots[:, None] == roots[None, :]) & jnp.tri(
+        6, k=-1, dtype=jnp.bool_
+    )
+    is_group = is_mine & ~is_dup.any(axis=1)
+    group_size = jnp.where(is_group, -parent[roots], 0)
+    root = jax.lax.select(
+        is_group.any(), roots[jnp.argmax(group_size)], action
+    )
+    # out-of-bounds indices are dropped
+    ix = jnp.where(is_group & (roots != root), roots, size * size)
+    parent = parent.at[ix].set(root, mode="drop")
+    ix = jnp.where(is_mine & (neighbour != root), neighbour, size * size)
+    parent = parent.at[ix].set(root, mode="drop")  # path compression
+    parent = parent.at[root].set(-1 - group_size.sum())
+    parent = parent.at[action].set(
+        jax.lax.select(root == action, parent[action], root)
+    )
+    edges = state._edges.at[root].set(
+        edge | (state._edges[roots] & is_group[:, None]).any(axis=0)
+    )
+    won = edges[root].all()
     reward = jax.lax.cond(
         won,
         lambda: jnp.float32([-1, -1]).at[state.current_player].set(1),
@@ -120,6 +148,8 @@ def _step(state: State, action: jnp.ndarray, size: int) -> State:
         current_player=1 - state.current_player,
         _turn=1 - state._turn,
         _board=board * -1,
+        _parent=parent,
+        _edges=edges,
         reward=reward,
         terminated=won,
         legal_action_mask=legal_action_mask,
@@ -128,6 +158,15 @@ def _step(state: State, action: jnp.ndarray, size: int) -> State:
     return state
 
 
+def _find(parent, x):
+    """Roots of the stones `x`. Union by size keeps the depth O(log N)."""
+    return jax.lax.while_loop(
+        lambda x: (parent[x] >= 0).any(),
+        lambda x: jnp.where(parent[x] >= 0, parent[x], x),
+        x.astype(parent.dtype),
+    )
+
+
 def _observe(state: State, player_id: jnp.ndarray, size) -> jnp.ndarray:
     board = jax.lax.cond(
         player_id == state.current_player,
@@ -155,19 +194,6 @@ def _neighbour(xy, size):
     return jnp.where(on_board, xs * size + ys, -1)
 
 
-def _is_game_end(board, size, turn):
-    top, bottom = jax.lax.cond(
-        turn == 0,
-        lambda: (board[:size], board[-size:]),
-        lambda: (board[::size], board[size - 1 :: size]),
-    )
-
-    def check_same_id_exist(_id):
-        return (_id > 0) & (_id == bottom).any()
-
-    return jax.vmap(check_same_id_exist)(top).any()
-
-
 def _get_abs_board(state):
     return jax.lax.cond(
         state._turn == 0, lambda: state._board, lambda: state._board * -1
@@ -42,7 +42,11 @@ class State(v1.State):
     #  [40, 41, 42, 43, 44, 45, 46, 47],
     #  [48, 49, 50, 51, 52, 53, 54, 55],
     #  [56, 57, 58, 59, 60, 61, 62, 63]]
-    _board: jnp.ndarray = jnp.zeros(64, jnp.int8)  # -1(opp), 0(empty), 1(self)
+    #
+    # Bitboards of (current player, opponent). Square i is the i-th bit of a 64-bit integer,
+    # which is represented by a pair of uint32 (bits for squares 0-31 and 32-63)
+    # because uint64 is not available in JAX unless x64 is enabled.
+    _board: jnp.ndarray = jnp.zeros((2, 2), dtype=jnp.uint32)
     _passed: jnp.ndarray = FALSE
 
     @property
@@ -78,27 +82,26 @@ class Othello(v1.Env):
         return 2
 
 
-# fmt:off
-LR_MASK = jnp.array([
-    0, 1, 1, 1, 1, 1, 1, 0,
-    0, 1, 1, 1, 1, 1, 1, 0,
-    0, 1, 1, 1, 1, 1, 1, 0,
-    0, 1, 1, 1, 1, 1, 1, 0,
-    0, 1, 1, 1, 1, 1, 1, 0,
-    0, 1, 1, 1, 1, 1, 1, 0,
-    0, 1, 1, 1, 1, 1, 1, 0,
-    0, 1, 1, 1, 1, 1, 1, 0], dtype=jnp.bool_)
-UD_MASK = jnp.array([
-    0, 0, 0, 0, 0, 0, 0, 0,
-    1, 1, 1, 1, 1, 1, 1, 1,
-    1, 1, 1, 1, 1, 1, 1, 1,
-    1, 1, 1, 1, 1, 1, 1, 1,
-    1, 1, 1, 1, 1, 1, 1, 1,
-    1, 1, 1, 1, 1, 1, 1, 1,
-    1, 1, 1, 1, 1, 1, 1, 1,
-    0, 0, 0, 0, 0, 0, 0, 0], dtype=jnp.bool_)
-# fmt:on
-SIDE_MASK = LR_MASK & UD_MASK
+def _to_bb(squares) -> jnp.ndarray:
+    bb = sum(1 << i for i in squares)
+    return jnp.uint32([bb & 0xFFFFFFFF, bb >> 32])
+
+
+ALL = _to_bb(range(64))
+NOT_A_FILE = _to_bb(i for i in range(64) if i % 8 != 0)
+NOT_H_FILE = _to_bb(i for i in range(64) if i % 8 != 7)
+# (shift, mask): a stone moving by `shift` must land on `mask` not to wrap around the board
+DIRECTIONS = [
+    (1, NOT_A_FILE),
+    (-1, NOT_H_FILE),
+    (8, ALL),
+    (-8, ALL),
+    (7, NOT_H_FILE),
+    (-7, NOT_A_FILE),
+    (9, NOT_A_FILE),
+    (-9, NOT_H_FILE),
+]
+INIT_BOARD = jnp.stack([_to_bb([28, 35]), _to_bb([27, 36])])
 
 
 def _init(rng: jax.random.KeyArray) -> State:
@@ -106,15 +109,7 @@ def _init(rng: jax.random.KeyArray) -> State:
     current_player = jnp.int8(jax.random.bernoulli(subkey))
     return State(
         current_player=current_player,
-        _board=jnp.zeros(64, dtype=jnp.int8)
-        .at[28]
-        .set(1)
-        .at[35]
-        .set(1)
-        .at[27]
-        .set(-1)
-        .at[36]
-        .set(-1),
+        _board=INIT_BOARD,
         legal_action_mask=jnp.zeros(64 + 1, dtype=jnp.bool_)
         .at[19]
         .set(TRUE)
@@ -128,56 +123,33 @@ def _init(rng: jax.random.KeyArray) -> State:
 
 
 def _step(state, action):
-    board = state._board
-    my = board > 0
-    opp = board < 0
-
-    # updates at out-of-bounds indices will be skipped:
-    # https://jax.readthedocs.io/en/latest/notebooks/Common_Gotchas_in_JAX.html#out-of-bounds-indexing
-    # Therefore, there is no need to ignore the path action
-    pos = jnp.zeros(64, dtype=jnp.bool_).at[action].set(TRUE)
-
-    shifts = jnp.array([1, -1, 8, -8, 7, -7, 9, -9])
-    masks = jnp.array(
-        [
-            LR_MASK,
-            LR_MASK,
-            UD_MASK,
-            UD_MASK,
-            SIDE_MASK,
-            SIDE_MASK,
-            SIDE_MASK,
-            SIDE_MASK,
-        ]
-    )
+    my, opp = state._board
 
-    def _shift(i, rev):
-        tmp = _check_line(pos, opp, shifts[i], masks[i])
-        return jax.lax.cond(
-            (jnp.roll(tmp, shifts[i]) & my).any(),
-            lambda: rev | tmp,
-            lambda: rev,
-        )
+    # empty for the pass action (= 64)
+    pos = _square_bb(action)
 
-    rev = jax.lax.fori_loop(0, 8, _shift, jnp.zeros(64, dtype=jnp.bool_))
+    rev = jnp.zeros(2, dtype=jnp.uint32)
+    for shift, mask in DIRECTIONS:
+        # opponent stones between pos and my stone
+        tmp = _fill(pos, opp, shift, mask) & opp
+        rev |= jnp.where(
+            (_shift(tmp, shift) & mask & my).any(), tmp, jnp.uint32(0)
+        )
     my ^= pos | rev
     opp ^= rev
     emp = ~(my | opp)
 
-    def _make_legal(i, legal):
-        # NOT _check_line(my, opp, shifts[i], masks[i])
+    legal_action = jnp.zeros(2, dtype=jnp.uint32)
+    for shift, mask in DIRECTIONS:
+        # NOT _fill(my, opp, ...)
         # because this generates a legal action for the next turn
-        tmp = _check_line(opp, my, shifts[i], masks[i])
-        tmp = jnp.roll(tmp, shifts[i]) & emp
-        return legal | tmp
-
-    legal_action = jax.lax.fori_loop(
-        0, 8, _make_legal, jnp.zeros(64, dtype=jnp.bool_)
-    )
+        tmp = _fill(opp, my, shift, mask) & my
+        legal_action |= _shift(tmp, shift) & mask & emp
+    legal_action = _to_mask(legal_action)
 
     reward, terminated = jax.lax.cond(
         (
-            (jnp.count_nonzero(my | opp) == 64)
+            (_count(my | opp) == 64)
             | ~opp.any()
             | (state._passed & (action == 64))
         ),
@@ -194,25 +166,55 @@ def _step(state, action):
         .set(~legal_action.any()),
         reward=reward,
         terminated=terminated,
-        _board=-jnp.where(jnp.int8(opp), -1, jnp.int8(my)),
+        _board=jnp.stack([opp, my]),
         _passed=action == 64,
     )
 
 
-def _check_line(pos, opp, shift, mask):
-    _opp = opp & mask
-    result = _opp & jnp.roll(pos, shift)
-    result |= _opp & jnp.roll(result, shift)
-    result |= _opp & jnp.roll(result, shift)
-    result |= _opp & jnp.roll(result, shift)
-    result |= _opp & jnp.roll(result, shift)
-    result |= _opp & jnp.roll(result, shift)
-    return result
+def _shift(bb, n: int):
+    """Shift 64-bit bitboard `bb` by `n` bits (left if n > 0 and right if n < 0)"""
+    lo, hi = bb[0], bb[1]
+    if n >= 32:
+        lo, hi = jnp.uint32(0), lo << (n - 32)
+    elif n > 0:
+        lo, hi = lo << n, (hi << n) | (lo >> (32 - n))
+    elif n <= -32:
+        lo, hi = hi >> (-n - 32), jnp.uint32(0)
+    elif n < 0:
+        lo, hi = (lo >> -n) | (hi << (32 + n)), hi >> -n
+    return jnp.stack([lo, hi])
+
+
+def _fill(gen, pro, shift: int, mask):
+    """Kogge-Stone occluded fill of `gen` through `pro` in the direction of `shift`"""
+    pro = pro & mask
+    gen |= pro & _shift(gen, shift)
+    pro &= _shift(pro, shift)
+    gen |= pro & _shift(gen, 2 * shift)
+    pro &= _shift(pro, 2 * shift)
+    gen |= pro & _shift(gen, 4 * shift)
+    return gen
+
+
+def _square_bb(pos):
+    """Bitboard of the square `pos` (empty if pos is out of the board)"""
+    bit = jnp.left_shift(jnp.uint32(1), (pos % 32).astype(jnp.uint32))
+    return jnp.where(jnp.arange(2) == pos // 32, bit, jnp.uint32(0))
+
+
+def _to_mask(bb):
+    """(..., 2) bitboard to (..., 64) bool array"""
+    bits = (bb[..., None] >> jnp.arange(32, dtype=jnp.uint32)) & 1
+    return bits.astype(jnp.bool_).reshape(bb.shape[:-1] + (64,))
+
+
+def _count(bb):
+    return jax.lax.population_count(bb).sum()
 
 
 def _get_reward(my, opp, curr_player):
-    my = jnp.count_nonzero(my)
-    opp = jnp.count_nonzero(opp)
+    my = _count(my)
+    opp = _count(opp)
     winner = jax.lax.cond(
         my > opp, lambda: curr_player, lambda: 1 - curr_player
     )
@@ -226,17 +228,18 @@ def _get_reward(my, opp, curr_player):
 def _observe(state, player_id) -> jnp.ndarray:
     board = jax.lax.cond(
         player_id == state.current_player,
-        lambda: state._board.reshape((8, 8)),
-        lambda: (state._board * -1).reshape((8, 8)),
+        lambda: state._board,
+        lambda: state._board[::-1],
     )
+    return _to_mask(board).reshape((2, 8, 8)).transpose((1, 2, 0))
 
-    def make(color):
-        return board * color > 0
 
-    return jnp.stack(jax.vmap(make)(jnp.int8([1, -1])), -1)
+def _get_board(state):
+    """int8 board of 1 (current player), -1 (opponent), and 0 (empty)"""
+    my, opp = _to_mask(state._board)
+    return my.astype(jnp.int8) - opp.astype(jnp.int8)
 
 
 def _get_abs_board(state):
-    return jax.lax.cond(
-        state._turn == 0, lambda: state._board, lambda: state._board * -1
-    )
+    board = _get_board(state)
+    return jax.lax.cond(state._turn == 0, lambda: board, lambda: board * -1)
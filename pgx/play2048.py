@@ -17,11 +17,11 @@ import jax
 import jax.numpy as jnp
 
 import pgx.v1 as v1
+from pgx._src.play2048_utils import BITS, row_tables
 from pgx._src.struct import dataclass
 
 FALSE = jnp.bool_(False)
 TRUE = jnp.bool_(True)
-ZERO = jnp.int8(0)
 
 
 @dataclass
@@ -90,7 +90,10 @@ def _init(rng: jax.random.KeyArray) -> State:
     rng1, rng2 = jax.random.split(rng)
     board = _add_random_num(jnp.zeros((4, 4), jnp.int8), rng1)
     board = _add_random_num(board, rng2)
-    return State(_board=board.ravel())  # type:ignore
+    return State(  # type:ignore
+        _board=board.ravel(),
+        legal_action_mask=_legal_action_mask(board).ravel(),
+    )
 
 
 def _step(state: State, action):
@@ -119,16 +122,7 @@ def _step(state: State, action):
     _rng_key, sub_key = jax.random.split(state._rng_key)
     board_2d = _add_random_num(board_2d, sub_key)
 
-    legal_action = jax.vmap(_can_slide_left)(
-        jnp.array(
-            [
-                board_2d,
-                jnp.rot90(board_2d, 1),
-                jnp.rot90(board_2d, 2),
-                jnp.rot90(board_2d, 3),
-            ]
-        )
-    )
+    legal_action = _legal_action_mask(board_2d)
 
     return state.replace(  # type:ignore
         _rng_key=_rng_key,
@@ -163,73 +157,28 @@ def _add_random_num(board_2d, key):
 
 def _slide_and_merge(line):
     """[2 2 2 2] -> [4 4 0 0]"""
-    line = _slide_left(line)
-    line, reward = _merge(line)
-    line = _slide_left(line)
-    return line, reward
-
-
-def _merge(line):
-    """[2 2 2 2] -> [4 0 4 0]"""
-    line, reward = jax.lax.cond(
-        (line[0] != 0) & (line[0] == line[1]),
-        lambda: (
-            line.at[0].set(line[0] + 1).at[1].set(ZERO),
-            2 ** (line[0] + 1),
-        ),
-        lambda: (line, ZERO),
-    )
-    line, reward = jax.lax.cond(
-        (line[1] != 0) & (line[1] == line[2]),
-        lambda: (
-            line.at[1].set(line[1] + 1).at[2].set(ZERO),
-            reward + 2 ** (line[1] + 1),
-        ),
-        lambda: (line, reward),
-    )
-    line, reward = jax.lax.cond(
-        (line[2] != 0) & (line[2] == line[3]),
-        lambda: (
-            line.at[2].set(line[2] + 1).at[3].set(ZERO),
-            reward + 2 ** (line[2] + 1),
-        ),
-        lambda: (line, reward),
-    )
-    return line, reward
+    slide_left, reward, _ = row_tables()
+    ix = _to_index(line)
+    return slide_left[ix], reward[ix]
 
 
-def _slide_left(line):
-    """[0 2 0 2] -> [2 2 0 0]"""
-    line = jax.lax.cond(
-        (line[2] == 0),
-        lambda: line.at[2:].set(jnp.roll(line[2:], -1)),
-        lambda: line,
-    )
-    line = jax.lax.cond(
-        (line[1] == 0),
-        lambda: line.at[1:].set(jnp.roll(line[1:], -1)),
-        lambda: line,
-    )
-    line = jax.lax.cond(
-        (line[0] == 0),
-        lambda: jnp.roll(line, -1),
-        lambda: line,
+def _legal_action_mask(board_2d):
+    _, _, can_move = row_tables()
+    can_move_row = can_move[_to_index(board_2d)]  # (left, right)
+    can_move_col = can_move[_to_index(board_2d.T)]  # (up, down)
+    return jnp.array(
+        [
+            can_move_row[:, 0].any(),
+            can_move_col[:, 0].any(),
+            can_move_row[:, 1].any(),
+            can_move_col[:, 1].any(),
+        ]
     )
-    return line
-
 
-def _can_slide_left(board_2d):
-    def _can_slide(line):
-        """Judge if it can be moved to the left."""
-        can_slide = (line[:3] == 0).any()
-        can_slide |= (
-            (line[0] == line[1]) | (line[1] == line[2]) | (line[2] == line[3])
-        )
-        can_slide &= ~(line == 0).all()
-        return can_slide
 
-    can_slide = jax.vmap(_can_slide)(board_2d).any()
-    return can_slide
+def _to_index(line):
+    """Encode rows (..., 4) to the indices of the tables in play2048_utils"""
+    return (line.astype(jnp.int32) << (BITS * jnp.arange(4))).sum(axis=-1)
 
 
 # only for debug
@@ -21,13 +21,14 @@ import jax.numpy as jnp
 import pgx.v1 as v1
 from pgx._src.shogi_utils import (
     AROUND_IX,
-    BETWEEN_IX,
-    CAN_MOVE,
-    CAN_MOVE_ANY,
+    CAN_MOVE_ALL,
     INIT_LEGAL_ACTION_MASK,
     INIT_PIECE_BOARD,
     LEGAL_FROM_IDX,
-    NEIGHBOUR_IX,
+    LINE_BETWEEN_IX,
+    ZOBRIST_BOARD,
+    ZOBRIST_HAND,
+    ZOBRIST_SIDE,
     _from_sfen,
     _to_sfen,
 )
@@ -68,6 +69,9 @@ OPP_DRAGON = jnp.int8(27)  # 相手龍
 
 ALL_SQ = jnp.arange(81)
 
+# Repetition (千日手) is detected within the last HASH_HISTORY_LENGTH plies
+HASH_HISTORY_LENGTH = 256
+
 
 @dataclass
 class State(v1.State):
@@ -82,10 +86,23 @@ class State(v1.State):
     _turn: jnp.ndarray = jnp.int8(0)  # 0 or 1
     _board: jnp.ndarray = INIT_PIECE_BOARD  # (81,) 後手のときにはflipする
     _hand: jnp.ndarray = jnp.zeros((2, 7), dtype=jnp.int8)  # 後手のときにはflipする
-    # cache
-    # Redundant information used only in _is_checked for speeding-up
-    _cache_m2b: jnp.ndarray = -jnp.ones(8, dtype=jnp.int8)
-    _cache_king: jnp.ndarray = jnp.int32(44)
+    # Redundant information for observation computed from the attack map in step (see `_attacks`).
+    # Side 0 is the current player and side 1 is the opponent (from current player's view).
+    # _attack_bits[side, piece] is the bitset of squares attacked by `piece` of `side`
+    # (81 bits in 3 uint32, see `_to_bitset`).
+    _attack_bits: jnp.ndarray = jnp.zeros((2, 14, 3), dtype=jnp.uint32)
+    # _attack_count[side, sq] is the number of pieces of `side` attacking `sq`.
+    _attack_count: jnp.ndarray = jnp.zeros((2, 81), dtype=jnp.int8)
+    # Zobrist hash of board, hands, and side to move (in black's view, see `_zobrist_hash`)
+    _zobrist_hash: jnp.ndarray = jnp.zeros(2, dtype=jnp.uint32)
+    # Ring buffer. Hash after `_step_count` plies is stored at `_step_count % HASH_HISTORY_LENGTH`
+    _hash_history: jnp.ndarray = jnp.zeros(
+        (HASH_HISTORY_LENGTH, 2), dtype=jnp.uint32
+    )
+    # Whether the player to move is checked after each ply (same indexing as `_hash_history`)
+    _check_history: jnp.ndarray = jnp.zeros(
+        HASH_HISTORY_LENGTH, dtype=jnp.bool_
+    )
 
     @property
     def env_id(self) -> v1.EnvId:
@@ -99,13 +116,27 @@ class State(v1.State):
         # fmt: off
         state = jax.lax.cond(turn % 2 == 1, lambda: _flip(state), lambda: state)
         # fmt: on
-        return state.replace(legal_action_mask=_legal_action_mask(state))  # type: ignore
+        effects = _effects(state._board)
+        attack_bits, attack_count = _attacks(state._board, effects)
+        state = state.replace(  # type: ignore
+            _attack_bits=attack_bits,
+            _attack_count=attack_count,
+            _zobrist_hash=_zobrist_hash(state),
+        )
+        return state.replace(legal_action_mask=_legal_action_mask(state, effects))  # type: ignore
 
     @staticmethod
     def _from_sfen(sfen):
         turn, pb, hand, step_count = _from_sfen(sfen)
-        return jax.jit(State._from_board)(turn, pb, hand).replace(  # type: ignore
-            _step_count=jnp.int32(step_count)
+        state = jax.jit(State._from_board)(turn, pb, hand)
+        return state.replace(  # type: ignore
+            _step_count=jnp.int32(step_count),
+            _hash_history=state._hash_history.at[
+                step_count % HASH_HISTORY_LENGTH
+            ].set(state._zobrist_hash),
+            _check_history=state._check_history.at[
+                step_count % HASH_HISTORY_LENGTH
+            ].set(_is_checked(state)),
         )
 
     def _to_sfen(self):
@@ -231,7 +262,14 @@ class Action:
 
 def _init_board():
     """Initialize Shogi State."""
-    return State()
+    return State(  # type: ignore
+        _attack_bits=INIT_ATTACK_BITS,
+        _attack_count=INIT_ATTACK_COUNT,
+        _zobrist_hash=INIT_ZOBRIST_HASH,
+        _hash_history=jnp.zeros((HASH_HISTORY_LENGTH, 2), dtype=jnp.uint32)
+        .at[0]
+        .set(INIT_ZOBRIST_HASH),
+    )
 
 
 def _step(state: State, action: jnp.ndarray):
@@ -240,18 +278,32 @@ def _step(state: State, action: jnp.ndarray):
     state = jax.lax.cond(a.is_drop, _step_drop, _step_move, *(state, a))
     # flip state
     state = _flip(state)
+    # attack map shared by legal action mask, check detection, and observation
+    effects = _effects(state._board)
+    attack_bits, attack_count = _attacks(state._board, effects)
     state = state.replace(  # type: ignore
         current_player=(state.current_player + 1) % 2,
         _turn=(state._turn + 1) % 2,
+        _attack_bits=attack_bits,
+        _attack_count=attack_count,
+        _zobrist_hash=state._zobrist_hash ^ ZOBRIST_SIDE,
+    )
+    ix = state._step_count % HASH_HISTORY_LENGTH
+    state = state.replace(  # type: ignore
+        _hash_history=state._hash_history.at[ix].set(state._zobrist_hash),
+        _check_history=state._check_history.at[ix].set(_is_checked(state)),
     )
-    legal_action_mask = _legal_action_mask(state)
-    terminated = ~legal_action_mask.any()
+    legal_action_mask = _legal_action_mask(state, effects)
+    is_checkmated = ~legal_action_mask.any()
+    is_repetition, repetition_reward = _sennichite(state)
+    terminated = is_checkmated | is_repetition
     # fmt: off
     reward = jax.lax.select(
-        terminated,
+        is_checkmated,
         jnp.ones(2, dtype=jnp.float32).at[state.current_player].set(-1),
-        jnp.zeros(2, dtype=jnp.float32),
+        repetition_reward,
     )
+    reward = jax.lax.select(terminated, reward, jnp.zeros(2, dtype=jnp.float32))
     # fmt: on
     return state.replace(  # type: ignore
         legal_action_mask=legal_action_mask,
@@ -261,6 +313,7 @@ def _step(state: State, action: jnp.ndarray):
 
 
 def _step_move(state: State, action: Action) -> State:
+    turn, hash_ = state._turn, state._zobrist_hash
     pb = state._board
     # remove piece from the original position
     pb = pb.at[action.from_].set(EMPTY)
@@ -278,8 +331,20 @@ def _step_move(state: State, action: Action) -> State:
     piece = jax.lax.select(action.is_promotion, action.piece + 8, action.piece)
     # set piece to the target position
     pb = pb.at[action.to].set(piece)
+    # update hash
+    hash_ ^= _hash_piece(turn, action.from_, action.piece)
+    hash_ ^= _hash_piece(turn, action.to, piece)
+    hand_piece = ((captured + 14) % 28) % 8
+    num = state._hand[0, hand_piece]
+    hash_ ^= jnp.where(
+        captured == EMPTY,
+        jnp.uint32(0),
+        _hash_piece(turn, action.to, captured)
+        ^ ZOBRIST_HAND[turn, hand_piece, num]
+        ^ ZOBRIST_HAND[turn, hand_piece, num + 1],
+    )
     # apply piece moves
-    return state.replace(_board=pb, _hand=hand)  # type: ignore
+    return state.replace(_board=pb, _hand=hand, _zobrist_hash=hash_)  # type: ignore
 
 
 def _step_drop(state: State, action: Action) -> State:
@@ -287,36 +352,141 @@ def _step_drop(state: State, action: Action) -> State:
     pb = state._board.at[action.to].set(action.piece)
     # remove piece from hand
     hand = state._hand.at[0, action.piece].add(-1)
-    return state.replace(_board=pb, _hand=hand)  # type: ignore
+    # update hash
+    turn, num = state._turn, state._hand[0, action.piece]
+    hash_ = state._zobrist_hash ^ _hash_piece(turn, action.to, action.piece)
+    hash_ ^= ZOBRIST_HAND[turn, action.piece, num]
+    hash_ ^= ZOBRIST_HAND[turn, action.piece, num - 1]
+    return state.replace(_board=pb, _hand=hand, _zobrist_hash=hash_)  # type: ignore
+
+
+def _hash_piece(turn, sq, piece):
+    """Zobrist hash of `piece` at `sq` given in the view of `turn`"""
+    sq = jax.lax.select(turn == 0, sq, 80 - sq)
+    piece = jax.lax.select(turn == 0, piece, (piece + 14) % 28)
+    return ZOBRIST_BOARD[sq, piece]
+
+
+def _zobrist_hash(state: State) -> jnp.ndarray:
+    """Zobrist hash of the state computed from scratch.
+    The hash is the same for the same position (board, hands, and side to move)
+    regardless of the view of the state. Updated incrementally in `_step_move` and `_step_drop`.
+    """
+    state = jax.lax.cond(state._turn == 1, _flip, lambda s: s, state)
+    board_hash = jnp.where(
+        (state._board != EMPTY)[:, None],
+        ZOBRIST_BOARD[ALL_SQ, state._board],
+        jnp.uint32(0),
+    )
+    hand_hash = ZOBRIST_HAND[
+        jnp.arange(2)[:, None], jnp.arange(7), state._hand
+    ].reshape(-1, 2)
+    side_hash = jnp.where(state._turn == 1, ZOBRIST_SIDE, jnp.uint32(0))
+    return side_hash ^ jax.lax.reduce(
+        jnp.vstack([board_hash, hand_hash]),
+        jnp.uint32(0),
+        jax.lax.bitwise_xor,
+        (0,),
+    )
 
 
-def _set_cache(state: State):
-    return state.replace(  # type: ignore
-        _cache_m2b=jnp.nonzero(
-            jax.vmap(_is_major_piece)(state._board), size=8, fill_value=-1
-        )[0],
-        _cache_king=jnp.argmin(jnp.abs(state._board - KING)),
+def _is_checked(state: State):
+    """Whether the player to move is checked"""
+    board = state._board
+    king_pos = jnp.argmax(board == KING)
+    return (state._attack_count[1, king_pos] > 0) & (board == KING).any()
+
+
+def _sennichite(state: State):
+    """Fourfold repetition (千日手) of the current position.
+
+    Positions within the last HASH_HISTORY_LENGTH plies are compared by the Zobrist hash.
+    Repetition is a draw, unless all the moves of one player since the first occurrence
+    of the position were checks (連続王手の千日手). Then the player loses.
+
+    Returns:
+        whether the game ends by repetition and the reward.
+    """
+    ix = jnp.arange(HASH_HISTORY_LENGTH)
+    num_plies_ago = (state._step_count - ix) % HASH_HISTORY_LENGTH
+    is_same = (state._hash_history == state._zobrist_hash).all(axis=1)
+    is_repetition = is_same.sum() >= 4
+    # plies after the first occurrence
+    in_cycle = num_plies_ago < jnp.where(is_same, num_plies_ago, 0).max()
+    # the player who made the last move
+    by_mover = num_plies_ago % 2 == 0
+    checks = state._check_history
+    is_mover_checking = (checks | ~(in_cycle & by_mover)).all()
+    is_opp_checking = (checks | ~(in_cycle & ~by_mover)).all()
+    mover = (state.current_player + 1) % 2
+    reward = jnp.zeros(2, dtype=jnp.float32)
+    reward = jax.lax.select(
+        is_mover_checking & ~is_opp_checking,
+        jnp.ones(2, dtype=jnp.float32).at[mover].set(-1),
+        reward,
     )
+    reward = jax.lax.select(
+        is_opp_checking & ~is_mover_checking,
+        jnp.ones(2, dtype=jnp.float32).at[state.current_player].set(-1),
+        reward,
+    )
+    return is_repetition, reward
 
 
-def _legal_action_mask(state: State):
-    # update cache
-    state = _set_cache(state)
+def _legal_action_mask(state: State, effects: jnp.ndarray):
+    board = state._board
+    mine = (PAWN <= board) & (board < OPP_PAWN)
+    opp = board >= OPP_PAWN
+    king_pos = jnp.argmax(board == KING)
+    has_king = (board == KING).any()
+
+    # squares to capture the checking piece or to block the check
+    checkers = effects[:, king_pos] & opp & has_king
+    num_checkers = checkers.sum()
+    checker = jnp.argmax(checkers)
+    check_mask = jax.lax.select(
+        num_checkers == 0,
+        jnp.ones(81, dtype=jnp.bool_),
+        jax.lax.select(
+            num_checkers == 1,
+            (ALL_SQ == checker) | _to_mask(LINE_BETWEEN_IX[checker, king_pos]),
+            jnp.zeros(81, dtype=jnp.bool_),
+        ),
+    )
+
+    # pinned pieces can only move along the line between the king and the pinning piece
+    pinned, pin_line = _pins(board, king_pos, opp)
+    pin_ix = jnp.argmax(pinned[:, None] == ALL_SQ, axis=0)  # (81,)
+    is_pinned = (pinned[:, None] == ALL_SQ).any(axis=0) & has_king
+    pin_mask = ~is_pinned[:, None] | pin_line[pin_ix]  # (81, 81)
+
+    # king cannot move to the squares attacked by opponent (king removed from the board)
+    opp_sliders = jnp.nonzero(
+        opp & _is_major_piece(board), size=8, fill_value=-1
+    )[0]
+    opp_attacks = (effects & (opp & ~_is_major_piece(board))[:, None]).any(
+        axis=0
+    )
+    opp_attacks |= _slider_attacks(
+        jnp.where(ALL_SQ == king_pos, EMPTY, board), opp_sliders
+    )
 
     a = jax.vmap(partial(Action._from_dlshogi_action, state=state))(
         action=jnp.arange(27 * 81)
     )
 
-    @jax.vmap
-    def is_legal_move_wo_pro(i):
-        return _is_legal_move_wo_pro(a.from_[i], a.to[i], state)
-
-    @jax.vmap
-    def is_legal_drop_wo_piece(to):
-        return _is_legal_drop_wo_piece(to, state)
-
-    pseudo_legal_moves = is_legal_move_wo_pro(jnp.arange(10 * 81))
-    pseudo_legal_drops = is_legal_drop_wo_piece(jnp.arange(81))
+    # moves ignoring promotion
+    from_, to = a.from_[: 10 * 81], a.to[: 10 * 81]
+    pseudo_legal_moves = (
+        (from_ >= 0) & mine[from_] & effects[from_, to] & ~mine[to]
+    )
+    pseudo_legal_moves &= jax.lax.select(
+        board[from_] == KING,
+        ~opp_attacks[to],
+        check_mask[to] & pin_mask[from_, to],
+    )
+    # drops ignoring piece
+    pseudo_legal_drops = (board == EMPTY) & check_mask
 
     @jax.vmap
     def is_legal_move(i):
@@ -341,7 +511,7 @@ def _legal_action_mask(state: State):
     )  # (27 * 81)
 
     # check drop pawn mate
-    is_drop_pawn_mate, to = _is_drop_pawn_mate(state)
+    is_drop_pawn_mate, to = _is_drop_pawn_mate(state, effects)
     direction = 20
     can_drop_pawn = legal_action_mask[direction * 81 + to]  # current
     can_drop_pawn &= ~is_drop_pawn_mate
@@ -352,35 +522,126 @@ def _legal_action_mask(state: State):
     return legal_action_mask
 
 
-def _is_drop_pawn_mate(state: State):
-    # check pawn drop mate
-    opp_king_pos = jnp.argmin(jnp.abs(state._board - OPP_KING))
+def _is_drop_pawn_mate(state: State, effects: jnp.ndarray):
+    board = state._board
+    mine = (PAWN <= board) & (board < OPP_PAWN)
+    opp = board >= OPP_PAWN
+    opp_king_pos = jnp.argmax(board == OPP_KING)
     to = opp_king_pos + 1
-    flip_state = _flip(
-        state.replace(_board=state._board.at[to].set(PAWN))  # type: ignore
-    )
+    is_valid = (board == OPP_KING).any() & (to % 9 != 0)
+    to = jnp.where(is_valid, to, 0)
+    board = board.at[to].set(PAWN)
     # 玉頭の歩を取るか玉が逃げられれば詰みでない
-    # fmt: off
-    flipped_to = 80 - to
-    flip_state = _set_cache(flip_state)
-    can_capture_pawn = jax.vmap(partial(
-        _is_legal_move_wo_pro, to=flipped_to, state=flip_state
-    ))(from_=CAN_MOVE_ANY[flipped_to]).any()
-    from_ = 80 - opp_king_pos
-    can_king_escape = jax.vmap(
-        partial(_is_legal_move_wo_pro, from_=from_, state=flip_state)
-    )(to=AROUND_IX[from_]).any()
-    is_pawn_mate = ~(can_capture_pawn | can_king_escape)
-    # fmt: on
+    # squares attacked by my pieces after the opponent king moves
+    my_sliders = jnp.nonzero(
+        mine & _is_major_piece(board), size=8, fill_value=-1
+    )[0]
+    my_attacks = (effects & (mine & ~_is_major_piece(board))[:, None]).any(
+        axis=0
+    )
+    my_attacks |= CAN_MOVE_ALL[PAWN, to]
+    my_attacks |= _slider_attacks(
+        jnp.where(ALL_SQ == opp_king_pos, EMPTY, board), my_sliders
+    )
+    around = AROUND_IX[opp_king_pos]
+    can_king_escape = (
+        (around >= 0) & ~(board[around] >= OPP_PAWN) & ~my_attacks[around]
+    ).any()
+    # pieces other than king capture the pawn (unless pinned)
+    pinned, pin_line = _pins(board, opp_king_pos, mine | (ALL_SQ == to))
+    is_pinned = ((pinned[:, None] == ALL_SQ) & ~pin_line[:, to, None]).any(
+        axis=0
+    )
+    can_capture_pawn = (
+        effects[:, to] & opp & (board != OPP_KING) & ~is_pinned
+    ).any()
+    is_pawn_mate = is_valid & ~(can_capture_pawn | can_king_escape)
     return is_pawn_mate, to
 
 
-def _is_legal_drop_wo_piece(to: jnp.ndarray, state: State):
-    is_illegal = state._board[to] != EMPTY
-    is_illegal |= _is_checked(
-        state.replace(_board=state._board.at[to].set(PAWN))  # type: ignore
+def _effects(board: jnp.ndarray):
+    """effects[from, to] is True if the piece at `from` attacks `to`"""
+    is_blocked = (
+        (LINE_BETWEEN_IX >= 0) & (board[LINE_BETWEEN_IX] != EMPTY)
+    ).any(axis=-1)
+    return (
+        CAN_MOVE_ALL[board, ALL_SQ]
+        & ~is_blocked
+        & (board != EMPTY).reshape(81, 1)
     )
-    return ~is_illegal
+
+
+def _attacks(board: jnp.ndarray, effects: jnp.ndarray):
+    """Squares attacked by each piece of each side as bitsets (2, 14, 3)
+    and the number of pieces of each side attacking each square (2, 81)"""
+    is_piece = board == jnp.arange(28)[:, None]  # (28, 81)
+    count = jnp.dot(
+        is_piece.astype(jnp.int32), effects.astype(jnp.int32)
+    ).reshape(2, 14, 81)
+    return _to_bitset(count > 0), count.sum(axis=1).astype(jnp.int8)
+
+
+def _to_bitset(mask: jnp.ndarray):
+    """(..., 81) bool to bitset (..., 3) of uint32"""
+    pad = [(0, 0)] * (mask.ndim - 1) + [(0, 3 * 32 - 81)]
+    bits = jnp.pad(mask, pad).reshape(mask.shape[:-1] + (3, 32))
+    return (bits.astype(jnp.uint32) << jnp.arange(32, dtype=jnp.uint32)).sum(
+        axis=-1, dtype=jnp.uint32
+    )
+
+
+def _from_bitset(bits: jnp.ndarray):
+    """bitset (..., 3) of uint32 to (..., 81) bool"""
+    mask = (bits[..., None] >> jnp.arange(32, dtype=jnp.uint32)) & 1
+    return mask.reshape(bits.shape[:-1] + (3 * 32,))[..., :81].astype(
+        jnp.bool_
+    )
+
+
+def _slider_attacks(board: jnp.ndarray, sliders: jnp.ndarray):
+    """Squares attacked by the sliding pieces at `sliders` (filled by -1)"""
+
+    @jax.vmap
+    def attacks(from_):
+        between_ix = LINE_BETWEEN_IX[from_]  # (81, 7)
+        is_blocked = ((between_ix >= 0) & (board[between_ix] != EMPTY)).any(
+            axis=-1
+        )
+        return (from_ >= 0) & CAN_MOVE_ALL[board[from_], from_] & ~is_blocked
+
+    return attacks(sliders).any(axis=0)
+
+
+def _pins(board: jnp.ndarray, king_pos: jnp.ndarray, attacker: jnp.ndarray):
+    """Pieces pinned to the king at `king_pos` by the sliding pieces of `attacker`.
+
+    Returns positions of pinned pieces (8,) (filled by -1) and
+    the squares between the king and each pinning piece (including the pinning piece) (8, 81).
+    """
+    sliders = jnp.nonzero(
+        attacker & _is_major_piece(board), size=8, fill_value=-1
+    )[0]
+
+    @jax.vmap
+    def pin(from_):
+        between_ix = LINE_BETWEEN_IX[from_, king_pos]
+        is_occupied = (between_ix >= 0) & (board[between_ix] != EMPTY)
+        blocker = between_ix[jnp.argmax(is_occupied)]
+        is_pinned = (
+            (from_ >= 0)
+            & CAN_MOVE_ALL[board[from_], from_, king_pos]
+            & (is_occupied.sum() == 1)
+            & ~attacker[blocker]
+        )
+        line = (ALL_SQ == from_) | _to_mask(between_ix)
+        return jnp.where(is_pinned, blocker, -1), line
+
+    return pin(sliders)
+
+
+def _to_mask(ix: jnp.ndarray):
+    """Indices (filled by -1) to (81,) mask"""
+    return (ALL_SQ[:, None] == ix).any(axis=1)
 
 
 def _is_legal_drop_wo_ignoring_check(
@@ -399,59 +660,6 @@ def _is_legal_drop_wo_ignoring_check(
     return ~is_illegal
 
 
-def _is_legal_move_wo_pro(
-    from_: jnp.ndarray,
-    to: jnp.ndarray,
-    state: State,
-):
-    ok = _is_pseudo_legal_move(from_, to, state)
-    ok &= ~_is_checked(
-        state.replace(  # type: ignore
-            _board=state._board.at[from_]
-            .set(EMPTY)
-            .at[to]
-            .set(state._board[from_]),
-            _cache_king=jax.lax.select(  # update cache
-                state._board[from_] == KING,
-                jnp.int32(to),
-                state._cache_king,
-            ),
-        )
-    )
-    return ok
-
-
-def _is_pseudo_legal_move(
-    from_: jnp.ndarray,
-    to: jnp.ndarray,
-    state: State,
-):
-    ok = _is_pseudo_legal_move_wo_obstacles(from_, to, state)
-    # there is an obstacle between from_ and to
-    i = _major_piece_ix(state._board[from_])
-    between_ix = BETWEEN_IX[i, from_, to, :]
-    is_illegal = (i >= 0) & (
-        (between_ix >= 0) & (state._board[between_ix] != EMPTY)
-    ).any()
-    return ok & ~is_illegal
-
-
-def _is_pseudo_legal_move_wo_obstacles(
-    from_: jnp.ndarray,
-    to: jnp.ndarray,
-    state: State,
-):
-    board = state._board
-    # source is not my piece
-    piece = board[from_]
-    is_illegal = (from_ < 0) | ~((PAWN <= piece) & (piece < OPP_PAWN))
-    # destination is my piece
-    is_illegal |= (PAWN <= board[to]) & (board[to] < OPP_PAWN)
-    # piece cannot move like that
-    is_illegal |= ~CAN_MOVE[piece, from_, to]
-    return ~is_illegal
-
-
 def _is_no_promotion_legal(
     from_: jnp.ndarray,
     to: jnp.ndarray,
@@ -478,36 +686,6 @@ def _is_promotion_legal(
     return ~is_illegal
 
 
-def _is_checked(state):
-    # Use cached king position, simpler implementation is:
-    # jnp.argmin(jnp.abs(state.piece_board - KING))
-    king_pos = state._cache_king
-    flipped_king_pos = 80 - king_pos
-
-    @jax.vmap
-    def can_capture_king(from_):
-        return _is_pseudo_legal_move(
-            from_=from_, to=flipped_king_pos, state=_flip(state)
-        )
-
-    @jax.vmap
-    def can_capture_king_local(from_):
-        return _is_pseudo_legal_move_wo_obstacles(
-            from_=from_, to=flipped_king_pos, state=_flip(state)
-        )
-
-    # Simpler implementation without cache of major piece places
-    # from_ = CAN_MOVE_ANY[flipped_king_pos]
-    # return can_capture_king(from_).any()
-    from_ = 80 - state._cache_m2b
-    from_ = jnp.where(from_ == 81, -1, from_)
-    neighbours = NEIGHBOUR_IX[flipped_king_pos]
-    return (
-        can_capture_king(from_).any()
-        | can_capture_king_local(neighbours).any()
-    )
-
-
 def _flip_piece(piece):
     return jax.lax.select(piece >= 0, (piece + 14) % 28, piece)
 
@@ -542,75 +720,22 @@ def _is_major_piece(piece):
     )
 
 
-def _major_piece_ix(piece):
-    ixs = (
-        (-jnp.ones(28, dtype=jnp.int8))
-        .at[LANCE]
-        .set(0)
-        .at[BISHOP]
-        .set(1)
-        .at[ROOK]
-        .set(2)
-        .at[HORSE]
-        .set(1)
-        .at[DRAGON]
-        .set(2)
-    )
-    return jax.lax.select(piece >= 0, ixs[piece], jnp.int8(-1))
-
-
 def _observe(state: State, player_id: jnp.ndarray) -> jnp.ndarray:
-    state, flip_state = jax.lax.cond(
-        state.current_player == player_id,
-        lambda: (state, _flip(state)),
-        lambda: (_flip(state), state),
-    )
+    board = state._board
 
-    def pieces(state):
+    def pieces(offset):
         # 駒の場所
-        my_pieces = jnp.arange(OPP_PAWN)
-        my_piece_feat = jax.vmap(lambda p: state._board == p)(my_pieces)
-        return my_piece_feat
-
-    def effect_all(state):
-        def effect(from_, to):
-            piece = state._board[from_]
-            can_move = CAN_MOVE[piece, from_, to]
-            major_piece_ix = _major_piece_ix(piece)
-            between_ix = BETWEEN_IX[major_piece_ix, from_, to, :]
-            has_obstacles = jax.lax.select(
-                major_piece_ix >= 0,
-                (
-                    (between_ix >= 0) & (state._board[between_ix] != EMPTY)
-                ).any(),
-                FALSE,
-            )
-            return can_move & ~has_obstacles
-
-        effects = jax.vmap(jax.vmap(effect, (None, 0)), (0, None))(
-            ALL_SQ, ALL_SQ
-        )
-        mine = (PAWN <= state._board) & (state._board < OPP_PAWN)
-        return jnp.where(mine.reshape(81, 1), effects, FALSE)
-
-    def piece_and_effect(state):
-        my_pieces = jnp.arange(OPP_PAWN)
-        my_effect = effect_all(state)
-
-        @jax.vmap
-        def filter_effect(p):
-            mask = state._board == p
-            return jnp.where(mask.reshape(81, 1), my_effect, FALSE).any(axis=0)
+        return jax.vmap(lambda p: board == p)(jnp.arange(14) + offset)
 
-        my_effect_feat = filter_effect(my_pieces)
-        my_effect_sum = my_effect.sum(axis=0)
+    def piece_and_effect(side):
+        effect_feat = _from_bitset(state._attack_bits[side])
+        effect_sum = state._attack_count[side]
 
         @jax.vmap
-        def effect_sum(n) -> jnp.ndarray:
-            return my_effect_sum >= n  # type: ignore
+        def effect_sum_feat(n) -> jnp.ndarray:
+            return effect_sum >= n  # type: ignore
 
-        effect_sum_feat = effect_sum(jnp.arange(1, 4))
-        return my_effect_feat, effect_sum_feat
+        return effect_feat, effect_sum_feat(jnp.arange(1, 4))
 
     def num_hand(n, hand, p):
         return jnp.tile(hand[p] >= n, reps=(9, 9))
@@ -627,25 +752,45 @@ def _observe(state: State, player_id: jnp.ndarray) -> jnp.ndarray:
         return [pawn_feat, lance_feat, knight_feat, silver_feat, gold_feat, bishop_feat, rook_feat]
         # fmt: on
 
-    my_piece_feat = pieces(state)
-    my_effect_feat, my_effect_sum_feat = piece_and_effect(state)
-    opp_piece_feat = pieces(flip_state)
-    opp_effect_feat, opp_effect_sum_feat = piece_and_effect(flip_state)
-    opp_piece_feat = opp_piece_feat[:, ::-1]
-    opp_effect_feat = opp_effect_feat[:, ::-1]
-    opp_effect_sum_feat = opp_effect_sum_feat[:, ::-1]
-    my_hand_feat = hand_feat(state._hand[0])
-    opp_hand_feat = hand_feat(state._hand[1])
-    # NOTE: update cache
-    checked = jnp.tile(_is_checked(_set_cache(state)), reps=(1, 9, 9))
+    def is_checked(king, opp_side):
+        king_pos = jnp.argmax(board == king)
+        return (state._attack_count[opp_side, king_pos] > 0) & (
+            board == king
+        ).any()
+
+    # features of current player and the opponent (from current player's view)
+    piece_feat = [pieces(0), pieces(OPP_PAWN)]
+    effect_feat = [piece_and_effect(0), piece_and_effect(1)]
+    checked = [is_checked(KING, 1), is_checked(OPP_KING, 0)]
+
+    # from player_id's view
+    is_opp_view = state.current_player != player_id
+    me, opp = jnp.int32(is_opp_view), jnp.int32(~is_opp_view)
+
+    def view(x):
+        x = jnp.stack([x[0], x[1]])
+        return jnp.where(is_opp_view, x[::-1, ..., ::-1], x)
+
+    piece_feat = view(piece_feat)
+    effect_sq_feat = view([effect_feat[0][0], effect_feat[1][0]])
+    effect_sum_feat = view([effect_feat[0][1], effect_feat[1][1]])
     feat1 = [
-        my_piece_feat.reshape(14, 9, 9),
-        my_effect_feat.reshape(14, 9, 9),
-        my_effect_sum_feat.reshape(3, 9, 9),
-        opp_piece_feat.reshape(14, 9, 9),
-        opp_effect_feat.reshape(14, 9, 9),
-        opp_effect_sum_feat.reshape(3, 9, 9),
+        piece_feat[0].reshape(14, 9, 9),
+        effect_sq_feat[0].reshape(14, 9, 9),
+        effect_sum_feat[0].reshape(3, 9, 9),
+        piece_feat[1].reshape(14, 9, 9),
+        effect_sq_feat[1].reshape(14, 9, 9),
+        effect_sum_feat[1].reshape(3, 9, 9),
     ]
-    feat2 = my_hand_feat + opp_hand_feat + [checked]
+    my_hand_feat = hand_feat(state._hand[me])
+    opp_hand_feat = hand_feat(state._hand[opp])
+    checked_feat = jnp.tile(jnp.bool_(checked)[me], reps=(1, 9, 9))
+    feat2 = my_hand_feat + opp_hand_feat + [checked_feat]
     feat = jnp.vstack(feat1 + feat2)
     return feat
+
+
+INIT_ATTACK_BITS, INIT_ATTACK_COUNT = _attacks(
+    INIT_PIECE_BOARD, _effects(INIT_PIECE_BOARD)
+)
+INIT_ZOBRIST_HASH = _zobrist_hash(State())
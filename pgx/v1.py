@@ -13,7 +13,9 @@
 # limitations under the License.
 
 import abc
-from typing import Literal, Optional, Tuple, get_args
+import re
+from functools import partial
+from typing import Callable, Dict, Literal, Optional, Tuple, get_args
 
 import jax
 import jax.numpy as jnp
@@ -154,6 +156,28 @@ class State(abc.ABC):
         save_svg(self, filename, color_theme=color_theme, scale=scale)
 
 
+@dataclass
+class Trajectory:
+    """Stacked transitions returned by `Env.rollout`.
+    Each attribute has the leading axis of length `num_steps`
+    (followed by the batch axis if the rolled-out state is batched).
+
+    Attributes:
+        observation (jnp.ndarray): observation the policy received before acting.
+        legal_action_mask (jnp.ndarray): legal action mask the policy received before acting.
+        action (jnp.ndarray): action selected by the policy.
+        reward (jnp.ndarray): reward returned by `Env.step` for the action.
+        terminated (jnp.ndarray): termination flag returned by `Env.step` for the action.
+            If `auto_reset=True`, the returned state is already the initial state of the next episode.
+    """
+
+    observation: jnp.ndarray
+    legal_action_mask: jnp.ndarray
+    action: jnp.ndarray
+    reward: jnp.ndarray
+    terminated: jnp.ndarray
+
+
 class Env(abc.ABC):
     """Environment class API.
 
@@ -170,26 +194,79 @@ class Env(abc.ABC):
 
     def __init__(self, *, auto_reset: bool = False):
         self.auto_reset = auto_reset
+        self._rollout_fns: Dict[Tuple, Callable] = {}
 
-    def init(self, key: jax.random.KeyArray) -> State:
+    def init(
+        self, key: jax.random.KeyArray, *, with_observation: bool = True
+    ) -> State:
         """Return the initial state. Note that no internal state of
         environment changes.
 
         Args:
             key: pseudo-random generator key in JAX
+            with_observation: if False, `observation` is not computed and left as zeros.
 
         Returns:
             State: initial state of environment
 
         """
+        return self._init_with_key(key, with_observation)
+
+    def step(
+        self,
+        state: State,
+        action: jnp.ndarray,
+        *,
+        with_observation: bool = True,
+    ) -> State:
+        """Step function.
+
+        If `with_observation=False`, `observation` is not computed and left as zeros.
+        This saves computation when observations are not used (e.g., in search).
+        Observations can be computed later by `observe` only for the states actually used.
+        """
+        state = self._step_without_reset(state, action, with_observation)
+
+        # auto reset
+        state = jax.lax.cond(
+            self.auto_reset & state.terminated,
+            # state is replaced by initial state,
+            # but preserve (terminated, truncated, reward)
+            lambda: self._init_with_key(  # type: ignore
+                state._rng_key, with_observation
+            ).replace(
+                terminated=state.terminated,
+                reward=state.reward,
+            ),
+            lambda: state,
+        )
+        # NOTE on final observation
+        # When auto reset happened, the terminal (or truncated) observation is replaced by initial observation,
+        # This is NOT problematic if it's termination.
+        # However, when truncation happened, final observation might be used by agent (for bootstrap)
+        # So we have to preserve the final observation somewhere. For example, in Gymnasium,
+        #
+        # https://github.com/Farama-Foundation/Gymnasium/blob/main/gymnasium/wrappers/autoreset.py#L59
+        #
+        # However, currently, truncation does **NOT** actually happens in Pgx environments because
+        # all of Pgx environments (games) are finite-horizon and terminates within reasonable # of steps.
+        # (NOTE: Chess, Shogi, and Go have `max_termination_steps` parameter following AlphaZero paper)
+        # So we believe current implementation is sufficient (final observation is not necessary).
+
+        return state
+
+    def _init_with_key(
+        self, key: jax.random.KeyArray, with_observation: bool
+    ) -> State:
+        # `with_observation` must stay static even if `init` is wrapped by `jax.jit`
         key, subkey = jax.random.split(key)
         state = self._init(subkey)
         state = state.replace(_rng_key=key)  # type: ignore
-        observation = self.observe(state, state.current_player)
-        return state.replace(observation=observation)  # type: ignore
+        return self._set_observation(state, with_observation)
 
-    def step(self, state: State, action: jnp.ndarray) -> State:
-        """Step function."""
+    def _step_without_reset(
+        self, state: State, action: jnp.ndarray, with_observation: bool = True
+    ) -> State:
         is_illegal = ~state.legal_action_mask[action]
         current_player = state.current_player
 
@@ -230,34 +307,135 @@ class Env(abc.ABC):
             lambda: state,
         )
 
-        observation = self.observe(state, state.current_player)
-        state = state.replace(observation=observation)  # type: ignore
+        return self._set_observation(state, with_observation)
+
+    def _set_observation(self, state: State, with_observation: bool) -> State:
+        if with_observation:
+            observation = self.observe(state, state.current_player)
+        else:
+            # the default of State.observation may not match the env (e.g., Go(size=9))
+            shape = jax.eval_shape(
+                lambda s: self.observe(s, s.current_player), state
+            )
+            observation = jnp.zeros(shape.shape, dtype=shape.dtype)
+        return state.replace(observation=observation)  # type: ignore
 
-        # auto reset
-        state = jax.lax.cond(
-            self.auto_reset & state.terminated,
-            # state is replaced by initial state,
-            # but preserve (terminated, truncated, reward)
-            lambda: self.init(state._rng_key).replace(  # type: ignore
-                terminated=state.terminated,
-                reward=state.reward,
-            ),
+    def _batch_step(
+        self,
+        state: State,
+        action: jnp.ndarray,
+        max_num_resets: Optional[int] = None,
+        with_observation: bool = True,
+    ) -> State:
+        """Equivalent to `jax.vmap(self.step)` but auto reset is done at the batch level.
+
+        Under `jax.vmap`, the `cond` of auto reset in `step` becomes `select`,
+        so `init` runs for all states at every step.
+        Instead, this function runs `init` only for (at most) `max_num_resets` terminated states
+        gathered from the batch, and falls back to resetting the whole batch
+        if more states terminated at the same step.
+        """
+        state = jax.vmap(
+            partial(
+                self._step_without_reset, with_observation=with_observation
+            )
+        )(state, action)
+        if not self.auto_reset:
+            return state
+
+        batch_size = state.terminated.shape[0]
+        if max_num_resets is None:
+            max_num_resets = max(1, batch_size // 16)
+        max_num_resets = min(max_num_resets, batch_size)
+
+        def reset(size):
+            # out-of-bound indices (= batch_size) are ignored
+            ix = jnp.nonzero(
+                state.terminated, size=size, fill_value=batch_size
+            )[0]
+            s = jax.tree_util.tree_map(lambda x: x[ix], state)
+            s = jax.vmap(lambda k: self._init_with_key(k, with_observation))(
+                s._rng_key
+            ).replace(  # type: ignore
+                terminated=s.terminated,
+                reward=s.reward,
+            )
+            return jax.tree_util.tree_map(
+                lambda x, y: x.at[ix].set(y, mode="drop"), state, s
+            )
+
+        num_terminated = state.terminated.sum()
+        return jax.lax.cond(
+            num_terminated == 0,
             lambda: state,
+            lambda: jax.lax.cond(
+                num_terminated <= max_num_resets,
+                lambda: reset(max_num_resets),
+                lambda: reset(batch_size),
+            ),
         )
-        # NOTE on final observation
-        # When auto reset happened, the terminal (or truncated) observation is replaced by initial observation,
-        # This is NOT problematic if it's termination.
-        # However, when truncation happened, final observation might be used by agent (for bootstrap)
-        # So we have to preserve the final observation somewhere. For example, in Gymnasium,
-        #
-        # https://github.com/Farama-Foundation/Gymnasium/blob/main/gymnasium/wrappers/autoreset.py#L59
-        #
-        # However, currently, truncation does **NOT** actually happens in Pgx environments because
-        # all of Pgx environments (games) are finite-horizon and terminates within reasonable # of steps.
-        # (NOTE: Chess, Shogi, and Go have `max_termination_steps` parameter following AlphaZero paper)
-        # So we believe current implementation is sufficient (final observation is not necessary).
 
-        return state
+    def rollout(
+        self,
+        state: State,
+        policy_fn: Callable[[jax.random.KeyArray, State], jnp.ndarray],
+        key: jax.random.KeyArray,
+        num_steps: int,
+        *,
+        donate: bool = False,
+    ) -> Tuple[State, Trajectory]:
+        """Run `num_steps` steps of `policy_fn` inside a single compiled `jax.lax.scan`.
+        This avoids the per-step dispatch and host synchronization of calling jitted `step` in a Python loop.
+
+        !!! example "Example usage"
+
+            ```py
+            env = pgx.make("tic_tac_toe", auto_reset=True)
+            state = jax.jit(jax.vmap(env.init))(jax.random.split(key, 1024))
+            state, traj = env.rollout(state, act_randomly, key, num_steps=100)
+            traj.reward.shape  # (100, 1024, 2)
+            ```
+
+        Args:
+            state: single state or batched (vmapped) states.
+            policy_fn: `policy_fn(key, state) -> action`. Receives the state with the same batch layout as `state`.
+            key: pseudo-random generator key in JAX, split into one subkey per step for `policy_fn`.
+            num_steps: number of steps to run.
+            donate: if True, the buffers of the input `state` are donated to the computation and must not be used afterward.
+
+        Returns:
+            Tuple[State, Trajectory]: the state after `num_steps` steps and the stacked transitions.
+
+        Note that episodes are restarted within the rollout only if the environment is created with `auto_reset=True`.
+        The compiled function is cached per (`policy_fn`, `num_steps`, batched or not, `donate`),
+        so pass the same `policy_fn` object across calls to avoid recompilation.
+        """
+        batched = state.current_player.ndim > 0
+        cache_key = (policy_fn, num_steps, batched, donate)
+        if cache_key not in self._rollout_fns:
+
+            def _rollout(state: State, key: jax.random.KeyArray):
+                step = self._batch_step if batched else self.step
+
+                def body_fn(state: State, key: jax.random.KeyArray):
+                    action = policy_fn(key, state)
+                    next_state = step(state, action)
+                    traj = Trajectory(
+                        observation=state.observation,
+                        legal_action_mask=state.legal_action_mask,
+                        action=action,
+                        reward=next_state.reward,
+                        terminated=next_state.terminated,
+                    )
+                    return next_state, traj
+
+                keys = jax.random.split(key, num_steps)
+                return jax.lax.scan(body_fn, state, keys)
+
+            self._rollout_fns[cache_key] = jax.jit(
+                _rollout, donate_argnums=(0,) if donate else ()
+            )
+        return self._rollout_fns[cache_key](state, key)
 
     def observe(self, state: State, player_id: jnp.ndarray) -> jnp.ndarray:
         """Observation function."""
@@ -330,6 +508,63 @@ class Env(abc.ABC):
         return state.replace(reward=reward, terminated=TRUE)  # type: ignore
 
 
+class VectorEnv:
+    """Batched front-end that keeps `num_envs` states on device and steps them with auto reset.
+
+    Initialization (including the key split for each environment) and stepping are
+    each a single jitted call. Auto reset runs `init` only for the terminated environments. `step` donates the buffers of the previous batched state,
+    so the state returned by the previous call must not be used after calling `step`.
+
+    !!! example "Example usage"
+
+        ```py
+        envs = pgx.VectorEnv("go_9x9", num_envs=1024)
+        state = envs.reset(seed=0)
+        while True:
+            action = policy(state.observation, state.legal_action_mask)
+            state = envs.step(action)
+        ```
+
+    """
+
+    def __init__(self, env_id: EnvId, num_envs: int):
+        self.env: Env = make(env_id, auto_reset=True)
+        self.num_envs = num_envs
+        self.state: Optional[State] = None
+        self._init_fn = jax.jit(self._init)
+        self._step_fn = jax.jit(self.env._batch_step, donate_argnums=(0,))
+
+    def _init(self, key: jax.random.KeyArray) -> State:
+        keys = jax.random.split(key, self.num_envs)
+        return jax.vmap(self.env.init)(keys)
+
+    def reset(self, seed: int = 0) -> State:
+        """Initialize all `num_envs` environments.
+
+        Args:
+            seed: seed used to generate the initial states.
+
+        Returns:
+            State: batched initial states.
+        """
+        self.state = self._init_fn(jax.random.PRNGKey(seed))
+        return self.state
+
+    def step(self, action: jnp.ndarray) -> State:
+        """Step all environments. Terminated environments are reset automatically
+        while preserving their terminal `reward` and `terminated` flags.
+
+        Args:
+            action: actions of shape `(num_envs,)`.
+
+        Returns:
+            State: batched next states.
+        """
+        assert self.state is not None, "Call `reset` before `step`."
+        self.state = self._step_fn(self.state, action)
+        return self.state
+
+
 def available_games() -> Tuple[EnvId, ...]:
     """List up all environment id available in `pgx.make` function.
 
@@ -353,9 +588,23 @@ def available_games() -> Tuple[EnvId, ...]:
     return games
 
 
-def make(env_id: EnvId, *, auto_reset: bool = False):  # noqa: C901
+def make(  # noqa: C901
+    env_id: EnvId,
+    *,
+    auto_reset: bool = False,
+    compile_cache_dir: Optional[str] = None,
+):
     """Load the specified environment.
 
+    Args:
+        env_id: environment id.
+        auto_reset: whether to reset the state automatically after termination.
+        compile_cache_dir: if given, JAX's persistent compilation cache is enabled at this directory
+            so that jitted functions are compiled only once across processes.
+            The cache can be initialized only once per process.
+            On CPU, nothing is written to the cache unless `XLA_FLAGS=--xla_cpu_use_xla_runtime=true`
+            is set before JAX is imported (see `pgx.precompile`).
+
     !!! example "Example usage"
 
         ```py
@@ -369,6 +618,8 @@ def make(env_id: EnvId, *, auto_reset: bool = False):  # noqa: C901
         Use `BridgeBidding` class directly by `from pgx.bridge_bidding import BridgeBidding`.
 
     """
+    if compile_cache_dir is not None:
+        _initialize_compilation_cache(compile_cache_dir)
     # NOTE: BridgeBidding environment requires the domain knowledge of bridge
     # So we forbid users to load the bridge environment by `make("bridge_bidding")`.
     if env_id == "2048":
@@ -452,3 +703,73 @@ def make(env_id: EnvId, *, auto_reset: bool = False):  # noqa: C901
         raise ValueError(
             f"Wrong env_id is passed. Available ids are: \n{available_envs}"
         )
+
+
+def precompile(
+    env_id: EnvId,
+    batch_size: int,
+    *,
+    auto_reset: bool = False,
+    compile_cache_dir: Optional[str] = None,
+) -> Tuple[Env, Callable, Callable, Callable]:
+    """Compile batched `init`, `step`, and `observe` ahead of time for the given batch size.
+
+    With `compile_cache_dir`, the compiled executables are stored in JAX's persistent compilation cache
+    and loaded back in later processes instead of being compiled again.
+    Cache entries are keyed by the lowered program, which is named after the env id and `Env.version`,
+    and by the batch shape.
+
+    !!! note "Persistent compilation cache on CPU"
+
+        On CPU, JAX (as of 0.4.18) writes nothing to the persistent compilation cache
+        unless `XLA_FLAGS=--xla_cpu_use_xla_runtime=true` is set before JAX is imported.
+        Also, only the programs taking longer than `jax_persistent_cache_min_compile_time_secs`
+        (1 second by default) to compile are cached.
+
+    !!! example "Example usage"
+
+        ```py
+        env, init, step, observe = pgx.precompile("go_19x19", 1024, compile_cache_dir="/tmp/pgx_cache")
+        state = init(jax.random.split(key, 1024))
+        state = step(state, action)
+        ```
+
+    Returns:
+        Tuple[Env, Callable, Callable, Callable]: the environment and compiled `init(keys)`,
+            `step(state, action)`, and `observe(state, player_id)` for batches of `batch_size`.
+    """
+    env = make(
+        env_id, auto_reset=auto_reset, compile_cache_dir=compile_cache_dir
+    )
+    prefix = re.sub(r"\W", "_", f"{env.id}_{env.version}")
+
+    def _init(keys):
+        return jax.vmap(env.init)(keys)
+
+    def _step(state, action):
+        return env._batch_step(state, action)
+
+    def _observe(state, player_id):
+        return jax.vmap(env.observe)(state, player_id)
+
+    _init.__name__ = f"{prefix}_init"
+    _step.__name__ = f"{prefix}_step"
+    _observe.__name__ = f"{prefix}_observe"
+
+    keys = jax.ShapeDtypeStruct((batch_size, 2), jnp.uint32)
+    state = jax.eval_shape(_init, keys)
+    action = jax.ShapeDtypeStruct((batch_size,), jnp.int32)
+    player_id = jax.ShapeDtypeStruct((batch_size,), state.current_player.dtype)
+    init = jax.jit(_init).lower(keys).compile()
+    step = jax.jit(_step).lower(state, action).compile()
+    observe = jax.jit(_observe).lower(state, player_id).compile()
+    return env, init, step, observe
+
+
+def _initialize_compilation_cache(cache_dir: str):
+    try:
+        jax.config.update("jax_compilation_cache_dir", cache_dir)
+    except AttributeError:  # older JAX
+        from jax.experimental.compilation_cache import compilation_cache
+
+        compilation_cache.initialize_cache(cache_dir)
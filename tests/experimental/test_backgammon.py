@@ -0,0 +1,59 @@
+import jax
+import jax.numpy as jnp
+import numpy as np
+
+import pgx
+from pgx.backgammon import _flip_board
+from pgx.experimental.backgammon import legal_turns, play_turn
+
+env = pgx.make("backgammon")
+init = jax.jit(env.init)
+step = jax.jit(env.step)
+legal_turns = jax.jit(legal_turns)
+play_turns = jax.jit(jax.vmap(lambda s, a: play_turn(env, s, a), in_axes=(None, 0)))
+
+
+def _board_after_turn(state):
+    # board is flipped when the turn changes
+    return state._board if state.terminated else _flip_board(state._board)
+
+
+def _enumerate_by_micro_actions(state):
+    """Boards after a turn by depth-first search over micro actions"""
+    boards, visited = set(), set()
+    stack = [state]
+    while stack:
+        s = stack.pop()
+        for a in np.nonzero(np.asarray(s.legal_action_mask))[0]:
+            t = step(s, jnp.int32(a))
+            if t.terminated or t.current_player != state.current_player:
+                boards.add(tuple(np.asarray(_board_after_turn(t)).tolist()))
+                continue
+            key = (tuple(np.asarray(t._board).tolist()), tuple(np.asarray(t._playable_dice).tolist()))
+            if key not in visited:
+                visited.add(key)
+                stack.append(t)
+    return boards
+
+
+def test_legal_turns():
+    key = jax.random.PRNGKey(0)
+    state = init(key)
+    num_turns = 0
+    while num_turns < 6:
+        actions, boards, mask = legal_turns(state)
+        ix = np.nonzero(np.asarray(mask))[0]
+        # the same boards as by micro actions
+        expected = _enumerate_by_micro_actions(state)
+        assert {tuple(b) for b in np.asarray(boards[ix]).tolist()} == expected
+        assert len(ix) == len(expected)
+        # replaying turns with micro actions
+        states = play_turns(state, actions[ix])
+        assert ((states.current_player != state.current_player) | states.terminated).all()
+        assert (jax.vmap(_flip_board)(states._board) == boards[ix]).all()
+        # play a random turn (and some micro actions to test the middle of turns)
+        key, subkey = jax.random.split(key)
+        state = play_turn(env, state, actions[jax.random.choice(subkey, ix)])
+        if num_turns % 2 == 1:
+            state = step(state, jnp.argmax(state.legal_action_mask))
+        num_turns += 1
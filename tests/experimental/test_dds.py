@@ -0,0 +1,136 @@
+import csv
+import os
+
+import jax
+import jax.numpy as jnp
+import numpy as np
+
+from pgx.bridge_bidding import (
+    BridgeBidding,
+    _calculate_dds_tricks,
+    _init_by_key,
+    _load_sample_hash,
+    _sort_hash_table,
+)
+from pgx.experimental.dds import DDSSolver, _key_to_pbn, _tricks_to_value
+
+SAMPLE_PATH = os.path.join(
+    os.path.dirname(__file__), "../assets/contractbridge-ddstable-sample100.csv"
+)
+with open(SAMPLE_PATH) as f:
+    SAMPLES = {row[0]: [int(x) for x in row[1:]] for row in csv.reader(f)}
+KEYS, VALUES = _load_sample_hash()
+
+
+def solve_from_samples(pbn):
+    return SAMPLES[pbn]
+
+
+def fail(pbn):
+    assert False, "should be cached"
+
+
+def test_key_to_pbn():
+    pbns = list(SAMPLES.keys())
+    for i in range(10):
+        assert _key_to_pbn(np.asarray(KEYS[i])) == pbns[i]
+        assert (_tricks_to_value(SAMPLES[pbns[i]]) == VALUES[i]).all()
+
+
+def test_solver_cache(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    solver = DDSSolver(path, num_workers=0, solve_fn=solve_from_samples)
+    keys = np.asarray(KEYS[jnp.int32([0, 1, 0, 2])])
+    values = solver.solve(keys)
+    assert (values == np.asarray(VALUES[jnp.int32([0, 1, 0, 2])])).all()
+    # only masked keys are solved
+    values = solver(keys, np.bool_([True, False, True, False]))
+    assert (values[0] == VALUES[0]).all()
+    assert (values[1] == 0).all()
+    solver.close()
+
+    # results are loaded from the disk
+    solver = DDSSolver(path, num_workers=0, solve_fn=fail)
+    assert (solver.solve(np.asarray(KEYS[:3])) == np.asarray(VALUES[:3])).all()
+    keys, values = solver.merge(KEYS[3:5], VALUES[3:5])
+    assert keys.shape == (5, 4)
+    expected_keys, expected_values = _sort_hash_table(KEYS[:5], VALUES[:5])
+    assert (keys == expected_keys).all()
+    assert (values == expected_values).all()
+    solver.close()
+
+
+def test_solver_lru(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    solver = DDSSolver(
+        path, max_cache_size=2, num_workers=0, solve_fn=solve_from_samples
+    )
+    solver.solve(np.asarray(KEYS[:2]))
+    solver.solve(np.asarray(KEYS[:1]))  # KEYS[1] is the least recently used
+    solver.solve(np.asarray(KEYS[2:3]))
+    keys, _ = solver.table()
+    assert len(keys) == 2
+    assert {tuple(k) for k in keys.tolist()} == {
+        tuple(k) for k in np.asarray(KEYS[jnp.int32([0, 2])]).tolist()
+    }
+    solver.close()
+
+
+def test_calculate_dds_tricks_with_solver():
+    solver = DDSSolver(num_workers=0, solve_fn=solve_from_samples)
+    # table without the first 50 deals
+    hash_keys, hash_values = _sort_hash_table(KEYS[50:], VALUES[50:])
+    pbns = list(SAMPLES.keys())
+
+    @jax.jit
+    @jax.vmap
+    def calculate(key):
+        state = _init_by_key(key, jax.random.PRNGKey(0))
+        return _calculate_dds_tricks(
+            state, hash_keys, hash_values, dds_solver=solver
+        )
+
+    tricks = calculate(KEYS[40:60])
+    for i in range(20):
+        assert (tricks[i] == jnp.int32(SAMPLES[pbns[40 + i]])).all()
+    # only the missing deals are solved
+    assert len(solver.table()[0]) == 10
+
+
+def test_env_solves_only_scored_deals(tmp_path):
+    calls = []
+
+    def solver(keys, is_missing):
+        calls.append(np.asarray(is_missing).copy())
+        values = np.broadcast_to(_tricks_to_value([7] * 20), keys.shape)
+        return np.where(np.asarray(is_missing)[..., None], values, 0)
+
+    env = BridgeBidding(
+        dds_hash_table_path=str(tmp_path / "missing.npy"),
+        dds_solver=solver,
+        random_deal=True,
+    )
+    init = jax.jit(jax.vmap(env.init))
+    step = jax.jit(jax.vmap(env.step))
+    batch_size = 8
+    key = jax.random.PRNGKey(0)
+    state = init(jax.random.split(key, batch_size))
+    assert not calls
+    while not state.terminated.all():
+        key, subkey = jax.random.split(key)
+        logits = jnp.log(state.legal_action_mask.astype(jnp.float32))
+        # pass more often to finish the auctions
+        logits = logits.at[:, 35].add(3.0)
+        action = jax.random.categorical(subkey, logits, axis=1)
+        terminated = state.terminated
+        state = step(state, action)
+        is_scored = (
+            state.terminated & ~terminated & (state._last_bid != -1)
+        )
+        if is_scored.any():
+            # solved once for the batch only for the deals scored at this step
+            assert len(calls) == 1
+            assert (calls.pop() == np.asarray(is_scored)).all()
+            assert (state.reward[is_scored] != 0).all()
+        else:
+            assert not calls
@@ -0,0 +1,39 @@
+import jax
+import jax.numpy as jnp
+
+import pgx
+from pgx.experimental.evaluation import Evaluator
+from pgx.experimental.utils import act_randomly
+
+
+def test_evaluator():
+    env = pgx.make("tic_tac_toe")
+    init = jax.jit(jax.vmap(env.init))
+    step = jax.jit(jax.vmap(env.step))
+
+    def policy_fn(key, state):
+        # deterministic w.r.t. state to compare with the naive loop
+        obs = state.observation.reshape(state.observation.shape[0], -1)
+        score = (obs.sum(axis=1, keepdims=True) + 1) * (jnp.arange(9) + 3) % 7
+        return jnp.argmax(jnp.where(state.legal_action_mask, score, -1), axis=1)
+
+    # diversify initial states (and hence the lengths of games)
+    batch_size = 50
+    key = jax.random.PRNGKey(0)
+    state = init(jax.random.split(key, batch_size))
+    for _ in range(2):
+        key, subkey = jax.random.split(key)
+        state = step(state, act_randomly(subkey, state))
+
+    evaluator = Evaluator(env, policy_fn, steps_per_compaction=2, min_bucket_size=4)
+    reward_sum, length = evaluator.run(state, key)
+
+    expected_reward_sum = jnp.zeros_like(state.reward)
+    expected_length = jnp.zeros(batch_size, dtype=jnp.int32)
+    while not state.terminated.all():
+        expected_length += ~state.terminated
+        state = step(state, policy_fn(key, state))
+        expected_reward_sum += state.reward
+    assert (reward_sum == expected_reward_sum).all()
+    assert (length == expected_length).all()
+    assert len(set(length.tolist())) > 1
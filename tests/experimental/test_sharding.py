@@ -0,0 +1,50 @@
+import os
+import subprocess
+import sys
+
+import jax
+
+import pgx
+from pgx.experimental.sharding import ShardedEnv
+from pgx.experimental.utils import act_randomly
+
+
+def test_sharded_env():
+    env = pgx.make("tic_tac_toe", auto_reset=True)
+    sharded_env = ShardedEnv(env)
+    batch_size = 4 * sharded_env.num_devices
+
+    keys = jax.random.split(jax.random.PRNGKey(0), batch_size)
+    state = sharded_env.init(keys)
+    expected = jax.jit(jax.vmap(env.init))(keys)
+    assert (state.current_player == expected.current_player).all()
+
+    key = jax.random.PRNGKey(1)
+    num_terminated = 0
+    for _ in range(10):
+        key, subkey = jax.random.split(key)
+        action = act_randomly(subkey, state)
+        state = sharded_env.step(state, action)
+        stats = sharded_env.episode_stats(state)
+        assert stats["num_terminated"] == state.terminated.sum()
+        assert (stats["reward_sum"] == state.reward.sum(axis=0)).all()
+        num_terminated += int(stats["num_terminated"])
+    assert num_terminated > 0
+
+
+def test_sharded_env_forced_host_devices():
+    # Device count has to be fixed before JAX is imported
+    code = (
+        "import jax, pgx\n"
+        "from pgx.experimental.sharding import ShardedEnv\n"
+        "env = ShardedEnv(pgx.make('tic_tac_toe'))\n"
+        "assert env.num_devices == 4\n"
+        "state = env.init(jax.random.split(jax.random.PRNGKey(0), 8))\n"
+        "assert len(state.current_player.sharding.device_set) == 4\n"
+        "state = env.step(state, jax.numpy.zeros(8, jax.numpy.int32))\n"
+        "assert int(env.episode_stats(state)['num_terminated']) == 0\n"
+    )
+    env = dict(os.environ)
+    env["XLA_FLAGS"] = "--xla_force_host_platform_device_count=4"
+    env["JAX_PLATFORMS"] = "cpu"
+    subprocess.run([sys.executable, "-c", code], env=env, check=True)
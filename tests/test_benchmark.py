@@ -0,0 +1,31 @@
+import json
+
+from pgx.benchmark import main, run, state_bytes
+
+
+def test_run():
+    result = run("tic_tac_toe", 4, num_steps=3)
+    assert result["env_id"] == "tic_tac_toe"
+    assert result["total_steps"] == 12
+    assert result["steps_per_sec"] > 0
+    assert result["compile_sec"] > 0
+    # board (9 x int32) is a part of the state
+    assert result["state_bytes"] > 9 * 4
+    assert result["state_bytes"] == state_bytes("tic_tac_toe")
+
+
+def test_main(tmp_path):
+    output = tmp_path / "result.json"
+    main(
+        [
+            "--env-ids", "tic_tac_toe", "kuhn_poker",
+            "--batch-sizes", "1", "2",
+            "--num-steps", "2",
+            "--output", str(output),
+        ]
+    )
+    with open(output) as f:
+        report = json.load(f)
+    assert "jax_version" in report
+    assert len(report["results"]) == 4
+    assert [r["env_id"] for r in report["results"]] == ["tic_tac_toe"] * 2 + ["kuhn_poker"] * 2
@@ -1,10 +1,12 @@
 import csv
 import os
+import shutil
 from typing import Tuple
 
 import jax
 import jax.numpy as jnp
 import numpy as np
+import pytest
 
 from pgx.bridge_bidding import (
     BridgeBidding,
@@ -12,12 +14,17 @@ from pgx.bridge_bidding import (
     _calc_score,
     _calculate_dds_tricks,
     _contract,
+    _find_value_from_key,
     _init_by_key,
     _key_to_hand,
+    _load_dds_hash_table,
     _load_sample_hash,
+    _make_reward,
     _pbn_to_key,
     _player_position,
+    _save_dds_hash_table,
     _shuffle_players,
+    _sort_hash_table,
     _state_to_key,
     _state_to_pbn,
     _to_binary,
@@ -1368,6 +1375,70 @@ def test_observe():
     #   P  P
 
 
+def observe_from_history(state: State, player_id) -> np.ndarray:
+    """Observation recomputed from the whole bidding history (without the incremental update)"""
+    vul = np.array([state._vul_NS, state._vul_EW], dtype=np.bool_)
+    position = int(_player_position(player_id, state))
+    hand = np.zeros(52, dtype=np.bool_)
+    hand[np.asarray(state._hand[position * 13 : (position + 1) * 13])] = True
+    obs_history = np.zeros(424, dtype=np.bool_)
+    last_bid, has_bid = -1, False
+    # the action at the terminal step (which does not increment _turn) is not included
+    for i in range(int(state._turn)):
+        action = int(state._bidding_history[i])
+        pos = (int(state._dealer) + i) % 4
+        if action == 35:
+            if not has_bid:
+                obs_history[pos] = True
+        elif action <= 34:
+            obs_history[4 + pos * 35 + action] = True
+            last_bid, has_bid = action, True
+        elif action == 36:
+            obs_history[144 + pos * 35 + last_bid] = True
+        else:
+            obs_history[284 + pos * 35 + last_bid] = True
+    return np.concatenate([vul, obs_history, hand])
+
+
+def test_observe_incremental(tmp_path, monkeypatch):
+    # experimental module loads dds hash table in the current directory on import
+    monkeypatch.chdir(tmp_path)
+    shutil.copy(DDS_HASH_TABLE_PATH, tmp_path / "dds_hash_table.npz")
+    from pgx.experimental.bridge_bidding import _duplicate_init
+
+    key = jax.random.PRNGKey(0)
+    for _ in range(10):
+        key, subkey = jax.random.split(key)
+        state = init_by_key(subkey)
+        while True:
+            for player_id in range(4):
+                assert (
+                    observe(state, player_id) == observe_from_history(state, player_id)
+                ).all()
+            if state.terminated:
+                break
+            key, subkey = jax.random.split(key)
+            logits = jnp.log(state.legal_action_mask.astype(jnp.float32))
+            # pass more often to finish the auction
+            logits = logits.at[35].add(2.0)
+            state = step(state, jax.random.categorical(subkey, logits))
+        state = _duplicate_init(state)
+        for player_id in range(4):
+            assert (
+                observe(state, player_id) == observe_from_history(state, player_id)
+            ).all()
+
+    # pass out
+    state = init_by_key(key)
+    for _ in range(4):
+        state = step(state, 35)
+        for player_id in range(4):
+            assert (
+                observe(state, player_id) == observe_from_history(state, player_id)
+            ).all()
+    assert state.terminated
+
+
 def test_calc_score():
     # http://web2.acbl.org/documentLibrary/play/InstantScorer.pdf
     #
@@ -1712,6 +1783,9 @@ def test_state_to_key_cycle():
 
 def test_calcurate_dds_tricks():
     HASH_TABLE_SAMPLE_KEYS, HASH_TABLE_SAMPLE_VALUES = _load_sample_hash()
+    sorted_keys, sorted_values = _sort_hash_table(
+        HASH_TABLE_SAMPLE_KEYS, HASH_TABLE_SAMPLE_VALUES
+    )
     samples = []
     with open("tests/assets/contractbridge-ddstable-sample100.csv", "r") as f:
         reader = csv.reader(f, delimiter=",")
@@ -1722,14 +1796,95 @@ def test_calcurate_dds_tricks():
         key, subkey = jax.random.split(key)
         state = init(subkey)
         state = state.replace(_hand=_key_to_hand(HASH_TABLE_SAMPLE_KEYS[i]))
-        dds_tricks = _calculate_dds_tricks(
-            state, HASH_TABLE_SAMPLE_KEYS, HASH_TABLE_SAMPLE_VALUES
-        )
+        dds_tricks = _calculate_dds_tricks(state, sorted_keys, sorted_values)
         # sample dataから、作成したhash tableを用いて、ddsの結果を計算
         # その結果とsample dataが一致しているか確認
         assert jnp.all(dds_tricks == samples[i][1])
 
 
+def test_find_value_from_key():
+    HASH_TABLE_SAMPLE_KEYS, HASH_TABLE_SAMPLE_VALUES = _load_sample_hash()
+    sorted_keys, sorted_values = _sort_hash_table(
+        HASH_TABLE_SAMPLE_KEYS, HASH_TABLE_SAMPLE_VALUES
+    )
+    # batched lookup of all keys
+    values = jax.vmap(_find_value_from_key, in_axes=(0, None, None))(
+        HASH_TABLE_SAMPLE_KEYS, sorted_keys, sorted_values
+    )
+    assert (values == HASH_TABLE_SAMPLE_VALUES).all()
+    # table size which is not a power of two
+    for n in [1, 2, 3, 5, 63, 64, 65]:
+        keys, values = sorted_keys[:n], sorted_values[:n]
+        for i in range(n):
+            assert (_find_value_from_key(keys[i], keys, values) == values[i]).all()
+
+
+def test_load_dds_hash_table(tmp_path):
+    HASH_TABLE_SAMPLE_KEYS, HASH_TABLE_SAMPLE_VALUES = _load_sample_hash()
+    sorted_keys, sorted_values = _sort_hash_table(
+        HASH_TABLE_SAMPLE_KEYS, HASH_TABLE_SAMPLE_VALUES
+    )
+    # single file (not sorted)
+    table = _load_dds_hash_table(DDS_HASH_TABLE_PATH)
+    assert (table.hash_keys == sorted_keys).all()
+    assert (table.hash_values == sorted_values).all()
+    # directory of shards
+    path = str(tmp_path / "dds_hash_table")
+    _save_dds_hash_table(
+        path, HASH_TABLE_SAMPLE_KEYS, HASH_TABLE_SAMPLE_VALUES, num_shards=3
+    )
+    assert sorted(os.listdir(path)) == ["00000.npy", "00001.npy", "00002.npy", "index.npy"]
+    table = _load_dds_hash_table(path)
+    # memory-mapped, not read on load
+    assert all(isinstance(shard, np.memmap) for shard in table.shards)
+    assert len(table) == 100
+    assert (table.hash_keys == sorted_keys).all()
+    assert (table.hash_values == sorted_values).all()
+    assert (table.take(np.arange(100)) == sorted_keys).all()
+    values, is_found = table.lookup(np.asarray(HASH_TABLE_SAMPLE_KEYS))
+    assert (values == HASH_TABLE_SAMPLE_VALUES).all()
+    assert is_found.all()
+    _, is_found = table.lookup(np.asarray(HASH_TABLE_SAMPLE_KEYS) + 1)
+    assert not is_found.any()
+    env = BridgeBidding(dds_hash_table_path=path)
+    assert (env.hash_keys == sorted_keys).all()
+    # the table is neither on the device nor embedded in the compiled functions
+    state = env.init(jax.random.PRNGKey(0))
+    for jaxpr in [
+        jax.make_jaxpr(env.init)(jax.random.PRNGKey(0)),
+        jax.make_jaxpr(env.step)(state, 35),
+    ]:
+        assert all(np.size(c) < 100 * 4 for c in jaxpr.consts)
+    # shards without index are not loaded
+    os.remove(os.path.join(path, "index.npy"))
+    with pytest.raises(FileNotFoundError):
+        _load_dds_hash_table(path)
+
+
+def test_host_dds_hash_table():
+    # same deals and rewards as the lookup in the table on device
+    hash_keys, hash_values = jnp.asarray(env.hash_keys), jnp.asarray(env.hash_values)
+    init = jax.jit(jax.vmap(env.init))
+    step = jax.jit(jax.vmap(env.step))
+    make_reward = jax.jit(jax.vmap(_make_reward, in_axes=(0, None, None)))
+    keys = jax.random.split(jax.random.PRNGKey(0), 16)
+    state = init(keys)
+    deal_keys = jax.vmap(lambda k: jax.random.split(jax.random.split(k)[1], 3)[1])(keys)
+    expected = jax.vmap(jax.random.choice, in_axes=(0, None))(deal_keys, hash_keys)
+    assert (jax.vmap(_state_to_key)(state) == expected).all()
+    key = jax.random.PRNGKey(1)
+    while not state.terminated.all():
+        key, subkey = jax.random.split(key)
+        logits = jnp.log(state.legal_action_mask.astype(jnp.float32))
+        # pass more often to finish the auctions
+        logits = logits.at[:, 35].add(3.0)
+        terminated = state.terminated
+        state = step(state, jax.random.categorical(subkey, logits, axis=1))
+        is_scored = state.terminated & ~terminated & (state._last_bid != -1)
+        expected = make_reward(state, hash_keys, hash_values)
+        assert (state.reward[is_scored] == expected[is_scored]).all()
+
+
 def test_value_to_dds_tricks():
     value = jnp.array([4160, 904605, 4160, 904605])
     # fmt: off
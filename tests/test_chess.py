@@ -421,6 +421,13 @@ def test_legal_action_mask():
     print(jnp.nonzero(state.legal_action_mask))
     assert state.legal_action_mask.sum() == 3
 
+    # check by castled rook
+    state = State._from_fen("5k2/8/8/8/8/8/8/4K2R w K - 0 1")
+    state = step(state, jnp.int32(2367))  # WKing: e1 -> g1 (castling)
+    print(state._to_fen())
+    print(jnp.nonzero(state.legal_action_mask))
+    assert state.legal_action_mask.sum() == 4
+
 
 def test_terminal():
     # checkmate (white win)
@@ -450,6 +457,23 @@ def test_terminal():
     assert state.terminated
     assert (state.reward == 0.0).all()
 
+    # threefold repetition (across the end of the hash history ring buffer)
+    state = init(jax.random.PRNGKey(0))
+    state = state.replace(
+        _step_count=jnp.int32(99),
+        _hash_history=jnp.zeros_like(state._hash_history).at[99].set(state._zobrist_hash),
+    )
+    white_moves = [(p("g1"), p("f3")), (p("f3"), p("g1"))]
+    black_moves = [(p("g8", b=True), p("f6", b=True)), (p("f6", b=True), p("g8", b=True))]
+    for i in range(8):
+        from_, to = (white_moves if i % 2 == 0 else black_moves)[(i // 2) % 2]
+        assert not state.terminated
+        state = step(state, Action(from_=from_, to=to)._to_label())
+        if i == 3:
+            assert (state.observation[:, :, 12] == 1).all()
+    assert state.terminated
+    assert (state.reward == 0.0).all()
+
     # insufficient pieces
     # K vs K
     state = State._from_fen("k7/8/8/8/8/8/8/7K w - - 0 1")
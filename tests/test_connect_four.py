@@ -1,6 +1,6 @@
 import jax
 import jax.numpy as jnp
-from pgx.connect_four import ConnectFour
+from pgx.connect_four import ConnectFour, _win_check
 
 env = ConnectFour()
 init = jax.jit(env.init)
@@ -91,6 +91,39 @@ def test_win_check():
     assert (state.reward == jnp.array([1.0, -1.0])).all()
 
 
+def test_bitboard():
+    key = jax.random.PRNGKey(0)
+    state = init(key)
+    for i in [1, 2, 2, 3, 3, 4, 3, 4, 4, 6]:
+        state = step(state, i)
+    """
+    .......
+    .......
+    .......
+    ...@@..
+    ..@@O..
+    .@OOO.O
+    """
+    for turn in range(2):
+        rows, cols = jnp.nonzero(state._board.reshape(6, 7) == turn)
+        bits = sum(1 << int(c * 7 + 5 - r) for r, c in zip(rows, cols))
+        assert int(state._bitboard[turn, 0]) == bits & 0xFFFFFFFF
+        assert int(state._bitboard[turn, 1]) == bits >> 32
+    assert not _win_check(state._bitboard[0])
+
+    # diagonal through (col 4, height 3)
+    bitboard = state._bitboard[0] | jnp.uint32([1 << 31, 0])
+    assert _win_check(bitboard)
+    assert _win_check(bitboard, 31)
+    assert _win_check(bitboard, 7)
+    assert not _win_check(bitboard, 16)
+    # vertical across the lower and upper 32 bits (col 4, height 2 ~ 5)
+    bitboard = jnp.uint32([(1 << 30) | (1 << 31), (1 << 0) | (1 << 1)])
+    assert _win_check(bitboard)
+    assert _win_check(bitboard, 33)
+    assert not _win_check(bitboard, 29)
+
+
 def test_random_play():
     key = jax.random.PRNGKey(0)
     done = jnp.bool_(False)
@@ -3,7 +3,7 @@ import jax
 import jax.numpy as jnp
 import numpy as np
 
-from pgx.go import _count_ji, _count_point, Go, State, _show
+from pgx.go import _count_ji, _count_point, Go, State, _show, ZOBRIST_BOARD
 
 BOARD_SIZE = 5
 env = Go(size=BOARD_SIZE)
@@ -784,6 +784,34 @@ def test_counting_ji():
     assert count_ji(state, WHITE, BOARD_SIZE) == 0
 
 
+def test_counting_ji_winding_region():
+    # a single winding empty region of 19x19 board
+    # + + + + ... + +
+    # @ @ @ @ ... @ +
+    # + + + + ... + +
+    # + @ @ @ ... @ @
+    # ...
+    size = 19
+    count_ji = jax.jit(_count_ji, static_argnums=(2,))
+    board = np.zeros((size, size), dtype=np.int32)
+    for r in range(1, size, 2):
+        if r % 4 == 1:
+            board[r, : size - 1] = 1
+        else:
+            board[r, 1:] = 1
+    board = board.flatten()
+    num_empty = int((board == 0).sum())
+    state = Go(size=size).init(jax.random.PRNGKey(0))
+    state = state.replace(_chain_id_board=jnp.int32(board * np.arange(1, size**2 + 1)))
+    assert count_ji(state, 1, size) == num_empty
+    assert count_ji(state, -1, size) == 0
+    # white stone at the end of the region
+    board[-1] = -1
+    state = state.replace(_chain_id_board=jnp.int32(board * np.arange(1, size**2 + 1)))
+    assert count_ji(state, 1, size) == 0
+    assert count_ji(state, -1, size) == 0
+
+
 def test_counting_point():
     key = jax.random.PRNGKey(0)
     count_point = jax.jit(_count_point, static_argnums=(1,))
@@ -1110,6 +1138,92 @@ def test_PSK():
     assert (state.reward == jnp.float32([-1, 1])).all()  # black wins
 
 
+def test_superko():
+    env = Go(size=5, superko=True)
+    env.init = jax.jit(env.init)
+    env.step = jax.jit(env.step)
+    state = env.init(jax.random.PRNGKey(0))
+    state = env.step(state, 20)  # BLACK
+    state = env.step(state, 17)  # WHITE
+    state = env.step(state, 6)  # BLACK
+    state = env.step(state, 9)  # WHITE
+    state = env.step(state, 11)  # BLACK
+    state = env.step(state, 1)  # WHITE
+    state = env.step(state, 25)  # BLACK
+    state = env.step(state, 4)  # WHITE
+    state = env.step(state, 24)  # BLACK
+    state = env.step(state, 19)  # WHITE
+    state = env.step(state, 16)  # BLACK
+    state = env.step(state, 18)  # WHITE
+    state = env.step(state, 5)  # BLACK
+    state = env.step(state, 0)  # WHITE
+    state = env.step(state, 3)  # BLACK
+    state = env.step(state, 21)  # WHITE
+    state = env.step(state, 12)  # BLACK
+    state = env.step(state, 13)  # WHITE
+    state = env.step(state, 7)  # BLACK
+    state = env.step(state, 8)  # WHITE
+    state = env.step(state, 22)  # BLACK
+    state = env.step(state, 25)  # WHITE
+    state = env.step(state, 21)  # BLACK
+    state = env.step(state, 23)  # WHITE
+    state = env.step(state, 10)  # BLACK
+    #  O O + @ O
+    #  @ @ @ O O
+    #  @ @ @ O +
+    #  + @ O O O
+    #  @ @ @ O +
+    state = env.step(state, 2)  # WHITE
+    state = env.step(state, 3)  # BLACK
+    state = env.step(state, 0)  # WHITE
+    assert not state.terminated
+    state = env.step(state, 25)  # BLACK
+    assert not state.terminated
+    state = env.step(state, 1)  # WHITE
+    #  O O + @ O
+    #  @ @ @ O O
+    #  @ @ @ O +
+    #  + @ O O O
+    #  @ @ @ O +
+    assert state.terminated
+    assert state._black_player == 1
+    assert (state.reward == jnp.float32([-1, 1])).all()  # black wins
+
+    # repetition older than 8 steps is also detected
+    state = env.init(jax.random.PRNGKey(0))
+    for i in range(10):
+        state = env.step(state, i)
+    assert not state.terminated
+    # pretend that the board after the next move appeared at the first step
+    next_hash = state._zobrist_hash ^ ZOBRIST_BOARD[10, state._turn]
+    state = state.replace(_hash_history=state._hash_history.at[1].set(next_hash))
+    state = env.step(state, 10)
+    assert state.terminated
+    assert state.reward[state.current_player] == 1.0
+
+
+def test_zobrist_hash():
+    env = Go(size=9, superko=True)
+    step = jax.jit(env.step)
+    state = jax.jit(env.init)(jax.random.PRNGKey(1))
+    key = jax.random.PRNGKey(0)
+    while not state.terminated:
+        expected = np.zeros(2, dtype=np.uint32)
+        for xy in range(9 * 9):
+            if state._chain_id_board[xy] != 0:
+                expected ^= np.array(ZOBRIST_BOARD[xy, int(state._chain_id_board[xy] < 0)])
+        assert (state._zobrist_hash == expected).all()
+        assert (state._hash_history[state._step_count] == expected).all()
+        key, subkey = jax.random.split(key)
+        legal_actions = np.where(state.legal_action_mask[:-1])[0]
+        if len(legal_actions) == 0 or state._step_count > 120:
+            a = 9 * 9
+        else:
+            a = jax.random.choice(subkey, legal_actions)
+        state = step(state=state, action=a)
+    assert state._num_captured_stones.sum() > 0
+
+
 def test_random_play_5():
     key = jax.random.PRNGKey(0)
     state = init(key=key)
@@ -1129,6 +1243,48 @@ def test_random_play_5():
     assert state._passed or state._turn > 100
 
 
+def test_pseudo_liberty_stats():
+    # incrementally updated stats must be equal to the ones computed from scratch
+    def _count(state, size):
+        board = np.abs(np.array(state._chain_id_board))
+        num_pseudo = np.zeros(size**2, dtype=np.int64)
+        idx_sum = np.zeros(size**2, dtype=np.int64)
+        idx_squared_sum = np.zeros(size**2, dtype=np.int64)
+        for xy in range(size**2):
+            if board[xy] == 0:
+                continue
+            x, y = xy // size, xy % size
+            for dx, dy in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
+                if 0 <= x + dx < size and 0 <= y + dy < size:
+                    adj = (x + dx) * size + (y + dy)
+                    if board[adj] == 0:
+                        num_pseudo[board[xy] - 1] += 1
+                        idx_sum[board[xy] - 1] += adj + 1
+                        idx_squared_sum[board[xy] - 1] += (adj + 1) ** 2
+        return num_pseudo, idx_sum, idx_squared_sum
+
+    size = 9
+    env = Go(size=size)
+    step = jax.jit(env.step)
+    state = jax.jit(env.init)(jax.random.PRNGKey(3))
+    key = jax.random.PRNGKey(0)
+    num_captured = 0
+    while not state.terminated:
+        num_pseudo, idx_sum, idx_squared_sum = _count(state, size)
+        assert (state._num_pseudo == num_pseudo).all()
+        assert (state._idx_sum == idx_sum).all()
+        assert (state._idx_squared_sum == idx_squared_sum).all()
+        key, subkey = jax.random.split(key)
+        legal_actions = np.where(state.legal_action_mask[:-1])[0]
+        if len(legal_actions) == 0 or state._step_count > 120:
+            a = size * size
+        else:
+            a = jax.random.choice(subkey, legal_actions)
+        state = step(state=state, action=a)
+        num_captured = state._num_captured_stones.sum()
+    assert num_captured > 0
+
+
 def test_api():
     import pgx
     env = pgx.make("go_9x9")
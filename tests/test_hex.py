@@ -1,6 +1,6 @@
 import jax
 import jax.numpy as jnp
-from pgx.hex import Hex
+from pgx.hex import Hex, _find
 
 env = Hex()
 init = jax.jit(env.init)
@@ -39,7 +39,12 @@ def test_merge():
           0,   0,   0,   0,   0,   0,   0,   0,   0,   0,   0,
           0,   0,   0,   0,   0,   0,   0,   0,   0,   0,   0])
     # fmt:on
-    assert jnp.all(state._board == expected)
+    assert jnp.all(state._board == jnp.sign(expected))
+    roots = _find(state._parent, jnp.arange(11 * 11))
+    for i in range(11 * 11):
+        for j in range(11 * 11):
+            if expected[i] != 0 and expected[j] != 0:
+                assert (roots[i] == roots[j]) == (expected[i] == expected[j])
 
 
 def test_terminated():
@@ -1,6 +1,6 @@
 import jax
 import jax.numpy as jnp
-from pgx.othello import Othello
+from pgx.othello import Othello, _get_board
 
 env = Othello()
 init = jax.jit(env.init)
@@ -35,7 +35,7 @@ def test_step():
         0, 0, 0, 0, 0, 0, 0, 0,
         0, 0, 0, 0, 0, 0, 0, 0])
     # fmt:on
-    assert jnp.all(state._board == expected)
+    assert jnp.all(_get_board(state) == expected)
 
 
 def test_terminated():
@@ -1,6 +1,6 @@
 import jax
 import jax.numpy as jnp
-from pgx.play2048 import Play2048, _slide_and_merge, State
+from pgx.play2048 import Play2048, _legal_action_mask, _slide_and_merge, State
 
 env = Play2048()
 init = jax.jit(env.init)
@@ -31,6 +31,12 @@ def test_slide_and_merge():
     line = jnp.int8([1, 4, 4, 5])
     assert (slide_and_merge(line)[0] == jnp.int8([1, 5, 5, 0])).all()
 
+    # reward does not overflow
+    line = jnp.int8([6, 6, 10, 10])
+    line, reward = slide_and_merge(line)
+    assert (line == jnp.int8([7, 11, 0, 0])).all()
+    assert reward == 128 + 2048
+
     board = jnp.int8([0, 2, 0, 2, 0, 2, 0, 2, 0, 2, 0, 2, 0, 2, 0, 2])
     board_2d = board.reshape((4, 4))
     board_2d = jax.vmap(_slide_and_merge)(board_2d)[0]
@@ -80,6 +86,48 @@ def test_legal_action():
     assert (state.legal_action_mask == jnp.bool_([0, 0, 1, 1])).all()
     assert not state.terminated
 
+    # moves which do not change the board are illegal
+    """
+    [[ 2  0  0  0]
+     [ 4  0  0  0]
+     [ 8  0  0  0]
+     [ 2  0  0  0]]
+    """
+    board = jnp.int8([1, 0, 0, 0, 2, 0, 0, 0, 3, 0, 0, 0, 1, 0, 0, 0])
+    assert (_legal_action_mask(board.reshape(4, 4)) == jnp.bool_([0, 0, 1, 0])).all()
+
+
+def test_noop_move_is_masked():
+    def slide_left(row):
+        tiles = [x for x in row if x != 0]
+        merged = []
+        while tiles:
+            if len(tiles) > 1 and tiles[0] == tiles[1]:
+                merged.append(tiles[0] + 1)
+                tiles = tiles[2:]
+            else:
+                merged.append(tiles.pop(0))
+        return merged + [0] * (4 - len(merged))
+
+    def changes(board, action):
+        # same rotation as _step: 0(left), 1(up), 2(right), 3(down)
+        rows = jnp.rot90(board.reshape(4, 4), action).tolist()
+        return any(slide_left(row) != row for row in rows)
+
+    key = jax.random.PRNGKey(0)
+    key, sub_key = jax.random.split(key)
+    state = init(sub_key)
+    num_masked = 0
+    while not state.terminated:
+        expected = [changes(state._board, a) for a in range(4)]
+        # moves which change no tiles are masked out, and the others are legal
+        assert state.legal_action_mask.tolist() == expected
+        num_masked += 4 - sum(expected)
+        legal_actions = jnp.where(state.legal_action_mask)[0]
+        key, sub_key = jax.random.split(key)
+        state = step(state, jax.random.choice(sub_key, legal_actions))
+    assert num_masked > 0
+
 
 def test_terminated():
     board = jnp.int8([1, 2, 3, 4, 2, 3, 4, 5, 3, 4, 5, 6, 0, 4, 5, 6])
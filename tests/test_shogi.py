@@ -170,6 +170,11 @@ def test_buggy_samples():
     visualize(state, "tests/assets/shogi/buggy_samples_013.svg")
     assert not state.legal_action_mask[20 * 81 + xy2i(2, 5)]
 
+    # 端の玉に対する打ち歩詰（盤外に逃げられると判定していた）
+    sfen = "r+N4+P1s/2sG1G3/2p1P4/PNl1kgP2/3p1p1Pp/1PPP1S1nP/1LB5L/K2Sp4/1+p+b1+lP+p1R w gnp 206"
+    state = State._from_sfen(sfen)
+    assert not state.legal_action_mask[20 * 81 + 2]
+
     # Hand crafted tests #685
     # double check
     sfen = "8k/9/9/9/9/8r/8s/9/7GK w - 1"
@@ -401,6 +406,63 @@ def test_sfen():
     assert s._to_sfen() == sfen
 
 
+def _move(state, from_, to):
+    """Legal action moving the piece at `from_` to `to` without promotion"""
+    for a in jnp.nonzero(state.legal_action_mask)[0]:
+        action = Action._from_dlshogi_action(state, a)
+        if (
+            ~action.is_drop
+            & ~action.is_promotion
+            & (action.from_ == from_)
+            & (action.to == to)
+        ):
+            return a
+    assert False
+
+
+def test_zobrist_hash():
+    from pgx.shogi import _zobrist_hash
+
+    state = init(jax.random.PRNGKey(1))
+    key = jax.random.PRNGKey(0)
+    for _ in range(100):
+        key, subkey = jax.random.split(key)
+        logits = jnp.log(state.legal_action_mask.astype(jnp.float32))
+        action = jax.random.categorical(subkey, logits)
+        state = step(state, action)
+        assert (state._zobrist_hash == _zobrist_hash(state)).all()
+        # same position in a different view
+        restored = State._from_sfen(state._to_sfen())
+        assert (state._zobrist_hash == restored._zobrist_hash).all()
+        if state.terminated:
+            break
+
+
+def test_sennichite():
+    # kings go back and forth
+    state = State._from_sfen("8k/9/9/9/9/9/9/9/K8 b - 1")
+    moves = [(xy2i(9, 9), xy2i(9, 8)), (xy2i(9, 8), xy2i(9, 9))]
+    for i in range(12):
+        from_, to = moves[(i // 2) % 2]  # same moves for both in their own view
+        state = step(state, _move(state, from_, to))
+        assert state.terminated == (i == 11)
+    assert (state.reward == 0).all()
+
+    # perpetual check by black rook (連続王手の千日手)
+    state = State._from_sfen("8k/9/9/9/7R1/9/9/9/K8 b - 1")
+    black = state.current_player
+    rook_moves = [(xy2i(2, 5), xy2i(1, 5)), (xy2i(1, 5), xy2i(2, 5))]
+    # white king in white's view
+    king_moves = [(xy2i(9, 9), xy2i(8, 9)), (xy2i(8, 9), xy2i(9, 9))]
+    for i in range(6):
+        state = step(state, _move(state, *rook_moves[i % 2]))
+        assert not state.terminated
+        state = step(state, _move(state, *king_moves[i % 2]))
+        assert state.terminated == (i == 5)
+    assert state.reward[black] == -1
+    assert state.reward[1 - black] == 1
+
+
 def test_api():
     import pgx
     # env = pgx.make("shogi")
@@ -0,0 +1,217 @@
+import os
+import subprocess
+import sys
+from functools import partial
+
+import jax
+import jax.numpy as jnp
+
+import pgx
+from pgx.experimental.utils import act_randomly
+from pgx.hex import Hex
+
+env = pgx.make("tic_tac_toe", auto_reset=True)
+init = jax.jit(jax.vmap(env.init))
+step = jax.jit(jax.vmap(env.step))
+batch_step = jax.jit(env._batch_step, static_argnums=(2,))
+policy = jax.jit(act_randomly)
+
+
+def test_rollout():
+    batch_size, num_steps = 4, 20
+    key = jax.random.PRNGKey(0)
+    state = init(jax.random.split(key, batch_size))
+
+    final_state, traj = env.rollout(
+        state, policy, jax.random.PRNGKey(1), num_steps
+    )
+    assert traj.observation.shape == (num_steps, batch_size, 3, 3, 2)
+    assert traj.legal_action_mask.shape == (num_steps, batch_size, 9)
+    assert traj.action.shape == (num_steps, batch_size)
+    assert traj.reward.shape == (num_steps, batch_size, 2)
+    assert traj.terminated.shape == (num_steps, batch_size)
+    assert traj.terminated.any()  # auto reset happens within the rollout
+
+    # same as stepping in a Python loop
+    keys = jax.random.split(jax.random.PRNGKey(1), num_steps)
+    for i in range(num_steps):
+        assert (state.observation == traj.observation[i]).all()
+        action = policy(keys[i], state)
+        assert (action == traj.action[i]).all()
+        state = step(state, action)
+        assert (state.reward == traj.reward[i]).all()
+        assert (state.terminated == traj.terminated[i]).all()
+    for x, y in zip(
+        jax.tree_util.tree_leaves(state),
+        jax.tree_util.tree_leaves(final_state),
+    ):
+        assert (x == y).all()
+
+
+def test_rollout_single_state():
+    env = pgx.make("tic_tac_toe")
+    state = env.init(jax.random.PRNGKey(0))
+
+    def policy(key, state):
+        logits = jnp.log(state.legal_action_mask.astype(jnp.float32))
+        return jax.random.categorical(key, logits)
+
+    state, traj = env.rollout(
+        state, policy, jax.random.PRNGKey(1), 10, donate=True
+    )
+    assert traj.action.shape == (10,)
+    assert state.terminated  # tic-tac-toe ends within 9 steps
+    assert traj.terminated[-1]
+    assert (traj.reward[-1] == 0).all()  # no reward after termination
+
+
+def test_vector_env():
+    envs = pgx.VectorEnv("tic_tac_toe", num_envs=8)
+    state = envs.reset(seed=0)
+    assert state.legal_action_mask.shape == (8, 9)
+    assert (state._step_count == 0).all()
+
+    key = jax.random.PRNGKey(0)
+    num_terminated = 0
+    for _ in range(30):
+        key, subkey = jax.random.split(key)
+        action = policy(subkey, state)
+        state = envs.step(action)
+        assert isinstance(state.reward, jax.Array)
+        num_terminated += int(state.terminated.sum())
+        # auto reset: terminated envs are already restarted
+        assert (state._step_count[state.terminated] == 0).all()
+    assert num_terminated > 0
+
+
+def test_precompile():
+    batch_size = 4
+    _env, _init, _step, observe = pgx.precompile("tic_tac_toe", batch_size)
+    assert _env.id == "tic_tac_toe"
+
+    keys = jax.random.split(jax.random.PRNGKey(0), batch_size)
+    state, expected = _init(keys), init(keys)
+    action = jnp.int32([0, 1, 2, 3])
+    state, expected = _step(state, action), step(expected, action)
+    assert (state.observation == expected.observation).all()
+    assert (state.current_player == expected.current_player).all()
+    assert (
+        observe(state, state.current_player).shape == state.observation.shape
+    )
+
+
+def test_batch_step():
+    batch_size = 16
+    key = jax.random.PRNGKey(0)
+    state = init(jax.random.split(key, batch_size))
+    expected = state
+    for max_num_resets in [1, 2, 4, 4, 4, 16] * 10:
+        key, subkey = jax.random.split(key)
+        action = policy(subkey, state)
+        state = batch_step(state, action, max_num_resets)
+        expected = step(expected, action)
+        for x, y in zip(
+            jax.tree_util.tree_leaves(state),
+            jax.tree_util.tree_leaves(expected),
+        ):
+            assert (x == y).all()
+
+
+def test_step_without_observation():
+    step_wo_obs = jax.jit(jax.vmap(partial(env.step, with_observation=False)))
+    observe = jax.jit(jax.vmap(env.observe))
+
+    key = jax.random.PRNGKey(0)
+    state = init(jax.random.split(key, 8))
+    for _ in range(20):
+        key, subkey = jax.random.split(key)
+        action = policy(subkey, state)
+        expected = step(state, action)
+        state = step_wo_obs(state, action)
+        assert not state.observation.any()
+        assert (state.legal_action_mask == expected.legal_action_mask).all()
+        assert (state.reward == expected.reward).all()
+        assert (
+            observe(state, state.current_player) == expected.observation
+        ).all()
+
+
+def test_auto_reset_with_jitted_init():
+    # `with_observation` must not be traced even if `init` is replaced by a jitted one
+    env = pgx.make("tic_tac_toe", auto_reset=True)
+    env.init = jax.jit(env.init)
+    batch_step = jax.jit(env._batch_step, static_argnums=(2,))
+
+    key = jax.random.PRNGKey(0)
+    state = init(jax.random.split(key, 4))
+    expected = state
+    for _ in range(20):
+        key, subkey = jax.random.split(key)
+        action = policy(subkey, state)
+        state = batch_step(state, action, 1)
+        expected = step(expected, action)
+        for x, y in zip(
+            jax.tree_util.tree_leaves(state),
+            jax.tree_util.tree_leaves(expected),
+        ):
+            assert (x == y).all()
+
+
+def test_observation_placeholder_shape():
+    # the placeholder has the shape of the env, not of the State default
+    for _env in [
+        pgx.make("go_9x9", auto_reset=True),
+        Hex(size=5, auto_reset=True),
+    ]:
+        init_wo_obs = jax.jit(partial(_env.init, with_observation=False))
+        step_wo_obs = jax.jit(partial(_env.step, with_observation=False))
+        expected = jax.jit(_env.init)(jax.random.PRNGKey(0))
+        state = init_wo_obs(jax.random.PRNGKey(0))
+        assert state.observation.shape == expected.observation.shape
+        assert state.observation.dtype == expected.observation.dtype
+        state = step_wo_obs(state, jnp.int32(0))
+        expected = jax.jit(_env.step)(expected, jnp.int32(0))
+        assert state.observation.shape == expected.observation.shape
+        assert (
+            _env.observe(state, state.current_player) == expected.observation
+        ).all()
+
+
+def test_precompile_with_compile_cache(tmp_path):
+    # the cache can be initialized only once per process, and needs XLA_FLAGS on CPU
+    code = (
+        "import jax, pgx; "
+        "jax.config.update('jax_persistent_cache_min_compile_time_secs', 0); "
+        f"pgx.precompile('tic_tac_toe', 2, compile_cache_dir={str(tmp_path)!r})"
+    )
+    environ = dict(os.environ)
+    environ["XLA_FLAGS"] = "--xla_cpu_use_xla_runtime=true"
+    environ["JAX_PLATFORMS"] = "cpu"
+    root = os.path.dirname(os.path.dirname(pgx.__file__))
+    environ["PYTHONPATH"] = os.pathsep.join(
+        [root, environ.get("PYTHONPATH", "")]
+    )
+
+    subprocess.run([sys.executable, "-c", code], env=environ, check=True)
+    entries = {
+        f: os.stat(tmp_path / f).st_mtime_ns for f in os.listdir(tmp_path)
+    }
+    assert entries
+    # another process loads the executables from the cache instead of writing them again
+    subprocess.run([sys.executable, "-c", code], env=environ, check=True)
+    assert {
+        f: os.stat(tmp_path / f).st_mtime_ns for f in os.listdir(tmp_path)
+    } == entries
+
+
+def test_initialize_compilation_cache_on_older_jax(monkeypatch):
+    from jax.experimental.compilation_cache import compilation_cache
+
+    def update(name, value):
+        raise AttributeError(name)
+
+    calls = []
+    monkeypatch.setattr(jax.config, "update", update)
+    monkeypatch.setattr(compilation_cache, "initialize_cache", calls.append)
+    pgx.v1._initialize_compilation_cache("cache_dir")
+    assert calls == ["cache_dir"]
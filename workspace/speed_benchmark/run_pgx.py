@@ -4,7 +4,6 @@ import json
 import jax
 import pgx
 from pgx.experimental.utils import act_randomly
-from pgx.experimental.wrappers import auto_reset
 
 
 act_randomly = jax.jit(act_randomly)
@@ -13,12 +12,12 @@ act_randomly = jax.jit(act_randomly)
 def benchmark(env_id: pgx.EnvId, batch_size, num_steps):
     num_batch_step = num_steps // batch_size
 
-    env = pgx.make(env_id)
+    env = pgx.make(env_id, auto_reset=True)
     assert env is not None
 
     # warmup start
     init = jax.jit(jax.vmap(env.init))
-    step = jax.jit(jax.vmap(auto_reset(env.step, env.init)))
+    step = jax.jit(jax.vmap(env.step))
     key = jax.random.PRNGKey(0)
     key, subkey = jax.random.split(key)
     keys = jax.random.split(subkey, batch_size)